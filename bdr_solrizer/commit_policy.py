@@ -0,0 +1,91 @@
+'''How long solr may wait before committing our updates (commitWithin), based on how busy things are.
+
+An edit with nothing else going on gets the usual short commitWithin, so it shows up quickly. When
+the queues back up or solr updates slow down, commitWithin widens (up to COMMIT_WITHIN_MAX), so a
+backfill doesn't keep soft-committing & reopening searchers. In bulk mode, updates don't ask for a
+commit at all - finish_bulk_mode() does one commit at the end.
+
+The bulk mode flag & recent update latency are kept in redis, so all the workers share them.'''
+import time
+import requests
+from redis import Redis
+from redis.exceptions import RedisError
+from .logger import logger
+from .queues import queue_depth
+from .settings import (
+    ADD_ACTION,
+    DELETE_ACTION,
+    COMMIT_WITHIN,
+    COMMIT_WITHIN_ADD,
+    COMMIT_WITHIN_MAX,
+)
+
+
+BUSY_QUEUE_DEPTH = 1000 #queued jobs that double commitWithin
+SLOW_UPDATE_SECONDS = 2.0 #solr update latency that doubles commitWithin
+LATENCY_WEIGHT = 0.2 #weight of the newest update in the moving average
+LATENCY_EXPIRE_SECONDS = 60*10 #forget the latency after ten idle minutes
+LATENCY_KEY = 'bdr_solrizer:solr_update_seconds'
+BULK_MODE_KEY = 'bdr_solrizer:bulk_mode'
+
+_redis = Redis()
+
+
+def base_commit_within(action):
+    if action in [ADD_ACTION, DELETE_ACTION]:
+        return int(COMMIT_WITHIN_ADD)
+    return int(COMMIT_WITHIN)
+
+
+def commit_within(action, queued_jobs, update_seconds):
+    '''commitWithin (ms) for action: the base value when idle, growing with queue depth or update latency'''
+    base = base_commit_within(action)
+    load = max(queued_jobs / BUSY_QUEUE_DEPTH, update_seconds / SLOW_UPDATE_SECONDS)
+    return min(int(base * (1 + load)), max(COMMIT_WITHIN_MAX, base))
+
+
+def recent_update_seconds():
+    seconds = _redis.get(LATENCY_KEY)
+    return float(seconds) if seconds else 0.0
+
+
+def record_update_seconds(seconds):
+    try:
+        previous = _redis.get(LATENCY_KEY)
+        if previous:
+            seconds = LATENCY_WEIGHT * seconds + (1 - LATENCY_WEIGHT) * float(previous)
+        _redis.set(LATENCY_KEY, seconds, ex=LATENCY_EXPIRE_SECONDS)
+    except RedisError as e:
+        logger.warning(f'error recording solr update latency: {e}')
+
+
+def current_commit_within(action):
+    '''commitWithin (ms) for an update right now - or None in bulk mode'''
+    try:
+        if _redis.exists(BULK_MODE_KEY):
+            return None
+        queued_jobs = queue_depth()
+        update_seconds = recent_update_seconds()
+    except RedisError as e:
+        logger.warning(f'error checking load for commitWithin - using the default: {e}')
+        return base_commit_within(action)
+    return commit_within(action, queued_jobs, update_seconds)
+
+
+def start_bulk_mode(hours):
+    #expires in case finish_bulk_mode never gets called - then the normal commitWithin commits everything
+    _redis.set(BULK_MODE_KEY, time.time(), ex=int(hours*60*60))
+
+
+def bulk_mode_started():
+    '''when bulk mode started (a timestamp), or None if it's off'''
+    started = _redis.get(BULK_MODE_KEY)
+    return float(started) if started else None
+
+
+def finish_bulk_mode(solr_url):
+    '''turn bulk mode off & commit everything that's been posted'''
+    _redis.delete(BULK_MODE_KEY)
+    response = requests.post(f'{solr_url}update/json', data=b'{"commit":{}}', headers={'Content-Type': 'application/json'})
+    if not response.ok:
+        raise Exception('SOLR COMMIT FAIL: %s - %s' % (response.status_code, response.text))
@@ -0,0 +1,93 @@
+'''Date parsing & normalization shared by the indexers.
+
+The common shapes (YYYY, YYYY-MM, YYYY-MM-DD, and ISO timestamps) are parsed by hand; anything else
+goes through the same regex/strptime logic as before, so results don't change.'''
+import datetime
+import functools
+import re
+
+
+MEMO_SIZE = 4096 #distinct date strings remembered - records repeat the same few dates a lot
+
+SOLR_DAY_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+SOLR_MONTH_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+SOLR_YEAR_PATTERN = re.compile(r'^\d{4}$')
+TIMESTAMP_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?(?:(Z)|([+-])(\d{2}):?([0-5]\d))', re.ASCII)
+
+
+def _ascii_digits(s):
+    return s.isascii() and s.isdigit()
+
+
+def _slow_solr_date_string(date_str):
+    try:
+        if SOLR_DAY_PATTERN.match(date_str):
+            datetime.datetime.strptime(date_str, '%Y-%m-%d')
+            return date_str + 'T00:00:00Z'
+        elif SOLR_MONTH_PATTERN.match(date_str):
+            datetime.datetime.strptime(date_str, '%Y-%m')
+            return date_str + '-01T00:00:00Z'
+        elif SOLR_YEAR_PATTERN.match(date_str):
+            datetime.datetime.strptime(date_str, '%Y')
+            return date_str + '-01-01T00:00:00Z'
+    except ValueError:
+        pass
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def solr_date_string(date_str):
+    '''date_str as a solr date (eg. "1905-06" -> "1905-06-01T00:00:00Z"), or None if
+    it isn't a valid YYYY, YYYY-MM, or YYYY-MM-DD date'''
+    if not date_str:
+        return None
+    if not date_str.isascii() or date_str[-1] == '\n':
+        #non-ASCII digits or a trailing newline - leave those to the regexes
+        return _slow_solr_date_string(date_str)
+    length = len(date_str)
+    if length not in (4, 7, 10):
+        return None
+    year = date_str[:4]
+    if not _ascii_digits(year) or year == '0000':
+        return None
+    if length == 4:
+        return date_str + '-01-01T00:00:00Z'
+    if date_str[4] != '-':
+        return None
+    month = date_str[5:7]
+    if not _ascii_digits(month) or not '01' <= month <= '12':
+        return None
+    if length == 7:
+        return date_str + '-01T00:00:00Z'
+    day = date_str[8:]
+    if date_str[7] != '-' or not _ascii_digits(day):
+        return None
+    try:
+        datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+    return date_str + 'T00:00:00Z'
+
+
+def utc_datetime_from_string(s):
+    '''an aware UTC datetime from an ISO timestamp like 2020-11-25T20:30:43.737Z or 2021-03-23T06:20:30-04:00'''
+    match = TIMESTAMP_PATTERN.fullmatch(s)
+    if match:
+        year, month, day, hour, minute, second, fraction, zulu, sign, offset_hours, offset_minutes = match.groups()
+        microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+        try:
+            if zulu:
+                tz = datetime.timezone.utc
+            else:
+                offset = datetime.timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+                tz = datetime.timezone(-offset if sign == '-' else offset)
+            dt = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), microsecond, tzinfo=tz)
+        except ValueError:
+            #out of range somewhere - strptime raises the error
+            dt = None
+        if dt is not None:
+            return dt.astimezone(tz=datetime.timezone.utc)
+    try:
+        dt = datetime.datetime.strptime(s, '%Y-%m-%dT%H:%M:%S.%f%z')
+    except ValueError:
+        dt = datetime.datetime.strptime(s, '%Y-%m-%dT%H:%M:%S%z')
+    return dt.astimezone(tz=datetime.timezone.utc)
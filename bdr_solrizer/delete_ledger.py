@@ -0,0 +1,74 @@
+'''Coalesces the queued deletes: every delete job still gets queued for its own pid, but the first one
+to run takes the other pids waiting for their delete jobs too (up to DELETE_BATCH_SIZE), & deletes
+them all in one multi-id delete command - their own jobs then find them done & skip.
+
+Kept in redis, shared by all the workers: a set of the pids with a delete job waiting, and a key per
+pid that got deleted with another job's batch (it expires, in case that pid's job gets lost). If redis
+isn't reachable, every job posts its own delete, like before.'''
+from redis import Redis
+from redis.exceptions import RedisError
+from .logger import logger
+from .settings import USE_DELETE_LEDGER
+
+
+PENDING_KEY = 'bdr_solrizer:deletes:pending'
+DONE_KEY_PREFIX = 'bdr_solrizer:deletes:done:'
+DONE_EXPIRE_SECONDS = 60*60*6 #a job that runs after this just deletes its pid again
+
+_redis = Redis()
+
+
+def request_delete(pid):
+    '''a delete job is being queued for pid'''
+    if not USE_DELETE_LEDGER:
+        return
+    try:
+        _redis.sadd(PENDING_KEY, pid)
+    except RedisError as e:
+        logger.warning(f'delete ledger error: {e}')
+
+
+def job_started(pid):
+    '''pid's delete job is running - True if another job already deleted pid, so this one can skip'''
+    if not USE_DELETE_LEDGER:
+        return False
+    try:
+        _redis.srem(PENDING_KEY, pid)
+        return bool(_redis.delete(f'{DONE_KEY_PREFIX}{pid}'))
+    except RedisError as e:
+        logger.warning(f'delete ledger error: {e}')
+        return False
+
+
+def take_pending(count):
+    '''up to count pids waiting for their delete jobs - they're taken out of the set, & need to be
+    recorded (record_taken) before they're deleted, so their jobs skip'''
+    if not USE_DELETE_LEDGER or count < 1:
+        return []
+    try:
+        pids = _redis.spop(PENDING_KEY, count)
+    except RedisError as e:
+        logger.warning(f'delete ledger error: {e}')
+        return []
+    return sorted(pid.decode('utf8') for pid in pids or [])
+
+
+def record_taken(pids):
+    if not USE_DELETE_LEDGER or not pids:
+        return
+    try:
+        for pid in pids:
+            _redis.set(f'{DONE_KEY_PREFIX}{pid}', 1, ex=DONE_EXPIRE_SECONDS)
+    except RedisError as e:
+        logger.warning(f'delete ledger error: {e}')
+
+
+def release(pids):
+    '''the delete of taken pids failed - their own jobs will have to do it'''
+    if not USE_DELETE_LEDGER or not pids:
+        return
+    try:
+        _redis.delete(*[f'{DONE_KEY_PREFIX}{pid}' for pid in pids])
+    except RedisError as e:
+        #a leftover key would make the pid's job skip its delete
+        logger.error(f'delete ledger error releasing {pids[0]}...: {e}')
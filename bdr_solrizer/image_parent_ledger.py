@@ -0,0 +1,91 @@
+'''Coalesces the image parent flag updates: every image child's add wants its parent flagged, but a
+parent only needs one pending job - and none at all once its flags are set.
+
+Kept in redis, shared by all the workers: a key per parent with a job pending (it expires, in case
+the job gets lost), a set of the parents waiting to be flagged, and a set of the parents solr has
+the flags for. A parent's job stops being pending as soon as it starts, then takes the other waiting
+parents too (up to a batch), & flags them all in one request - their own jobs then find them flagged
+& skip. A full add of a parent replaces its solr doc (dropping the flags), so forget() has to be
+called whenever a doc gets added or deleted. If redis isn't reachable, every child queues its
+parent's job & every job posts, like before.'''
+from redis import Redis
+from redis.exceptions import RedisError
+from .logger import logger
+from .settings import USE_IMAGE_PARENT_LEDGER
+
+
+PENDING_KEY = 'bdr_solrizer:image_parents:pending'
+PENDING_JOB_KEY_PREFIX = 'bdr_solrizer:image_parents:pending_job:'
+PENDING_EXPIRE_SECONDS = 60*60*6 #a parent whose job got lost can get a new one after this
+FLAGGED_KEY = 'bdr_solrizer:image_parents:flagged'
+
+_redis = Redis()
+
+
+def request_flag(parent_pid):
+    '''True if a job needs to be queued to flag parent_pid - it's not flagged yet, & no job is pending for it'''
+    if not USE_IMAGE_PARENT_LEDGER:
+        return True
+    try:
+        if _redis.sismember(FLAGGED_KEY, parent_pid):
+            return False
+        if not _redis.set(f'{PENDING_JOB_KEY_PREFIX}{parent_pid}', 1, nx=True, ex=PENDING_EXPIRE_SECONDS):
+            return False
+        _redis.sadd(PENDING_KEY, parent_pid)
+        return True
+    except RedisError as e:
+        logger.warning(f'image parent ledger error: {e}')
+        return True
+
+
+def job_started(pid):
+    '''pid's job is running, so it's not pending anymore - a child added from now on can queue another one'''
+    if not USE_IMAGE_PARENT_LEDGER:
+        return
+    try:
+        _redis.delete(f'{PENDING_JOB_KEY_PREFIX}{pid}')
+        _redis.srem(PENDING_KEY, pid)
+    except RedisError as e:
+        logger.warning(f'image parent ledger error: {e}')
+
+
+def is_flagged(pid):
+    if not USE_IMAGE_PARENT_LEDGER:
+        return False
+    try:
+        return bool(_redis.sismember(FLAGGED_KEY, pid))
+    except RedisError as e:
+        logger.warning(f'image parent ledger error: {e}')
+        return False
+
+
+def take_pending(count):
+    '''up to count parents waiting to be flagged - they're taken out of the set, but their jobs stay
+    pending until they run (& find them flagged)'''
+    if not USE_IMAGE_PARENT_LEDGER or count < 1:
+        return []
+    try:
+        pids = _redis.spop(PENDING_KEY, count)
+    except RedisError as e:
+        logger.warning(f'image parent ledger error: {e}')
+        return []
+    return sorted(pid.decode('utf8') for pid in pids or [])
+
+
+def record_flagged(pids):
+    if not USE_IMAGE_PARENT_LEDGER or not pids:
+        return
+    try:
+        _redis.sadd(FLAGGED_KEY, *pids)
+    except RedisError as e:
+        logger.warning(f'image parent ledger error: {e}')
+
+
+def forget(pids):
+    if not USE_IMAGE_PARENT_LEDGER or not pids:
+        return
+    try:
+        _redis.srem(FLAGGED_KEY, *pids)
+    except RedisError as e:
+        #a stale entry would keep the flags from being set again for this parent
+        logger.error(f'image parent ledger error forgetting {pids[0]}...: {e}')
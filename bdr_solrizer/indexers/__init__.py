@@ -1,9 +1,10 @@
 from .dwcindexer import SimpleDarwinRecordIndexer
 from .fitsindexer import FitsIndexer
-from .fedoraindexer import StorageIndexer
+from .fedoraindexer import StorageIndexer, get_datastream_summary
 from .irindexer import IRIndexer
 from .modsindexer import ModsIndexer
-from .relsextindexer import RelsExtIndexer, parse_rdf_xml_into_graph
+from .singlepassmodsindexer import SinglePassModsIndexer
+from .relsextindexer import RelsExtIndexer, RelsExt, parse_rels_ext, parse_rdf_xml_into_graph
 from .rightsindexer import RightsIndexer
 from .teiindexer import TEIIndexer
 from .collection_indexer import CollectionIndexer
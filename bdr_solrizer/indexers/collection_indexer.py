@@ -2,6 +2,7 @@ import json
 
 
 class CollectionIndexer:
+    INDEX_VERSION = 1
 
     def __init__(self, collection_info_bytes):
         self.collection_info = json.loads(collection_info_bytes.decode('utf8'))
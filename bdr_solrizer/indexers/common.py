@@ -1,6 +1,7 @@
 import collections
 import re
 import unicodedata
+from lxml import etree
 from .. import utils
 
 RE_HASHSTART = re.compile(r'^\#')
@@ -17,12 +18,48 @@ class XPathMapper(collections.namedtuple('XPathMapper', 'path field multiple')):
         return self.multiple == 'm'
 
 
+class FieldValues(list):
+    '''A field's values, in the order they were added. A set of the values is kept alongside
+    the list, so checking for a duplicate doesn't scan the whole list - json & pickle see a plain list.'''
+
+    def __init__(self, values=()):
+        super().__init__(values)
+        self._seen = set()
+        for value in self:
+            self._add_seen(value)
+
+    def _add_seen(self, value):
+        try:
+            self._seen.add(value)
+        except TypeError:
+            pass #unhashable - __contains__ falls back to scanning the list
+
+    def __contains__(self, value):
+        try:
+            return value in self._seen
+        except TypeError:
+            return super().__contains__(value)
+
+    def append(self, value):
+        super().append(value)
+        self._add_seen(value)
+
+    def extend(self, values):
+        values = list(values)
+        super().extend(values)
+        for value in values:
+            self._add_seen(value)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
 class CommonIndexer:
     PREFIX = ""
 
     def __init__(self, xml_obj):
         self.xml = xml_obj
-        self.data = collections.defaultdict(list)
+        self.data = collections.defaultdict(FieldValues)
 
     def _full_field_name(self, field_name):
         if self.PREFIX:
@@ -30,7 +67,7 @@ class CommonIndexer:
         return field_name
 
     def _reset_data(self):
-        self.data = collections.defaultdict(list)
+        self.data = collections.defaultdict(FieldValues)
 
     def _strip_whitespace(self, value):
         return ' '.join(value.split())
@@ -41,7 +78,7 @@ class CommonIndexer:
             if isinstance(value, (str, bytes)):
                 value = self._strip_whitespace(value)
             else:
-                value = [self._strip_whitespace(val) for val in value if val]
+                value = FieldValues(self._strip_whitespace(val) for val in value if val)
             self.data[field_name] = value
 
     def append_field(self, field_name, value):
@@ -57,12 +94,45 @@ class CommonIndexer:
                               if val and val not in field_values]
                 field_values.extend(value_list)
 
+    @classmethod
+    def _class_cache(cls, name):
+        #each indexer class gets its own tables (subclasses can have different namespaces)
+        if name not in cls.__dict__:
+            setattr(cls, name, {})
+        return cls.__dict__[name]
+
+    def _xpath_namespaces(self):
+        return self.xml.ROOT_NAMESPACES
+
+    def compiled_xpath(self, path):
+        '''XPath evaluator for path, compiled once per indexer class, with the namespaces bound'''
+        evaluators = self._class_cache('_xpath_evaluators')
+        evaluator = evaluators.get(path)
+        if evaluator is None:
+            evaluator = etree.XPath(path, namespaces=self._xpath_namespaces())
+            evaluators[path] = evaluator
+        return evaluator
+
+    def xpath(self, path, node=None, **variables):
+        if node is None:
+            node = self.xml.node
+        return self.compiled_xpath(path)(node, **variables)
+
+    def _xpath_mappers(self, mappers):
+        mapper_tables = self._class_cache('_xpath_mapper_tables')
+        key = tuple(mappers)
+        xpath_mappers = mapper_tables.get(key)
+        if xpath_mappers is None:
+            xpath_mappers = [XPathMapper(*m) for m in mappers]
+            mapper_tables[key] = xpath_mappers
+        return xpath_mappers
+
     def append_all_mappers(self, mappers):
-        for mapper in [XPathMapper(*m) for m in mappers]:
+        for mapper in self._xpath_mappers(mappers):
             self.append_from_xpathmapper(mapper)
 
-    def append_from_xpathmapper(self, mapper):
-        clean_values = self.value_from_mapper(mapper)
+    def append_from_xpathmapper(self, mapper, **variables):
+        clean_values = self.value_from_mapper(mapper, **variables)
         if clean_values:
             self.append_field(
                     mapper.field,
@@ -78,10 +148,8 @@ class CommonIndexer:
             return True
         return False
 
-    def value_from_mapper(self, mapper):
-        element_list = self.xml.node.xpath(
-                mapper.path, namespaces=self.xml.ROOT_NAMESPACES
-        )
+    def value_from_mapper(self, mapper, **variables):
+        element_list = self.xpath(mapper.path, **variables)
         if not element_list:
             return []
         else:
@@ -4,6 +4,7 @@ from .. import settings, utils
 
 
 class SimpleDarwinRecordIndexer:
+    INDEX_VERSION = 1
 
     def __init__(self, dwc_bytes):
         self.dwc = load_xmlobject_from_string(dwc_bytes, darwincore.SimpleDarwinRecordSet).simple_darwin_record
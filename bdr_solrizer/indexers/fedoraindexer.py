@@ -23,26 +23,32 @@ class StorageIndexer:
         }
 
     def _get_ds_info(self):
-        '''create dict of datastream info & dump it out as a json string
-        eg. { 'DC': {'mimeType': 'text/xml'},
-              'METS': {'mimeType': 'text/xml'} }'''
-        ds_ids = []
-        ds_info = {}
-        object_size = 0
-        for ds_id, ds_profile in self.storage_object.active_file_profiles.items():
-            #we don't index AUDIT in the list of datastreams
-            if ds_id == 'AUDIT':
-                continue
-            ds_ids.append(ds_id)
-            ds_info[ds_id] = {
-                'mimeType': ds_profile['mimetype'],
-                'size': ds_profile['size'],
-                'checksum': ds_profile['checksum'],
-                'checksumType': ds_profile['checksumType'],
-                'lastModified': utils.utc_datetime_to_solr_string(ds_profile['lastModified']),
-            }
-            #Note: only adding the size of Active datastreams (excluding AUDIT) for now
-            ds_size = int(ds_profile['size'])
-            if ds_size > 0:
-                object_size += ds_size
-        return ds_ids, json.dumps(ds_info), str(object_size)
+        summary = self.storage_object.datastream_summary
+        return summary['ds_ids'], summary['ds_info'], summary['size']
+
+
+def get_datastream_summary(active_file_profiles):
+    '''the datastream ids, a json string of datastream info, and the total size of the datastreams
+    eg. {'ds_ids': ['DC', 'METS'],
+         'ds_info': '{"DC": {"mimeType": "text/xml", ...}, "METS": {"mimeType": "text/xml", ...}}',
+         'size': '1234'}'''
+    ds_ids = []
+    ds_info = {}
+    object_size = 0
+    for ds_id, ds_profile in active_file_profiles.items():
+        #we don't index AUDIT in the list of datastreams
+        if ds_id == 'AUDIT':
+            continue
+        ds_ids.append(ds_id)
+        ds_info[ds_id] = {
+            'mimeType': ds_profile['mimetype'],
+            'size': ds_profile['size'],
+            'checksum': ds_profile['checksum'],
+            'checksumType': ds_profile['checksumType'],
+            'lastModified': utils.utc_datetime_to_solr_string(ds_profile['lastModified']),
+        }
+        #Note: only adding the size of Active datastreams (excluding AUDIT) for now
+        ds_size = int(ds_profile['size'])
+        if ds_size > 0:
+            object_size += ds_size
+    return {'ds_ids': ds_ids, 'ds_info': json.dumps(ds_info), 'size': str(object_size)}
@@ -2,6 +2,7 @@ from lxml import etree
 
 
 class FitsIndexer:
+    INDEX_VERSION = 1
 
     def __init__(self, fits_xml):
         try:
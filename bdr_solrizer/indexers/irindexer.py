@@ -1,12 +1,13 @@
 import json
-import re
 import requests
 from diskcache import Cache
 from eulxml.xmlmap import load_xmlobject_from_string
 from bdrxml import irMetadata
+from .. import dates
 
 
 class IRIndexer:
+    INDEX_VERSION = 2 #2: invalid dates (eg. 2020-13-45, 0000) are None, like in the other indexers
 
     def __init__(self, ir_bytes):
         self.ir = load_xmlobject_from_string(ir_bytes, irMetadata.IR)
@@ -20,15 +21,7 @@ class IRIndexer:
         return self._get_solr_date(ir_date)
 
     def _get_solr_date(self, date):
-        if not date:
-            return None
-        if re.match(r'^\d{4}-\d{2}-\d{2}$', date):
-            return date + 'T00:00:00Z'
-        elif re.match(r'^\d{4}-\d{2}$', date):
-            return date + '-01T00:00:00Z'
-        elif re.match(r'^\d{4}$', date):
-            return date + '-01-01T00:00:00Z'
-        return None
+        return dates.solr_date_string(date)
 
     def index_data(self):
         return {
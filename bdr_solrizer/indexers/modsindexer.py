@@ -13,6 +13,8 @@ XLINK_NAMESPACE = 'http://www.w3.org/1999/xlink'
 ISO_6391_LANGUAGE_CODE_TO_ISO_6392B_LANGUAGE_CODE = {'aa': 'aar', 'ab': 'abk', 'af': 'afr', 'ak': 'aka', 'am': 'amh', 'ar': 'ara', 'an': 'arg', 'as': 'asm', 'av': 'ava', 'ae': 'ave', 'ay': 'aym', 'az': 'aze', 'ba': 'bak', 'bm': 'bam', 'be': 'bel', 'bn': 'ben', 'bh': 'bih', 'bi': 'bis', 'bo': 'tib', 'bs': 'bos', 'br': 'bre', 'bg': 'bul', 'ca': 'cat', 'cs': 'cze', 'ch': 'cha', 'ce': 'che', 'cu': 'chu', 'cv': 'chv', 'kw': 'cor', 'co': 'cos', 'cr': 'cre', 'cy': 'wel', 'da': 'dan', 'de': 'ger', 'dv': 'div', 'dz': 'dzo', 'el': 'gre', 'en': 'eng', 'eo': 'epo', 'et': 'est', 'eu': 'baq', 'ee': 'ewe', 'fo': 'fao', 'fa': 'per', 'fj': 'fij', 'fi': 'fin', 'fr': 'fre', 'fy': 'fry', 'ff': 'ful', 'gd': 'gla', 'ga': 'gle', 'gl': 'glg', 'gv': 'glv', 'gn': 'grn', 'gu': 'guj', 'ht': 'hat', 'ha': 'hau', 'he': 'heb', 'hz': 'her', 'hi': 'hin', 'ho': 'hmo', 'hr': 'hrv', 'hu': 'hun', 'hy': 'arm', 'ig': 'ibo', 'io': 'ido', 'ii': 'iii', 'iu': 'iku', 'ie': 'ile', 'ia': 'ina', 'id': 'ind', 'ik': 'ipk', 'is': 'ice', 'it': 'ita', 'jv': 'jav', 'ja': 'jpn', 'kl': 'kal', 'kn': 'kan', 'ks': 'kas', 'ka': 'geo', 'kr': 'kau', 'kk': 'kaz', 'km': 'khm', 'ki': 'kik', 'rw': 'kin', 'ky': 'kir', 'kv': 'kom', 'kg': 'kon', 'ko': 'kor', 'kj': 'kua', 'ku': 'kur', 'lo': 'lao', 'la': 'lat', 'lv': 'lav', 'li': 'lim', 'ln': 'lin', 'lt': 'lit', 'lb': 'ltz', 'lu': 'lub', 'lg': 'lug', 'mh': 'mah', 'ml': 'mal', 'mr': 'mar', 'mk': 'mac', 'mg': 'mlg', 'mt': 'mlt', 'mn': 'mon', 'mi': 'mao', 'ms': 'may', 'my': 'bur', 'na': 'nau', 'nv': 'nav', 'nr': 'nbl', 'nd': 'nde', 'ng': 'ndo', 'ne': 'nep', 'nl': 'dut', 'nn': 'nno', 'nb': 'nob', 'no': 'nor', 'ny': 'nya', 'oc': 'oci', 'oj': 'oji', 'or': 'ori', 'om': 'orm', 'os': 'oss', 'pa': 'pan', 'pi': 'pli', 'pl': 'pol', 'pt': 'por', 'ps': 'pus', 'qu': 'que', 'rm': 'roh', 'ro': 'rum', 'rn': 'run', 'ru': 'rus', 'sg': 'sag', 'sa': 'san', 'si': 'sin', 'sk': 'slo', 'sl': 'slv', 'se': 'sme', 'sm': 'smo', 'sn': 'sna', 'sd': 'snd', 'so': 'som', 'st': 'sot', 'es': 'spa', 'sq': 'alb', 'sc': 'srd', 'sr': 'srp', 'ss': 'ssw', 'su': 'sun', 'sw': 'swa', 'sv': 'swe', 'ty': 'tah', 'ta': 'tam', 'tt': 'tat', 'te': 'tel', 'tg': 'tgk', 'tl': 'tgl', 'th': 'tha', 'ti': 'tir', 'to': 'ton', 'tn': 'tsn', 'ts': 'tso', 'tk': 'tuk', 'tr': 'tur', 'tw': 'twi', 'ug': 'uig', 'uk': 'ukr', 'ur': 'urd', 'uz': 'uzb', 've': 'ven', 'vi': 'vie', 'vo': 'vol', 'wa': 'wln', 'wo': 'wol', 'xh': 'xho', 'yi': 'yid', 'yo': 'yor', 'za': 'zha', 'zh': 'chi', 'zu': 'zul'}
 
 class ModsIndexer(CommonIndexer):
+    INDEX_VERSION = 1
+    INDEX_SETTINGS = (settings.DATE_FIELD,) #the output depends on these too
 
     JOINER_TEXT = ' > '
     DATE_NAMES = ['dateCreated', 'dateIssued', 'dateCaptured',
@@ -20,17 +22,16 @@ class ModsIndexer(CommonIndexer):
     DATE_QUALIFIERS = ['approximate', 'inferred', 'questionable']
     DATE_POINTS = ['end', 'start']
 
-    def __init__(self, mods_bytes):
-        mods_obj = load_xmlobject_from_string(mods_bytes, mods.Mods)
+    def __init__(self, mods_bytes=None, mods_obj=None):
+        #pass mods_obj to index an already-parsed tree (eg. a constituent relatedItem) without reparsing it
+        if mods_obj is None:
+            mods_obj = load_xmlobject_from_string(mods_bytes, mods.Mods)
         super().__init__(mods_obj)
         self.mods = mods_obj
 
     def _get_dates(self, date_name):
         date_xpath = 'mods:originInfo/mods:%s' % date_name
-        dates_els = self.mods.node.xpath(
-            date_xpath,
-            namespaces=self.mods.ROOT_NAMESPACES
-        )
+        dates_els = self.xpath(date_xpath)
         return [d for d in dates_els if d.text]
 
 
@@ -114,9 +115,7 @@ class ModsIndexer(CommonIndexer):
 
     def index_access_conditions(self):
         # access conditions
-        access_condition_els = self.mods.node.xpath(
-                'mods:accessCondition', namespaces=self.mods.ROOT_NAMESPACES
-        )
+        access_condition_els = self.xpath('mods:accessCondition')
         if access_condition_els:
             for access_condition in access_condition_els:
                 type_ = inflection.underscore(access_condition.get('type',"")).replace("_","").replace(" ","")
@@ -244,10 +243,7 @@ class ModsIndexer(CommonIndexer):
                         ),
                         mods_language_code_ssim_text
                 )
-        script_term_els = self.mods.node.xpath(
-                'mods:language/mods:scriptTerm',
-                namespaces=self.mods.ROOT_NAMESPACES
-            )
+        script_term_els = self.xpath('mods:language/mods:scriptTerm')
         for script_term in script_term_els:
             type_ = script_term.get('type')
             if type_ == 'text' and script_term.text:
@@ -501,10 +497,7 @@ class ModsIndexer(CommonIndexer):
 
     def _subject_subelements(self, subject):
         subject_xpath = 'mods:*//text()'
-        subject_sub_els = subject.node.xpath(
-                subject_xpath,
-                namespaces=self.mods.ROOT_NAMESPACES
-        )
+        subject_sub_els = self.xpath(subject_xpath, subject.node)
         return ['%s' % s for s in subject_sub_els if s.is_text and s.strip()]
 
     def _joiner(self, str_list):
@@ -795,7 +788,7 @@ class ModsIndexer(CommonIndexer):
                             if item.type == "constituent"
                             )
             constituent_indices = (
-                ModsIndexer(constituent.serialize()).index_data()
+                self._constituent_indexer(constituent).index_data()
                 for constituent in constituents
             )
             for constituent_data in constituent_indices:
@@ -824,6 +817,10 @@ class ModsIndexer(CommonIndexer):
                 )
         return self
 
+    def _constituent_indexer(self, constituent):
+        #index the relatedItem subtree in place, as if it were a whole mods record
+        return type(self)(mods_obj=mods.Mods(node=constituent.node))
+
     RELATED_ITEM_MAP = [
         ('mods:relatedItem[@type="host" and starts-with(@displayLabel,"Collection")]/mods:identifier[@type = "COLID"]',
             'mods_collection_id', 'm'),
@@ -831,16 +828,11 @@ class ModsIndexer(CommonIndexer):
 
     def index_related_items(self):
         self.append_all_mappers(self.RELATED_ITEM_MAP)
-        related_item_els = self.mods.node.xpath(
-                'mods:relatedItem', namespaces=self.mods.ROOT_NAMESPACES
-        )
+        related_item_els = self.xpath('mods:relatedItem')
         for related_item in related_item_els:
             type_ = related_item.get('type')
             label = related_item.get('displayLabel')
-            title_els = related_item.xpath(
-                    'mods:titleInfo/mods:title',
-                    namespaces=self.mods.ROOT_NAMESPACES
-            )
+            title_els = self.xpath('mods:titleInfo/mods:title', related_item)
             titles = [title.text for title in title_els]
             if type_ == 'host' and label and label.startswith('Collection'):
                 self.append_field('collection_title', titles)
@@ -849,10 +841,7 @@ class ModsIndexer(CommonIndexer):
             else:
                 self.append_field('other_title', titles)
             #titleInfo/partNumber
-            title_partnumber_els = related_item.xpath(
-                    'mods:titleInfo/mods:partNumber',
-                    namespaces=self.mods.ROOT_NAMESPACES
-            )
+            title_partnumber_els = self.xpath('mods:titleInfo/mods:partNumber', related_item)
             for pn in title_partnumber_els:
                 if pn.text:
                     self.append_field(
@@ -860,10 +849,7 @@ class ModsIndexer(CommonIndexer):
                             [pn.text]
                         )
             # solrize ids here as well
-            identifier_els = related_item.xpath(
-                    'mods:identifier',
-                    namespaces=self.mods.ROOT_NAMESPACES
-            )
+            identifier_els = self.xpath('mods:identifier', related_item)
             for identifier in identifier_els:
                 if identifier.text:
                     type_ = identifier.get('type')
@@ -877,15 +863,9 @@ class ModsIndexer(CommonIndexer):
                             'mods_related_id_ssim',
                             [identifier.text]
                         )
-            name_els = related_item.xpath(
-                    'mods:name',
-                    namespaces=self.mods.ROOT_NAMESPACES
-            )
+            name_els = self.xpath('mods:name', related_item)
             for name in name_els:
-                name_parts = name.xpath(
-                    'mods:namePart',
-                    namespaces=self.mods.ROOT_NAMESPACES
-                )
+                name_parts = self.xpath('mods:namePart', name)
                 for np in name_parts:
                     self.append_field('mods_related_name_ssim', [np.text])
         return self
@@ -1,17 +1,26 @@
+import concurrent.futures
 from io import BytesIO
+import os
+import re
+import threading
+import time
 import inflection
 import requests
+from diskcache import Cache
+from lxml import etree
 
-from rdflib import Namespace, Graph
+from rdflib import Namespace, Graph, Literal, URIRef
 from rdflib.namespace import DCTERMS, RDF
 from bdrxml.rdfns import (
     relsext as RELS_EXT_NS,
     model as MODELS_NS,
 )
 from .. import settings
+from ..logger import logger
 from ..settings import (
     COLLECTION_URL_PARAM,
     COLLECTION_URL,
+    COLLECTION_API_TIMEOUT,
     CACHE_DIR,
 )
 
@@ -47,18 +56,47 @@ METADATA_OBJECT_TYPES = [
 ]
 
 
-EXPIRE_SECONDS = 60 * 60 * 24
+EXPIRE_SECONDS = 60 * 60 * 24 #ancestors are fresh for a day...
+STALE_EXPIRE_SECONDS = 60 * 60 * 24 * 30 #...and served stale (while being refreshed) for a month
+REFRESH_LOCK_SECONDS = 60 #one process refreshes a collection at a time
+REFRESH_WAIT_SECONDS = 5 #how long to wait on another process's first fetch of a collection
+ANCESTOR_LOOKUP_THREADS = 8
 
 
-def get_ancestors_from_cache(key):
+#in-process layer in front of the disk cache: collection_id -> {'ancestors': [...], 'fetched': timestamp}
+_ancestors_memo = {}
+#API calls running in this process, so concurrent lookups of one collection share a call
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _ancestors_cache_key(collection_id):
+    return f'{collection_id}_collection_ancestors'
+
+
+def _refresh_lock_key(collection_id):
+    return f'{collection_id}_collection_ancestors_refresh'
+
+
+def _is_fresh(entry):
+    return time.time() - entry['fetched'] < EXPIRE_SECONDS
+
+
+def get_ancestors_from_cache(collection_id):
+    entry = _ancestors_memo.get(collection_id)
+    if entry and _is_fresh(entry):
+        return entry
     with Cache(CACHE_DIR) as cache:
-        if key in cache:
-            return cache[key]
+        entry = cache.get(_ancestors_cache_key(collection_id), None) or entry
+    if entry:
+        _ancestors_memo[collection_id] = entry
+    return entry
 
 
 def get_ancestors_from_api(collection_id):
     url = f'{COLLECTION_URL}{collection_id}/?{COLLECTION_URL_PARAM}'
-    r = requests.get(url)
+    #a hung API would otherwise hang the job - & the refresh lock expires, so the next job would claim it & hang too
+    r = requests.get(url, timeout=COLLECTION_API_TIMEOUT)
     if r.ok:
         data = r.json()
         ancestors = data['ancestors']
@@ -68,43 +106,286 @@ def get_ancestors_from_api(collection_id):
         raise Exception('Error from %s: %s - %s' % (url, r.status_code, r.content))
 
 
-def add_ancestors_to_cache(key, ancestors):
+def add_ancestors_to_cache(collection_id, ancestors):
+    entry = {'ancestors': ancestors, 'fetched': time.time()}
+    _ancestors_memo[collection_id] = entry
     with Cache(CACHE_DIR) as cache:
-        cache.set(key, ancestors, expire=EXPIRE_SECONDS)
+        cache.set(_ancestors_cache_key(collection_id), entry, expire=STALE_EXPIRE_SECONDS)
 
 
-def get_ancestors(collection_id):
-    key = f'{collection_id}_ancestors'
-    #don't fail on any cache errors
+def _claim_refresh(collection_id):
+    '''True if this process gets to call the API for collection_id (no other process is).'''
+    try:
+        with Cache(CACHE_DIR) as cache:
+            return cache.add(_refresh_lock_key(collection_id), os.getpid(), expire=REFRESH_LOCK_SECONDS)
+    except Exception:
+        return True
+
+
+def _release_refresh(collection_id):
     try:
-        ancestors = get_ancestors_from_cache(key)
+        with Cache(CACHE_DIR) as cache:
+            cache.delete(_refresh_lock_key(collection_id))
     except Exception:
-        ancestors = None
-    if not ancestors:
-        ancestors = get_ancestors_from_api(collection_id)
+        pass
+
+
+def _wait_for_other_fetch(collection_id):
+    deadline = time.time() + REFRESH_WAIT_SECONDS
+    while time.time() < deadline:
+        time.sleep(0.1)
+        entry = get_ancestors_from_cache(collection_id)
+        if entry:
+            return entry
+
+
+def _resolve_ancestors(collection_id, stale_entry):
+    claimed = _claim_refresh(collection_id)
+    try:
+        if not claimed:
+            #another process is calling the API - use what we have, or wait for its answer
+            entry = stale_entry or _wait_for_other_fetch(collection_id)
+            if entry:
+                return entry['ancestors']
+        try:
+            ancestors = get_ancestors_from_api(collection_id)
+        except Exception as e:
+            if not stale_entry:
+                raise
+            logger.warning(f'serving stale ancestors for {collection_id}: {e}')
+            return stale_entry['ancestors']
+        #don't fail on any cache errors
         try:
-            add_ancestors_to_cache(key, ancestors)
+            add_ancestors_to_cache(collection_id, ancestors)
         except Exception:
             pass
-    return ancestors
+        return ancestors
+    finally:
+        if claimed:
+            _release_refresh(collection_id)
+
+
+def get_ancestors(collection_id):
+    '''Ancestor names for a collection, ending with the collection's own name.
+
+    Once a cached answer is older than EXPIRE_SECONDS, one process refreshes it from the API while
+    everyone else keeps getting the stale answer - which is also the fallback if the API is down.
+    Concurrent lookups of a collection in this process share one resolution.'''
+    #don't fail on any cache errors
+    try:
+        entry = get_ancestors_from_cache(collection_id)
+    except Exception:
+        entry = None
+    if entry and _is_fresh(entry):
+        return entry['ancestors']
+    with _in_flight_lock:
+        future = _in_flight.get(collection_id)
+        resolving = future is None
+        if resolving:
+            future = _in_flight[collection_id] = concurrent.futures.Future()
+    if resolving:
+        try:
+            future.set_result(_resolve_ancestors(collection_id, entry))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _in_flight_lock:
+                del _in_flight[collection_id]
+    return future.result()
 
 
 def get_collection_names(collection_pids):
+    collection_pids = list(dict.fromkeys(collection_pids))
+    if len(collection_pids) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(collection_pids), ANCESTOR_LOOKUP_THREADS)) as executor:
+            all_ancestors = list(executor.map(get_ancestors, collection_pids))
+    else:
+        all_ancestors = [get_ancestors(collection_pid) for collection_pid in collection_pids]
     collection_names = []
-    for collection_pid in collection_pids:
-        ancestors = get_ancestors(collection_pid)
+    for ancestors in all_ancestors:
         for ancestor in ancestors:
             if ancestor not in collection_names:
                 collection_names.append(ancestor)
     return collection_names
 
 
+class _RateLimiter:
+    '''Spaces out calls from any number of threads to at most per_second.'''
+
+    def __init__(self, per_second=None):
+        self.interval = 1 / per_second if per_second else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def warm_ancestors_cache(collection_ids, threads=ANCESTOR_LOOKUP_THREADS, per_second=None):
+    '''Fetch ancestors from the API for every collection that isn't fresh in the cache (eg. before
+    a big reindex), at most per_second requests. Returns {'cached': [...], 'fetched': [...], 'failed': {id: error}}.'''
+    results = {'cached': [], 'fetched': [], 'failed': {}}
+    rate_limiter = _RateLimiter(per_second)
+
+    def warm(collection_id):
+        try:
+            entry = get_ancestors_from_cache(collection_id)
+        except Exception:
+            entry = None
+        if entry and _is_fresh(entry):
+            results['cached'].append(collection_id)
+            return
+        rate_limiter.wait()
+        try:
+            ancestors = get_ancestors_from_api(collection_id)
+            add_ancestors_to_cache(collection_id, ancestors)
+        except Exception as e:
+            results['failed'][collection_id] = str(e)
+        else:
+            results['fetched'].append(collection_id)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(warm, dict.fromkeys(collection_ids)))
+    return results
+
+
 def parse_rdf_xml_into_graph(contents):
     g = Graph()
     g.parse(BytesIO(contents), format='application/rdf+xml')
     return g
 
 
+RDF_NAMESPACE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RDF_RDF = f'{{{RDF_NAMESPACE}}}RDF'
+RDF_DESCRIPTION = f'{{{RDF_NAMESPACE}}}Description'
+RDF_ABOUT = f'{{{RDF_NAMESPACE}}}about'
+RDF_RESOURCE = f'{{{RDF_NAMESPACE}}}resource'
+RDF_DATATYPE = f'{{{RDF_NAMESPACE}}}datatype'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+#rdf: elements that are syntax, not properties
+RDF_SYNTAX_TERMS = ['RDF', 'Description', 'li', 'Seq', 'Bag', 'Alt']
+ABSOLUTE_URI = re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*:\S*$')
+
+
+class RelsExt:
+    """RELS-EXT relationships, indexed by predicate.
+
+    Answers objects() queries like an rdflib Graph, but the objects are plain
+    strings, in document order.
+    """
+
+    def __init__(self, triples=()):
+        #triples are (subject, predicate, object key) - the object key is
+        #   ('resource', uri) or ('literal', text, datatype, lang)
+        self._triples = []
+        self._seen = set()
+        self._objects = {}
+        for subject, predicate, obj in triples:
+            self._add(subject, predicate, obj)
+
+    def _add(self, subject, predicate, obj):
+        if (subject, predicate, obj) in self._seen:
+            return
+        self._seen.add((subject, predicate, obj))
+        self._triples.append((subject, predicate, obj))
+        self._objects.setdefault(predicate, []).append((subject, obj[1]))
+
+    def objects(self, subject=None, predicate=None):
+        if predicate is None:
+            pairs = [(s, o[1]) for s, _, o in self._triples]
+        else:
+            pairs = self._objects.get(str(predicate), [])
+        if subject is not None:
+            subject = str(subject)
+            return iter([o for s, o in pairs if s == subject])
+        return iter([o for _, o in pairs])
+
+    def set(self, triple):
+        """Same as Graph.set - replaces the objects for this subject & predicate."""
+        subject, predicate, obj = triple
+        subject, predicate = str(subject), str(predicate)
+        triples = [t for t in self._triples if t[:2] != (subject, predicate)]
+        triples.append((subject, predicate, _object_key(obj)))
+        self.__init__(triples)
+
+    def __len__(self):
+        return len(self._triples)
+
+    def __iter__(self):
+        return ((s, p, o[1]) for s, p, o in self._triples)
+
+    def __reduce__(self):
+        #just the triples - the lookup tables get rebuilt on unpickling
+        return (RelsExt, (self._triples,))
+
+
+def _object_key(obj):
+    if isinstance(obj, Literal):
+        return ('literal', str(obj), str(obj.datatype) if obj.datatype else None, obj.language)
+    return ('resource', str(obj))
+
+
+def _literal_text(text, datatype):
+    if datatype:
+        #rdflib normalizes typed literals (eg. "True"^^xsd:boolean -> "true") - match that
+        return str(Literal(text, datatype=URIRef(datatype)))
+    return text
+
+
+def _simple_rels_ext_triples(contents):
+    '''Triples from the simple RDF/XML that Fedora writes: rdf:Descriptions with an absolute
+    rdf:about, containing property elements with either an rdf:resource or a text literal.
+    Returns None for anything else.'''
+    try:
+        root = etree.fromstring(contents)
+    except etree.XMLSyntaxError:
+        return None
+    if root.tag != RDF_RDF or root.attrib:
+        return None
+    triples = []
+    for description in root.iterchildren(tag=etree.Element):
+        if description.tag != RDF_DESCRIPTION or list(description.attrib) != [RDF_ABOUT]:
+            return None
+        subject = description.get(RDF_ABOUT)
+        if not ABSOLUTE_URI.match(subject):
+            return None
+        for prop in description.iterchildren(tag=etree.Element):
+            if not prop.tag.startswith('{') or len(prop):
+                return None
+            namespace, _, name = prop.tag[1:].partition('}')
+            if namespace == RDF_NAMESPACE and name in RDF_SYNTAX_TERMS:
+                return None
+            attributes = set(prop.attrib)
+            if attributes == {RDF_RESOURCE}:
+                resource = prop.get(RDF_RESOURCE)
+                if (prop.text and prop.text.strip()) or not ABSOLUTE_URI.match(resource):
+                    return None
+                obj = ('resource', resource)
+            elif attributes in [set(), {RDF_DATATYPE}, {XML_LANG}]:
+                datatype = prop.get(RDF_DATATYPE)
+                obj = ('literal', _literal_text(prop.text or '', datatype), datatype, prop.get(XML_LANG))
+            else:
+                return None
+            triples.append((subject, namespace + name, obj))
+    return triples
+
+
+def parse_rels_ext(contents):
+    '''Parse RELS-EXT into a RelsExt. Anything unusual (nested descriptions, parseType,
+    blank nodes, relative URIs, ...) is parsed by rdflib instead.'''
+    triples = _simple_rels_ext_triples(contents)
+    if triples is None:
+        graph = parse_rdf_xml_into_graph(contents)
+        triples = [(str(s), str(p), _object_key(o)) for s, p, o in graph]
+    return RelsExt(triples)
+
+
 class RelsExtIndexer:
     """Indexer for Rels-ext RDF datastream"""
 
@@ -142,7 +423,7 @@ class RelsExtIndexer:
         if rels is not None:
             self.rels = rels
         elif rels_bytes:
-            self.rels = parse_rdf_xml_into_graph(rels_bytes)
+            self.rels = parse_rels_ext(rels_bytes)
         else:
             raise Exception('must pass rels or rels_bytes into RelsExtIndexer')
         self._content_models = []
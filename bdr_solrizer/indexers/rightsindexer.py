@@ -4,6 +4,8 @@ from ..settings import BDR_PUBLIC, BDR_BROWN
 
 
 class RightsIndexer:
+    INDEX_VERSION = 1
+    INDEX_SETTINGS = (BDR_PUBLIC, BDR_BROWN) #the output depends on these too
 
     def __init__(self, rights_bytes):
         self.rights = load_xmlobject_from_string(rights_bytes, Rights)
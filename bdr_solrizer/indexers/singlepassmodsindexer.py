@@ -0,0 +1,358 @@
+'''ModsIndexer that walks the MODS tree once, instead of running an XPath query for every field.
+
+The walk files each MODS element under its path from the root (eg. ('subject', 'topic')), and
+the field builders from ModsIndexer run unchanged on top of that: self.xpath() answers from the
+walk, and self.mods is a light view that maps the same fields as the bdrxml/eulxml classes. It
+all works on the plain lxml tree (the paths the walk can't answer are still XPath queries on it),
+so the eulxml Mods object (self.xml) doesn't get built unless something asks for it.
+The output must match ModsIndexer exactly - see tests/unit/test_singlepassmodsindexer.py.
+'''
+import collections
+import re
+from lxml import etree
+from bdrxml import mods
+from .common import CommonIndexer
+from .modsindexer import ModsIndexer
+
+
+MODS_NAMESPACE = mods.MODS_NAMESPACE
+XPATH_NAMESPACES = mods.Mods.ROOT_NAMESPACES
+MODS_PREFIX = '{%s}' % MODS_NAMESPACE
+ANY_MODS_ELEMENT = '%s*' % MODS_PREFIX
+
+STEP_PATTERN = re.compile(r'^mods:(?P<name>\w+)(\[(?P<predicate>.+)\])?$')
+ATTRIBUTE_EQUALS_PATTERN = re.compile(r'^@(?P<attribute>\w+)\s*=\s*"(?P<value>[^"]*)"$')
+ATTRIBUTE_MISSING_PATTERN = re.compile(r'^not\(@(?P<attribute>\w+)\)$')
+ATTRIBUTE_STARTS_WITH_PATTERN = re.compile(r'^starts-with\(@(?P<attribute>\w+),\s*"(?P<value>[^"]*)"\)$')
+
+
+def _compile_predicate(predicate):
+    '''The attribute tests our paths use - returns None for anything else'''
+    tests = []
+    for clause in predicate.split(' and '):
+        clause = clause.strip()
+        match = ATTRIBUTE_EQUALS_PATTERN.match(clause)
+        if match:
+            tests.append(lambda el, a=match['attribute'], v=match['value']: el.get(a) == v)
+            continue
+        match = ATTRIBUTE_MISSING_PATTERN.match(clause)
+        if match:
+            tests.append(lambda el, a=match['attribute']: el.get(a) is None)
+            continue
+        match = ATTRIBUTE_STARTS_WITH_PATTERN.match(clause)
+        if match:
+            tests.append(lambda el, a=match['attribute'], v=match['value']: (el.get(a) or '').startswith(v))
+            continue
+        return None
+    return lambda el: all(test(el) for test in tests)
+
+
+def _compile_path(path):
+    '''Split a path like 'mods:a[@type="x"]/mods:b' into (name, predicate) steps.
+    Returns None if the path needs a real XPath engine.'''
+    steps = []
+    for step in path.split('/'):
+        match = STEP_PATTERN.match(step)
+        if not match:
+            return None
+        predicate = None
+        if match['predicate']:
+            predicate = _compile_predicate(match['predicate'])
+            if predicate is None:
+                return None
+        steps.append((match['name'], predicate))
+    return steps
+
+
+def _children(node, name):
+    return list(node.iterchildren(MODS_PREFIX + name))
+
+
+def _first_child(node, name):
+    return next(node.iterchildren(MODS_PREFIX + name), None)
+
+
+def _first_text(node):
+    #same as the first text() node: text before the first child, or the first tail after it
+    if node.text is not None:
+        return node.text
+    for child in node:
+        if child.tail is not None:
+            return child.tail
+    return None
+
+
+def _string_value(node):
+    #same as XPath string()
+    if node is None:
+        return None
+    return ''.join(node.itertext())
+
+
+# the field types below map elements the same way as the eulxml fields of the same name
+
+def StringField(path):
+    if path == 'text()':
+        return property(lambda self: _first_text(self.node))
+    if path.startswith('@'):
+        return property(lambda self: self.node.get(path[1:]))
+    name = path.split(':', 1)[1]
+    return property(lambda self: _string_value(_first_child(self.node, name)))
+
+
+def NodeField(path, view_class):
+    name = path.split(':', 1)[1]
+    def get(self):
+        child = _first_child(self.node, name)
+        if child is not None:
+            return view_class(child)
+    return property(get)
+
+
+def NodeListField(path, view_class):
+    name = path.split(':', 1)[1]
+    return property(lambda self: [view_class(child) for child in _children(self.node, name)])
+
+
+class View:
+
+    def __init__(self, node):
+        self.node = node
+
+
+class LanguageTerm(View):
+    text = StringField('text()')
+    type = StringField('@type')
+    authority = StringField('@authority')
+
+
+class Language(View):
+    terms = NodeListField('mods:languageTerm', LanguageTerm)
+
+
+class Note(View):
+    text = StringField('text()')
+    type = StringField('@type')
+    label = StringField('@displayLabel')
+
+
+class SubLocation(View):
+    text = StringField('text()')
+
+
+class CopyInformation(View):
+    notes = NodeListField('mods:note', Note)
+    sublocations = NodeListField('mods:subLocation', SubLocation)
+
+
+class HoldingSimple(View):
+    copy_information = NodeListField('mods:copyInformation', CopyInformation)
+
+
+class PhysicalLocation(View):
+    text = StringField('text()')
+
+
+class Location(View):
+    physical = NodeField('mods:physicalLocation', PhysicalLocation)
+    holding_simple = NodeField('mods:holdingSimple', HoldingSimple)
+
+
+class TitleInfo(View):
+    title = StringField('mods:title')
+    subtitle = StringField('mods:subTitle')
+    part_number = StringField('mods:partNumber')
+    part_name = StringField('mods:partName')
+    non_sort = StringField('mods:nonSort')
+    type = StringField('@type')
+
+
+class PartDetail(View):
+    type = StringField('@type')
+    number = StringField('mods:number')
+    caption = StringField('mods:caption')
+
+
+class PartExtent(View):
+    unit = StringField('@unit')
+    start = StringField('mods:start')
+    end = StringField('mods:end')
+    total = StringField('mods:total')
+
+
+class Part(View):
+    details = NodeListField('mods:detail', PartDetail)
+    extent = NodeField('mods:extent', PartExtent)
+
+
+class PhysicalDescriptionForm(View):
+    text = StringField('text()')
+    type = StringField('@type')
+
+
+class PhysicalDescription(View):
+    forms = NodeListField('mods:form', PhysicalDescriptionForm)
+
+
+class Topic(View):
+    text = StringField('text()')
+
+
+class Temporal(View):
+    text = StringField('text()')
+
+
+class Subject(View):
+    authority = StringField('@authority')
+    label = StringField('@displayLabel')
+    topic_list = NodeListField('mods:topic', Topic)
+    temporal_list = NodeListField('mods:temporal', Temporal)
+
+
+class Genre(View):
+    text = StringField('text()')
+    authority = StringField('@authority')
+    type = StringField('@type')
+
+
+class Identifier(View):
+    text = StringField('text()')
+    type = StringField('@type')
+    label = StringField('@displayLabel')
+
+
+class RecordIdentifier(View):
+    text = StringField('text()')
+    source = StringField('@source')
+
+
+class RecordInfo(View):
+    record_identifier_list = NodeListField('mods:recordIdentifier', RecordIdentifier)
+
+
+class NamePart(View):
+    text = StringField('text()')
+    type = StringField('@type')
+
+
+class Role(View):
+    text = StringField('mods:roleTerm')
+
+    @property
+    def type(self):
+        #'mods:roleTerm/@type' - the first roleTerm that has a type
+        return next((term.get('type') for term in _children(self.node, 'roleTerm')
+                     if term.get('type') is not None), None)
+
+
+class Name(View):
+    name_parts = NodeListField('mods:namePart', NamePart)
+    roles = NodeListField('mods:role', Role)
+    display_form = StringField('mods:displayForm')
+
+
+class RelatedItem(View):
+    type = StringField('@type')
+
+
+class ModsTree(View):
+    '''The mods root, walked once: top-level fields come from the walk'''
+    id = StringField('@ID')
+
+    def __init__(self, node):
+        super().__init__(node)
+        self.paths = collections.defaultdict(list)
+        self._walk(node, ())
+
+    def _walk(self, node, path):
+        #depth-first, so each path's elements stay in document order
+        for child in node.iterchildren(ANY_MODS_ELEMENT):
+            child_path = path + (child.tag[len(MODS_PREFIX):],)
+            self.paths[child_path].append(child)
+            self._walk(child, child_path)
+
+    def top_level(self, name, view_class):
+        return [view_class(el) for el in self.paths[(name,)]]
+
+    languages = property(lambda self: self.top_level('language', Language))
+    locations = property(lambda self: self.top_level('location', Location))
+    title_info_list = property(lambda self: self.top_level('titleInfo', TitleInfo))
+    parts = property(lambda self: self.top_level('part', Part))
+    subjects = property(lambda self: self.top_level('subject', Subject))
+    notes = property(lambda self: self.top_level('note', Note))
+    genres = property(lambda self: self.top_level('genre', Genre))
+    identifiers = property(lambda self: self.top_level('identifier', Identifier))
+    record_info_list = property(lambda self: self.top_level('recordInfo', RecordInfo))
+    names = property(lambda self: self.top_level('name', Name))
+    related_items = property(lambda self: self.top_level('relatedItem', RelatedItem))
+
+    @property
+    def physical_description(self):
+        return next(iter(self.top_level('physicalDescription', PhysicalDescription)), None)
+
+
+class SinglePassModsIndexer(ModsIndexer):
+
+    def __init__(self, mods_bytes=None, mods_obj=None, node=None):
+        #pass node to index a plain lxml tree (eg. a constituent relatedItem)
+        if node is None:
+            if mods_obj is not None:
+                node = mods_obj.node
+            else:
+                #the same parser settings as eulxml's load_xmlobject_from_string
+                node = etree.fromstring(mods_bytes, etree.XMLParser(collect_ids=False))
+        self._node = node
+        #ModsIndexer's __init__ would parse into a Mods object - that's left for the xml property
+        CommonIndexer.__init__(self, mods_obj)
+        self.mods = ModsTree(node)
+
+    @property
+    def xml(self):
+        if self._xml is None:
+            self._xml = mods.Mods(self._node)
+        return self._xml
+
+    @xml.setter
+    def xml(self, xml_obj):
+        self._xml = xml_obj
+
+    def _xpath_namespaces(self):
+        return XPATH_NAMESPACES
+
+    def _constituent_indexer(self, constituent):
+        return type(self)(node=constituent.node)
+
+    def _compiled_path(self, path):
+        plans = self._class_cache('_path_plans')
+        if path not in plans:
+            plans[path] = _compile_path(path)
+        return plans[path]
+
+    def xpath(self, path, node=None, **variables):
+        steps = None
+        if not variables:
+            steps = self._compiled_path(path)
+        if steps is None:
+            return super().xpath(path, self._node if node is None else node, **variables)
+        if node is None:
+            #every element along the path is in the walk - just check the predicates on the way up
+            elements = self.mods.paths.get(tuple(name for name, _ in steps), [])
+            for depth, (_, predicate) in enumerate(reversed(steps)):
+                if predicate:
+                    elements = [el for el in elements if predicate(self._ancestor(el, depth))]
+            return elements
+        elements = [node]
+        for name, predicate in steps:
+            elements = [child for el in elements for child in _children(el, name)
+                        if predicate is None or predicate(child)]
+        return elements
+
+    def _ancestor(self, el, depth):
+        for _ in range(depth):
+            el = el.getparent()
+        return el
+
+    def _subject_subelements(self, subject):
+        #'mods:*//text()', keeping only text (not tail) nodes
+        return [el.text for child in subject.node.iterchildren(ANY_MODS_ELEMENT)
+                for el in child.iter(etree.Element) if el.text and el.text.strip()]
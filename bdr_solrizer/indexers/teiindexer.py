@@ -4,6 +4,7 @@ from .common import CommonIndexer, XPathMapper
 from .. import settings, utils
 
 class TEIIndexer(CommonIndexer):
+    INDEX_VERSION = 1
     PREFIX='tei'
 
     def __init__(self, tei_bytes):
@@ -37,29 +38,27 @@ class TEIIndexer(CommonIndexer):
         return self
 
     TYPE_MAP = ('//tei:msItem/@class', 'text_type_ssi', 's')
-    TYPE_DISPLAY_PATH ='//tei:category[@xml:id="{}"]/tei:catDesc'
+    TYPE_DISPLAY_PATH ='//tei:category[@xml:id=$category_id]/tei:catDesc'
     def index_text_type(self):
         mapper = XPathMapper(*(self.TYPE_MAP))
         mapper_values = self.value_from_mapper(mapper)
         if mapper_values:
             type_class = mapper_values[0]
-            new_path = self.TYPE_DISPLAY_PATH.format(type_class)
-            display_mapper = XPathMapper(new_path, 'text_type_display_ssi', 's')
+            display_mapper = XPathMapper(self.TYPE_DISPLAY_PATH, 'text_type_display_ssi', 's')
             self.append_from_xpathmapper(mapper)
-            self.append_from_xpathmapper(display_mapper)
+            self.append_from_xpathmapper(display_mapper, category_id=type_class)
         return self
 
     OBJECT_TYPE_MAP = ('//tei:physDesc/tei:objectDesc/@ana', 'object_type_ssi', 's')
-    OBJECT_TYPE_DISPLAY_PATH ='//tei:category[@xml:id="{}"]/tei:catDesc'
+    OBJECT_TYPE_DISPLAY_PATH ='//tei:category[@xml:id=$category_id]/tei:catDesc'
     def index_object_type(self):
         mapper = XPathMapper(*(self.OBJECT_TYPE_MAP))
         mapper_values = self.value_from_mapper(mapper)
         if mapper_values:
             type_class = mapper_values[0]
-            new_path = self.OBJECT_TYPE_DISPLAY_PATH.format(type_class)
-            display_mapper = XPathMapper(new_path, 'object_type_display_ssi', 's')
+            display_mapper = XPathMapper(self.OBJECT_TYPE_DISPLAY_PATH, 'object_type_display_ssi', 's')
             self.append_from_xpathmapper(mapper)
-            self.append_from_xpathmapper(display_mapper)
+            self.append_from_xpathmapper(display_mapper, category_id=type_class)
         return self
 
     LANGUAGE_MAP = [
@@ -3,14 +3,14 @@ import sys
 from redis import Redis
 from rq import Queue
 from rq.queue import get_failed_queue
-from . import settings
+from . import delete_ledger, settings
 
 HIGH_PRIORITY_Q = Queue(settings.HIGH, connection=Redis())
 MEDIUM_PRIORITY_Q = Queue(settings.MEDIUM, connection=Redis())
 LOW_PRIORITY_Q = Queue(settings.LOW, connection=Redis())
 FAILED_Q = get_failed_queue(connection=Redis())
 
-def queue_solrize_job(pid, action=settings.ADD_ACTION, priority=settings.HIGH):
+def _get_queue(action, priority):
     #start w/ default priority - only ADD_ACTION/DELETE_ACTION can be HIGH
     if action in [settings.ADD_ACTION, settings.DELETE_ACTION]:
         queue = HIGH_PRIORITY_Q
@@ -20,5 +20,37 @@ def queue_solrize_job(pid, action=settings.ADD_ACTION, priority=settings.HIGH):
         queue = MEDIUM_PRIORITY_Q
     elif priority == settings.LOW:
         queue = LOW_PRIORITY_Q
+    return queue
+
+
+def queue_depth():
+    '''number of jobs waiting in the queues'''
+    return sum(queue.count for queue in [HIGH_PRIORITY_Q, MEDIUM_PRIORITY_Q, LOW_PRIORITY_Q])
+
+
+def queued_pids():
+    '''pids of the solrize jobs waiting in the queues (single and batch jobs)'''
+    for queue in [HIGH_PRIORITY_Q, MEDIUM_PRIORITY_Q, LOW_PRIORITY_Q]:
+        for job in queue.jobs:
+            if job is None or not job.args:
+                continue
+            if job.func_name == settings.SOLRIZE_BATCH_FUNCTION:
+                yield from job.args[0]
+            elif job.func_name == settings.SOLRIZE_FUNCTION:
+                yield job.args[0]
+
+
+def queue_solrize_job(pid, action=settings.ADD_ACTION, priority=settings.HIGH):
+    queue = _get_queue(action, priority)
+    if action == settings.DELETE_ACTION:
+        #another delete job may get to it first (see delete_ledger)
+        delete_ledger.request_delete(pid)
     job = queue.enqueue_call(func=settings.SOLRIZE_FUNCTION, args=(pid,), kwargs={'action': action}, timeout=2880)
     return job
+
+
+def queue_solrize_batch_job(pids, action=settings.ADD_ACTION, priority=settings.HIGH):
+    #one job for a chunk of sibling objects (eg. the pages of a book that was just updated)
+    queue = _get_queue(action, priority)
+    job = queue.enqueue_call(func=settings.SOLRIZE_BATCH_FUNCTION, args=(pids,), kwargs={'action': action}, timeout=2880)
+    return job
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import threading
+from .logger import logger
+from .settings import RESOURCE_TYPES_DB_NAME
+
+
+IN_MEMORY_MAX_ROWS = 500000 #a db this size is a few tens of MB as a dict - bigger ones stay on disk
+BATCH_SIZE = 500 #pids per query, under sqlite's limit on query parameters
+
+
+class ResourceTypes:
+    '''Resource types by pid, from the sqlite db that csv_to_sqlite.py builds.
+
+    The db is opened read-only once per process. If it has up to max_in_memory_rows rows, it's
+    loaded into a dict and closed; otherwise lookups query the open connection. A new db file
+    (different mtime/size/inode) gets picked up on the next lookup.'''
+
+    def __init__(self, db_path, max_in_memory_rows=IN_MEMORY_MAX_ROWS):
+        self.db_path = db_path
+        self.max_in_memory_rows = max_in_memory_rows
+        self._signature = None
+        self._types = None
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.db_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+        self._db = None
+        self._types = None
+
+    def _load(self):
+        db = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False)
+        try:
+            row_count = db.execute('SELECT COUNT(*) FROM resource_types').fetchone()[0]
+            if row_count > self.max_in_memory_rows:
+                self._db, db = db, None
+                return
+            types = {}
+            for pid, resource_type in db.execute('SELECT pid, resource_type FROM resource_types ORDER BY rowid'):
+                types.setdefault(pid, resource_type)
+            self._types = types
+        finally:
+            if db is not None:
+                db.close()
+
+    def _refresh(self):
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        self._close()
+        self._signature = signature
+        if signature is None:
+            logger.warning(f'resource types db error: {self.db_path} not found')
+            return
+        try:
+            self._load()
+        except Exception as e:
+            logger.warning(f'resource types db error: {e}')
+
+    def get_many(self, pids):
+        '''{pid: resource_type} for the pids that have one'''
+        with self._lock:
+            self._refresh()
+            if self._types is not None:
+                return {pid: self._types[pid] for pid in pids if self._types.get(pid)}
+            if self._db is None:
+                return {}
+            pids = list(pids)
+            types = {}
+            try:
+                for i in range(0, len(pids), BATCH_SIZE):
+                    batch = pids[i:i+BATCH_SIZE]
+                    placeholders = ','.join('?' * len(batch))
+                    rows = self._db.execute(f'SELECT pid, resource_type FROM resource_types WHERE pid IN ({placeholders}) ORDER BY rowid', batch)
+                    for pid, resource_type in rows:
+                        types.setdefault(pid, resource_type)
+            except Exception as e:
+                logger.warning(f'resource types db error: {e}')
+            return {pid: resource_type for pid, resource_type in types.items() if resource_type}
+
+    def get(self, pid):
+        return self.get_many([pid]).get(pid)
+
+
+_resource_types = None
+
+
+def get_resource_types():
+    '''the process-wide ResourceTypes for RESOURCE_TYPES_DB_NAME'''
+    global _resource_types
+    if _resource_types is None:
+        _resource_types = ResourceTypes(RESOURCE_TYPES_DB_NAME)
+    return _resource_types
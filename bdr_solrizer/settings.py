@@ -13,10 +13,12 @@ SOLR_URL = get_env_variable('SOLR_ROOT')
 SOLR74_URL = get_env_variable('SOLR74_ROOT')
 COMMIT_WITHIN = get_env_variable('COMMIT_WITHIN')
 COMMIT_WITHIN_ADD = get_env_variable('COMMIT_WITHIN_ADD')
+COMMIT_WITHIN_MAX = int(os.environ.get('COMMIT_WITHIN_MAX', 300000)) #ceiling when commitWithin widens under load (ms)
 STORAGE_SERVICE_ROOT = get_env_variable('STORAGE_SERVICE_ROOT')
 STORAGE_SERVICE_PARAM = get_env_variable('STORAGE_SERVICE_PARAM')
 COLLECTION_URL = get_env_variable('COLLECTION_URL')
 COLLECTION_URL_PARAM = get_env_variable('COLLECTION_URL_PARAM')
+COLLECTION_API_TIMEOUT = float(os.environ.get('COLLECTION_API_TIMEOUT', 10)) #seconds - then a stale cached answer gets served
 CACHE_DIR = get_env_variable('CACHE_DIR')
 NOTIFICATION_EMAIL_ADDRESS = get_env_variable('NOTIFICATION_ADDRESS')
 ADD_ACTION = 'add'
@@ -25,6 +27,9 @@ ZIP_ACTION = 'zip'
 IMAGE_PARENT_ACTION = 'image_parent'
 BATCH_ACTION = 'batch_reindex'
 SOLRIZE_FUNCTION= 'bdr_solrizer.solrizer.solrize'
+SOLRIZE_BATCH_FUNCTION = 'bdr_solrizer.solrizer.solrize_batch'
+SOLRIZE_BATCH_SIZE = 100
+DELETE_BATCH_SIZE = 1000 #ids per solr delete command
 HIGH = 'high'
 MEDIUM = 'medium'
 LOW = 'low'
@@ -37,3 +42,13 @@ IMAGE_PARENT_FIELD = 'image_parent_bsi'
 BDR_BROWN = get_env_variable('BDR_BROWN')
 BDR_PUBLIC = get_env_variable('BDR_PUBLIC')
 OCFL_ROOT = get_env_variable('OCFL_ROOT')
+EXTRACTED_TEXT_MAX_LENGTH = int(os.environ.get('EXTRACTED_TEXT_MAX_LENGTH', 0)) or None #characters of extracted_text to index - unlimited by default
+SOLR_JSON_ENCODER = os.environ.get('SOLR_JSON_ENCODER', '') #json or orjson - defaults to the fastest one installed
+SOLR_GZIP_MIN_BYTES = int(os.environ.get('SOLR_GZIP_MIN_BYTES', 0)) or None #gzip update bodies at least this big - off by default, since solr has to be set up to inflate them
+SOLR_GZIP_LEVEL = int(os.environ.get('SOLR_GZIP_LEVEL', 1)) #higher levels barely shrink text docs more, for a lot more cpu
+USE_ZIP_LEDGER = os.environ.get('USE_ZIP_LEDGER', 'true').lower() in ('true', '1') #remember which ZIPs solr has, so zip jobs for unchanged ZIPs skip solr
+USE_IMAGE_PARENT_LEDGER = os.environ.get('USE_IMAGE_PARENT_LEDGER', 'true').lower() in ('true', '1') #one pending flag job per image parent, & none once it's flagged
+USE_DELETE_LEDGER = os.environ.get('USE_DELETE_LEDGER', 'true').lower() in ('true', '1') #the first queued delete job to run deletes the other waiting pids too, in one command
+ZIP_ENTRY_RUN_SIZE = int(os.environ.get('ZIP_ENTRY_RUN_SIZE', 100000)) #ZIP file names sorted in memory at a time - bigger listings get merged from temp files
+ZIP_FILELIST_MAX_ADD_BYTES = int(os.environ.get('ZIP_FILELIST_MAX_ADD_BYTES', 1024*1024)) #biggest cached zip file list (as JSON) an add carries over - bigger ones get a zip job, which streams them
+SOLR_BODY_MEMORY_BYTES = int(os.environ.get('SOLR_BODY_MEMORY_BYTES', 10*1024*1024)) #zip update bodies bigger than this are built & posted from a temp file
@@ -1,12 +1,12 @@
+import collections
 import datetime
+import hashlib
 import io
-import json
-import sqlite3
-import zipfile
+import shutil
 from lxml import etree
 from diskcache import Cache
 from bdrocfl import ocfl
-from rdflib import Graph, Namespace, URIRef
+from rdflib import Namespace, URIRef
 from bdrxml.rdfns import relsext as relsext_ns, model as model_ns
 from .indexers.irindexer import IRIndexer
 from .indexers import (
@@ -18,9 +18,11 @@ from .indexers import (
     FitsIndexer,
     TEIIndexer,
     CollectionIndexer,
-    parse_rdf_xml_into_graph,
+    RelsExt,
+    parse_rels_ext,
+    get_datastream_summary,
 )
-from . import utils
+from . import solrjson, utils, zip_entries
 from .settings import (
         CACHE_DIR,
         STORAGE_SERVICE_ROOT,
@@ -28,12 +30,25 @@ from .settings import (
         OCFL_ROOT,
         DATE_FIELD,
         RESOURCE_TYPE_FIELD,
-        RESOURCE_TYPES_DB_NAME,
+        EXTRACTED_TEXT_MAX_LENGTH,
+        ZIP_FILELIST_MAX_ADD_BYTES,
     )
 from .logger import logger
+from .resource_types import get_resource_types
 
 BUL_NS = Namespace(URIRef("http://library.brown.edu/#"))
 CACHE_EXPIRE_SECONDS = 60*60*24*30 #one month
+NEGATIVE_CACHE_EXPIRE_SECONDS = 60*10 #ten minutes - "not there" answers should be short-lived
+DESCRIPTIVE_DS_IDS = ['MODS', 'DWC', 'TEI']
+
+
+def _index_settings_hash(indexer_class):
+    #the values of the settings an indexer's output depends on, for its cache keys
+    index_settings = getattr(indexer_class, 'INDEX_SETTINGS', ())
+    return hashlib.sha1(repr(index_settings).encode('utf8')).hexdigest()[:12]
+
+
+DESCRIPTIVE_INDEX_VERSION = f'{ModsIndexer.INDEX_VERSION}.{SimpleDarwinRecordIndexer.INDEX_VERSION}.{TEIIndexer.INDEX_VERSION}.{_index_settings_hash(ModsIndexer)}'
 XML_NAMESPACES = {
     'mets': 'http://www.loc.gov/METS/'
 }
@@ -102,49 +117,205 @@ class StorageError(RuntimeError):
 
 
 def get_resource_type_from_db(pid):
-    try:
-        resource_types_db = sqlite3.connect(RESOURCE_TYPES_DB_NAME)
-        cursor = resource_types_db.cursor()
-        db_records = cursor.execute('SELECT resource_type FROM resource_types WHERE pid = ?', (pid,)).fetchall()
-        if db_records and db_records[0] and db_records[0][0]:
-            return db_records[0][0]
-    except Exception as e:
-        logger.warning(f'resource types db error: {e}')
+    return get_resource_types().get(pid)
 
 
-def _process_extracted_text(data, content_type):
-    if content_type and 'text/xml' in content_type:
-        text_to_index = []
-        parser = etree.XMLParser(recover=True)
-        xml_tree = etree.parse(io.BytesIO(data), parser)
-        root_label = xml_tree.getroot().get('LABEL')
-        if root_label:
-            text_to_index.append(root_label)
-        divs = xml_tree.getroot().findall('.//mets:div', XML_NAMESPACES)
-        for div in divs:
-            label = div.get('LABEL')
-            if label:
-                text_to_index.append(label)
-        return ' '.join(text_to_index)
-    else:
-        return data.decode('utf8')
+def _missing_object_cache_key(pid):
+    return f'{pid}_missing'
+
+
+def _absent_metadata_cache_key(pid):
+    return f'{pid}_absent_metadata'
+
+
+def _load_related_object(pid):
+    with Cache(CACHE_DIR) as negative_cache:
+        if negative_cache.get(_missing_object_cache_key(pid), False):
+            return None
+        try:
+            return StorageObject(pid, use_object_cache=True)
+        except (ObjectNotFound, ObjectDeleted):
+            negative_cache.set(_missing_object_cache_key(pid), True, expire=NEGATIVE_CACHE_EXPIRE_SECONDS)
+
+
+def get_related_object(pid, related_objects=None):
+    '''Return the StorageObject for a related pid (parent, original, ...), or None if it's not in storage.
+    A missing/deleted pid is remembered for a few minutes, so sibling jobs don't keep probing for it.
+    Siblings indexed in the same process can pass in a shared related_objects dict, so
+    their parent is only loaded once.'''
+    if related_objects is None:
+        return _load_related_object(pid)
+    if pid not in related_objects:
+        related_objects[pid] = _load_related_object(pid)
+    return related_objects[pid]
+
+
+def _zip_listing_cache_key(pid):
+    return f'{pid}_zip_listing'
+
+
+def get_zip_listing(storage_object):
+    '''{'checksum', 'timestamp'} from the last time this object's ZIP was indexed - or None if
+    there's no ZIP, or it changed since then (the names are cached by checksum, in zip_entries)'''
+    zip_ds_profile = storage_object.active_file_profiles.get('ZIP', None)
+    if not zip_ds_profile:
+        return None
+    with Cache(CACHE_DIR) as zip_cache:
+        listing = zip_cache.get(_zip_listing_cache_key(storage_object.pid), None)
+    if listing and listing['checksum'] == zip_ds_profile['checksum']:
+        return listing
+
+
+def save_zip_listing(pid, checksum, timestamp):
+    with Cache(CACHE_DIR) as zip_cache:
+        zip_cache.set(_zip_listing_cache_key(pid), {'checksum': checksum, 'timestamp': timestamp}, expire=CACHE_EXPIRE_SECONDS)
+
+
+def clear_missing_object_entry(pid):
+    '''Call when pid has been indexed, so its dependents look for it again.'''
+    with Cache(CACHE_DIR) as negative_cache:
+        negative_cache.delete(_missing_object_cache_key(pid))
+
+
+def clear_absent_metadata_entry(pid):
+    '''Call when one of pid's ancestors has been updated, so pid looks for inherited metadata again.'''
+    with Cache(CACHE_DIR) as negative_cache:
+        negative_cache.delete(_absent_metadata_cache_key(pid))
+
+
+class _RecentlyUsed:
+    '''Small in-process cache that drops the least recently used entry once it's full.'''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def add(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+#parsed RELS-EXT by pid+version, for objects that get loaded more than once in a process
+#(eg. a parent looked up by each of its children); the disk cache covers separate jobs
+_parsed_rels_ext = _RecentlyUsed(max_size=1000)
+
+
+class _TextCollector:
+    '''Text pieces that get joined with spaces, optionally cut off at max_length characters.'''
+
+    def __init__(self, max_length=None):
+        self.max_length = max_length
+        self.pieces = []
+        self.length = -1
+
+    def add(self, text):
+        self.pieces.append(text)
+        self.length += len(text) + 1
+
+    @property
+    def full(self):
+        return self.max_length is not None and self.length >= self.max_length
+
+    def text(self):
+        text = ' '.join(self.pieces)
+        if self.max_length is not None:
+            text = text[:self.max_length]
+        return text
+
+
+def _iterparse(data):
+    '''data can be bytes or a binary file'''
+    if isinstance(data, bytes):
+        data = io.BytesIO(data)
+    return etree.iterparse(data, events=('start', 'end'), recover=True)
+
+
+def _free_processed(element):
+    '''element has just ended: drop it and everything before it, except its ancestors.
+    Doing this every so often keeps the tree from growing, without paying for it on every element.'''
+    element.clear()
+    while True:
+        parent = element.getparent()
+        if parent is None:
+            break
+        del parent[:parent.index(element)]
+        element = parent
 
 
-def _extract_tei(data):
-    parser = etree.XMLParser(recover=True)
-    xml_tree = etree.parse(io.BytesIO(data), parser)
-    text_to_index = []
-    for element in xml_tree.iter(tag=etree.Element):
-        if element.text and element.text.strip():
-            text_to_index.append(element.text.strip())
-    return ' '.join(text_to_index)
+FREE_PROCESSED_EVERY = 1000 #elements
+
+
+def _process_extracted_text(data, content_type, max_length=None):
+    if content_type and 'text/xml' in content_type:
+        #METS: the root LABEL, then the LABEL of each mets:div
+        collector = _TextCollector(max_length)
+        div_tag = '{%s}div' % XML_NAMESPACES['mets']
+        root = None
+        ended = 0
+        for event, element in _iterparse(data):
+            if event == 'start':
+                if root is None:
+                    root = element
+                elif element.tag != div_tag:
+                    continue
+                label = element.get('LABEL')
+                if label:
+                    collector.add(label)
+                    if collector.full:
+                        break
+            else:
+                ended += 1
+                if ended % FREE_PROCESSED_EVERY == 0:
+                    _free_processed(element)
+        return collector.text()
+    else:
+        if not isinstance(data, bytes):
+            data = data.read()
+        collector = _TextCollector(max_length)
+        collector.add(data.decode('utf8'))
+        return collector.text()
+
+
+def _extract_tei(data, max_length=None):
+    '''All the element text, in document order'''
+    collector = _TextCollector(max_length)
+    #an element's text is complete by the next event (its first child starting, or its end)
+    started = None
+    ended = 0
+    for event, element in _iterparse(data):
+        if started is not None:
+            text = started.text
+            started = None
+            if text and text.strip():
+                collector.add(text.strip())
+                if collector.full:
+                    break
+        if event == 'start':
+            started = element
+        else:
+            ended += 1
+            if ended % FREE_PROCESSED_EVERY == 0:
+                _free_processed(element)
+    return collector.text()
 
 
 class StorageObject:
 
-    def __init__(self, pid, use_object_cache=False):
+    def __init__(self, pid, use_object_cache=False, related_objects=None):
         self.pid = pid
         self.use_object_cache = use_object_cache
+        self._related_objects = related_objects
         try:
             self._ocfl_object = ocfl.Object(OCFL_ROOT, self.pid)
         except ocfl.ObjectNotFound:
@@ -155,12 +326,18 @@ class StorageObject:
         self._active_file_profiles = None
         self._rels_ext = None
         self._files_info = None
+        self._datastream_summary = None
+        self._ancestors = None
+        self._absent_metadata = None
 
     def _get_files_info_or_error(self):
         files_info = {}
         files_info['object'] = {'created': self._ocfl_object.created, 'last_modified': self._ocfl_object.last_modified}
         files_info['files'] = self._ocfl_object.get_files_info(fields=['state', 'mimetype', 'size', 'checksum', 'checksumType', 'lastModified'])
         files_info['storage'] = 'ocfl'
+        #cached along with the files info, so re-indexing an unchanged object doesn't rebuild it
+        active_files = {filename: info for filename, info in files_info['files'].items() if info['state'] == 'A'}
+        files_info['datastreams'] = get_datastream_summary(active_files)
         logger.info(f'{self.pid} {self._ocfl_object.object_path} - version {self._ocfl_object.head_version}')
         return files_info
 
@@ -168,7 +345,10 @@ class StorageObject:
         #set the cache key to the pid+version - if anything in the object gets updated, the key will change and we'll get a cache miss
         cache_key = f'{self.pid}_{self._ocfl_object.head_version}'
         with Cache(CACHE_DIR) as object_cache:
-            files_info = object_cache.get(cache_key, None) if self.use_object_cache else None
+            files_info = object_cache.get(cache_key, None)
+            if files_info and not self.use_object_cache and files_info['object']['last_modified'] != self._ocfl_object.last_modified:
+                #the object being indexed makes sure the cached version is the one on disk (eg. not from a purged & re-created object)
+                files_info = None
             if files_info:
                 logger.info(f'{self.pid} cached files info')
             else:
@@ -176,6 +356,10 @@ class StorageObject:
                 object_cache.set(cache_key, files_info, expire=CACHE_EXPIRE_SECONDS)
         return files_info
 
+    @property
+    def head_version(self):
+        return self._ocfl_object.head_version
+
     @property
     def files_info(self):
         if not self._files_info:
@@ -204,14 +388,38 @@ class StorageObject:
     def modified(self):
         return self.files_info['object']['last_modified']
 
+    @property
+    def datastream_summary(self):
+        '''{'ds_ids': [...], 'ds_info': <json string>, 'size': <str>} for the active datastreams'''
+        if self._datastream_summary is None:
+            #files info cached before the summary was added to it won't have one
+            self._datastream_summary = self.files_info.get('datastreams') or get_datastream_summary(self.active_file_profiles)
+        return self._datastream_summary
+
+    def _parse_rels_ext(self):
+        try:
+            return parse_rels_ext(self.get_file_contents('RELS-EXT'))
+        except FileNotFoundError:
+            logger.warning(f'{self.pid} has no RELS-EXT')
+            return RelsExt()
+
+    def _get_rels_ext(self):
+        #a version never changes, so the parsed RELS-EXT for pid+version is good until it expires
+        cache_key = f'{self.pid}_{self.head_version}_rels_ext'
+        rels_ext = _parsed_rels_ext.get(cache_key)
+        if rels_ext is None:
+            with Cache(CACHE_DIR) as rels_ext_cache:
+                rels_ext = rels_ext_cache.get(cache_key, None)
+                if rels_ext is None:
+                    rels_ext = self._parse_rels_ext()
+                    rels_ext_cache.set(cache_key, rels_ext, expire=CACHE_EXPIRE_SECONDS)
+            _parsed_rels_ext.add(cache_key, rels_ext)
+        return rels_ext
+
     @property
     def rels_ext(self):
-        if not self._rels_ext:
-            try:
-                self._rels_ext = parse_rdf_xml_into_graph(self.get_file_contents('RELS-EXT'))
-            except FileNotFoundError:
-                logger.warning(f'{self.pid} has no RELS-EXT')
-                self._rels_ext = Graph()
+        if self._rels_ext is None:
+            self._rels_ext = self._get_rels_ext()
         return self._rels_ext
 
     @property
@@ -233,10 +441,7 @@ class StorageObject:
     @property
     def parent_object(self):
         if self.parent_pid:
-            try:
-                return StorageObject(self.parent_pid, use_object_cache=True)
-            except (ObjectNotFound, ObjectDeleted):
-                pass
+            return get_related_object(self.parent_pid, self._related_objects)
 
     @property
     def original_pid(self):
@@ -247,10 +452,7 @@ class StorageObject:
     @property
     def original_object(self):
         if self.original_pid:
-            try:
-                return StorageObject(self.original_pid, use_object_cache=True)
-            except (ObjectNotFound, ObjectDeleted):
-                pass
+            return get_related_object(self.original_pid, self._related_objects)
 
     @property
     def original_for_transcript_pid(self):
@@ -261,10 +463,7 @@ class StorageObject:
     @property
     def original_for_transcript_object(self):
         if self.original_for_transcript_pid:
-            try:
-                return StorageObject(self.original_for_transcript_pid, use_object_cache=True)
-            except (ObjectNotFound, ObjectDeleted):
-                pass
+            return get_related_object(self.original_for_transcript_pid, self._related_objects)
 
     @property
     def original_for_translation_pid(self):
@@ -275,14 +474,13 @@ class StorageObject:
     @property
     def original_for_translation_object(self):
         if self.original_for_translation_pid:
-            try:
-                return StorageObject(self.original_for_translation_pid, use_object_cache=True)
-            except (ObjectNotFound, ObjectDeleted):
-                pass
+            return get_related_object(self.original_for_translation_pid, self._related_objects)
 
     @property
     def ancestors(self):
-        return [self.original_object, self.original_for_transcript_object, self.original_for_translation_object, self.parent_object]
+        if self._ancestors is None:
+            self._ancestors = [self.original_object, self.original_for_transcript_object, self.original_for_translation_object, self.parent_object]
+        return self._ancestors
 
     def is_image_child(self):
         if self.parent_pid:
@@ -305,23 +503,61 @@ class StorageObject:
                 content_cache.set(cache_key, content, expire=CACHE_EXPIRE_SECONDS)
             return content
 
-    def get_file_contents_with_content_type(self, filename):
+    def get_content_type(self, filename, file_start):
+        '''file_start is at least the first 5 bytes of the file'''
         mimetype = self.files_info['files'][filename]['mimetype']
-        contents = self.get_file_contents(filename)
         if mimetype == 'application/octet-stream':
-            if contents[:5] == b'<?xml':
+            if file_start[:5] == b'<?xml':
                 mimetype = 'text/xml'
-        return contents, mimetype
+        return mimetype
+
+    def get_file_contents_with_content_type(self, filename):
+        contents = self.get_file_contents(filename)
+        return contents, self.get_content_type(filename, contents)
+
+    def open_file(self, filename):
+        '''For streaming big files, instead of loading them with get_file_contents'''
+        try:
+            return open(self._ocfl_object.get_path_to_file(filename), 'rb')
+        except FileNotFoundError:
+            raise FileNotFoundError(f'{self.pid}/{filename} not found in ocfl repo')
 
     def get_path_to_file(self, filename):
         return self._ocfl_object.get_path_to_file(filename)
 
-    def get_metadata_bytes_to_index(self, ds_id):
+    @property
+    def absent_metadata(self):
+        '''metadata ds_ids that neither this object (at its current version) nor its ancestors have'''
+        if self._absent_metadata is None:
+            with Cache(CACHE_DIR) as negative_cache:
+                absent_info = negative_cache.get(_absent_metadata_cache_key(self.pid), None)
+            if absent_info and absent_info['version'] == self.head_version:
+                self._absent_metadata = absent_info['ds_ids']
+            else:
+                self._absent_metadata = []
+        return self._absent_metadata
+
+    def _add_absent_metadata(self, ds_id):
+        self.absent_metadata.append(ds_id)
+        absent_info = {'version': self.head_version, 'ds_ids': self.absent_metadata}
+        with Cache(CACHE_DIR) as negative_cache:
+            negative_cache.set(_absent_metadata_cache_key(self.pid), absent_info, expire=NEGATIVE_CACHE_EXPIRE_SECONDS)
+
+    def get_metadata_object(self, ds_id):
+        '''return this object or the first ancestor that has the ds_id metadata'''
         if ds_id in self.active_file_names:
-            return self.get_file_contents(ds_id)
+            return self
+        if ds_id in self.absent_metadata:
+            return
         for ancestor in self.ancestors:
             if ancestor and (ds_id in ancestor.active_file_names):
-                return ancestor.get_file_contents( ds_id)
+                return ancestor
+        self._add_absent_metadata(ds_id)
+
+    def get_metadata_bytes_to_index(self, ds_id):
+        metadata_object = self.get_metadata_object(ds_id)
+        if metadata_object:
+            return metadata_object.get_file_contents(ds_id)
 
 
 class SolrDocBuilder:
@@ -336,9 +572,18 @@ class SolrDocBuilder:
     def get_primary_title_dwc(self, descriptive_index):
         return descriptive_index.get('dwc_accepted_name_usage_ssi', '')
 
-    def _get_mods_index_data(self, mods_bytes):
-        mods_indexer = ModsIndexer(mods_bytes)
-        return mods_indexer.index_data()
+    def _get_index_data(self, indexer_class, storage_object, ds_id):
+        '''Indexer output only depends on the datastream contents, so cache it by checksum (& its type)
+        - and the indexer's INDEX_VERSION, which gets bumped whenever the indexer output changes, & the
+        values of any settings it reads (INDEX_SETTINGS).'''
+        file_info = storage_object.files_info['files'][ds_id]
+        cache_key = f'{indexer_class.__name__}_{indexer_class.INDEX_VERSION}_{_index_settings_hash(indexer_class)}_{file_info["checksumType"]}_{file_info["checksum"]}'
+        with Cache(CACHE_DIR) as index_cache:
+            index_data = index_cache.get(cache_key, None)
+            if index_data is None:
+                index_data = indexer_class(storage_object.get_file_contents(ds_id)).index_data()
+                index_cache.set(cache_key, index_data, expire=CACHE_EXPIRE_SECONDS)
+        return index_data
 
     def _add_dwc_index_data(self, dwc_bytes, descriptive_index):
         descriptive_index.update(
@@ -356,25 +601,44 @@ class SolrDocBuilder:
              TEIIndexer(tei_bytes).index_data()
         )
 
-    def descriptive_data(self):
+    def _build_descriptive_data(self, metadata_objects):
         descriptive_index = {}
 
-        mods_bytes = self.storage_object.get_metadata_bytes_to_index('MODS')
-        if mods_bytes:
+        if 'MODS' in metadata_objects:
             descriptive_index.update(
-                self._get_mods_index_data(mods_bytes)
+                self._get_index_data(ModsIndexer, metadata_objects['MODS'], 'MODS')
             )
 
-        dwc_bytes = self.storage_object.get_metadata_bytes_to_index('DWC')
-        if dwc_bytes:
+        if 'DWC' in metadata_objects:
+            dwc_bytes = metadata_objects['DWC'].get_file_contents('DWC')
             self._add_dwc_index_data(dwc_bytes, descriptive_index)
 
-        tei_bytes = self.storage_object.get_metadata_bytes_to_index('TEI')
-        if tei_bytes:
+        if 'TEI' in metadata_objects:
+            tei_bytes = metadata_objects['TEI'].get_file_contents('TEI')
             self._add_tei_index_data(tei_bytes, descriptive_index)
 
         return descriptive_index
 
+    def descriptive_data(self):
+        metadata_objects = {}
+        for ds_id in DESCRIPTIVE_DS_IDS:
+            metadata_object = self.storage_object.get_metadata_object(ds_id)
+            if metadata_object:
+                metadata_objects[ds_id] = metadata_object
+        ancestor_pids = {metadata_object.pid for metadata_object in metadata_objects.values()}
+        if len(ancestor_pids) == 1 and self.pid not in ancestor_pids:
+            #all the metadata is inherited from one ancestor (eg. pages of a book), so all its children
+            # can share the same descriptive index, until the ancestor gets updated
+            ancestor = list(metadata_objects.values())[0]
+            cache_key = f'{ancestor.pid}_{ancestor.head_version}_descriptive_{"_".join(metadata_objects.keys())}_{DESCRIPTIVE_INDEX_VERSION}'
+            with Cache(CACHE_DIR) as descriptive_cache:
+                descriptive_index = descriptive_cache.get(cache_key, None)
+                if descriptive_index is None:
+                    descriptive_index = self._build_descriptive_data(metadata_objects)
+                    descriptive_cache.set(cache_key, descriptive_index, expire=CACHE_EXPIRE_SECONDS)
+            return descriptive_index
+        return self._build_descriptive_data(metadata_objects)
+
     def _add_all_fields(self, doc, new_data):
         for key, value in new_data.items():
             key = key.strip()
@@ -392,6 +656,9 @@ class SolrDocBuilder:
                 doc[key] = value
 
     def get_solr_doc(self):
+        return solrjson.dumps({'add': {'doc': self.get_solr_doc_fields()}})
+
+    def get_solr_doc_fields(self):
         doc = {'all_ds_ids_ssim': self.storage_object.all_file_names}
 
         storage_fields = StorageIndexer(self.storage_object).index_data()
@@ -404,25 +671,23 @@ class SolrDocBuilder:
             )
 
         if 'irMetadata' in self.storage_object.active_file_names:
-            ir_data = IRIndexer(self.storage_object.get_file_contents('irMetadata')).index_data()
+            ir_data = self._get_index_data(IRIndexer, self.storage_object, 'irMetadata')
             self._add_all_fields(doc, ir_data)
 
         if 'rightsMetadata' in self.storage_object.active_file_names:
             self._add_all_fields(
                 doc,
-                RightsIndexer(self.storage_object.get_file_contents('rightsMetadata')).index_data()
+                self._get_index_data(RightsIndexer, self.storage_object, 'rightsMetadata')
             )
 
         if 'FITS' in self.storage_object.active_file_names:
-            fits_contents = self.storage_object.get_file_contents('FITS')
             self._add_all_fields(doc,
-                FitsIndexer(fits_contents).index_data()
+                self._get_index_data(FitsIndexer, self.storage_object, 'FITS')
             )
 
         if 'collection_info' in self.storage_object.active_file_names:
-            contents = self.storage_object.get_file_contents('collection_info')
             self._add_all_fields(doc,
-                CollectionIndexer(contents).index_data()
+                self._get_index_data(CollectionIndexer, self.storage_object, 'collection_info')
             )
 
         extracted_text_data = None
@@ -460,18 +725,27 @@ class SolrDocBuilder:
                     resource_type = PRIMO_RESOURCE_TYPE_MAPPING.get(mods_type_of_resource[0].lower(), 'other')
                     doc[RESOURCE_TYPE_FIELD] = resource_type
 
-        return json.dumps({'add': {'doc': doc}})
+        #an add replaces the whole doc - carry over the zip file list if the ZIP hasn't changed, so no zip job is needed
+        #(a huge list is left to the zip job, which streams it)
+        zip_listing = get_zip_listing(self.storage_object)
+        if zip_listing:
+            entries = zip_entries.load(zip_listing['checksum'], max_bytes=ZIP_FILELIST_MAX_ADD_BYTES)
+            if entries is not None:
+                doc['zip_filelist_ssim'] = entries
+                doc['zip_filelist_timestamp_dsi'] = zip_listing['timestamp']
+
+        return doc
 
     def _get_extracted_text_for_indexing(self, ds_id):
-        data, content_type = self.storage_object.get_file_contents_with_content_type(ds_id)
-        try:
-            if ds_id == 'TEI':
-                return _extract_tei(data)
-            else:
-                return _process_extracted_text(data, content_type)
-        except Exception:
-            import traceback
-            logger.error(f'{self.pid} {ds_id} error extracting text: {traceback.format_exc()}')
+        with self.storage_object.open_file(ds_id) as f:
+            try:
+                if ds_id == 'TEI':
+                    return _extract_tei(f, EXTRACTED_TEXT_MAX_LENGTH)
+                content_type = self.storage_object.get_content_type(ds_id, f.peek(5))
+                return _process_extracted_text(f, content_type, EXTRACTED_TEXT_MAX_LENGTH)
+            except Exception:
+                import traceback
+                logger.error(f'{self.pid} {ds_id} error extracting text: {traceback.format_exc()}')
 
 
 class ZipIndexer:
@@ -481,7 +755,7 @@ class ZipIndexer:
         self.storage_object = storage_object
         self.existing_solr_doc = existing_solr_doc
 
-    def _zip_index_needed(self):
+    def zip_index_needed(self):
         if 'zip_filelist_timestamp_dsi' in self.existing_solr_doc:
             zip_filelist_timestamp = utils.utc_datetime_from_string(self.existing_solr_doc['zip_filelist_timestamp_dsi'])
             zip_ds_profile = self.storage_object.active_file_profiles.get('ZIP', None)
@@ -494,18 +768,19 @@ class ZipIndexer:
                 return False
         return True
 
-    def zip_index_data(self):
-        if not self._zip_index_needed():
-            return
-        path = self.storage_object.get_path_to_file('ZIP')
-        zip_object = zipfile.ZipFile(path, mode='r')
-        entry_names = [entry for entry in zip_object.namelist() if not entry.endswith('/')]
-        return json.dumps({
-                'add': {
-                    'doc': {
-                        'pid': self.pid,
-                        'zip_filelist_ssim': {'set': sorted(entry_names)},
-                        'zip_filelist_timestamp_dsi': {'set': utils.utc_datetime_to_solr_string(datetime.datetime.utcnow())},
-                    },
-                }
-            })
+    @property
+    def zip_last_modified(self):
+        '''the ZIP's lastModified as a solr date string, or None if there's no ZIP'''
+        zip_ds_profile = self.storage_object.active_file_profiles.get('ZIP', None)
+        if zip_ds_profile:
+            return utils.utc_datetime_to_solr_string(zip_ds_profile['lastModified'])
+
+    def write_zip_index_doc(self, out):
+        '''write the atomic update doc for the zip file list to out (as JSON), a chunk of the file list at a time'''
+        checksum = self.storage_object.active_file_profiles['ZIP']['checksum']
+        with zip_entries.open_json_fragment(checksum, self.storage_object.get_path_to_file('ZIP')) as fragment:
+            timestamp = utils.utc_datetime_to_solr_string(datetime.datetime.utcnow())
+            out.write(b'{"pid":' + solrjson.dumps(self.pid) + b',"zip_filelist_ssim":{"set":[')
+            shutil.copyfileobj(fragment, out, zip_entries.COPY_CHUNK_SIZE)
+            out.write(b']},"zip_filelist_timestamp_dsi":{"set":' + solrjson.dumps(timestamp) + b'}}')
+        save_zip_listing(self.pid, checksum, timestamp)
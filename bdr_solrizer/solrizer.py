@@ -1,21 +1,56 @@
 from datetime import datetime
-import json
+import io
+import tempfile
+import time
+from urllib.parse import quote
 import requests
+import zlib
 
 from .logger import logger, error_logger
 from .settings import (
     SOLR74_URL,
-    COMMIT_WITHIN,
-    COMMIT_WITHIN_ADD,
     ADD_ACTION,
     DELETE_ACTION,
     ZIP_ACTION,
     IMAGE_PARENT_ACTION,
     IMAGE_PARENT_FIELD,
     IIIF_RESOURCE_FIELD,
+    SOLRIZE_BATCH_SIZE,
+    DELETE_BATCH_SIZE,
+    SOLR_GZIP_MIN_BYTES,
+    SOLR_GZIP_LEVEL,
+    SOLR_BODY_MEMORY_BYTES,
 )
-from .solrdocbuilder import StorageObject, SolrDocBuilder, ZipIndexer, ObjectNotFound, ObjectDeleted
-from .queues import queue_solrize_job
+from .solrdocbuilder import StorageObject, SolrDocBuilder, ZipIndexer, ObjectNotFound, ObjectDeleted, clear_missing_object_entry, clear_absent_metadata_entry
+from .queues import queue_solrize_job, queue_solrize_batch_job
+from . import commit_policy, delete_ledger, image_parent_ledger, solrjson, zip_ledger
+
+
+def gzip_update_body(data, min_bytes, level):
+    '''(body, headers) for posting data to solr - gzipped if it's at least min_bytes'''
+    if not min_bytes or len(data) < min_bytes:
+        return data, {}
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) #gzip container, which is what Content-Encoding: gzip means
+    return compressor.compress(data) + compressor.flush(), {'Content-Encoding': 'gzip'}
+
+
+def update_body_from_file(body_file, min_bytes, level):
+    '''(body, headers) for posting the update in body_file (a SpooledTemporaryFile with max_size
+    SOLR_BODY_MEMORY_BYTES) - a body that's still in memory goes as bytes, a bigger one is posted
+    (& gzipped) from disk, a chunk at a time'''
+    size = body_file.seek(0, io.SEEK_END)
+    body_file.seek(0)
+    if size <= SOLR_BODY_MEMORY_BYTES:
+        return gzip_update_body(body_file.read(), min_bytes, level)
+    if not min_bytes or size < min_bytes:
+        return body_file, {}
+    gzipped = tempfile.TemporaryFile()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in iter(lambda: body_file.read(io.DEFAULT_BUFFER_SIZE * 128), b''):
+        gzipped.write(compressor.compress(chunk))
+    gzipped.write(compressor.flush())
+    gzipped.seek(0)
+    return gzipped, {'Content-Encoding': 'gzip'}
 
 
 class Solrizer:
@@ -23,10 +58,15 @@ class Solrizer:
     def __init__(self, solr_url, pid):
         self.solr_url = solr_url
         self.pid = pid
+        self._queued_image_parents = set()
 
     def process(self, action):
         if action == DELETE_ACTION:
-            self._delete_solr_document(self.pid)
+            #checks the ledger before posting anything
+            self._delete_queued_solr_documents()
+        elif action == IMAGE_PARENT_ACTION:
+            #checks the ledger before loading anything
+            self._index_image_parents()
         else:
             try:
                 storage_object = StorageObject(self.pid)
@@ -40,86 +80,300 @@ class Solrizer:
                 return
             if action == ZIP_ACTION:
                 self._index_zip(storage_object)
-            elif action == IMAGE_PARENT_ACTION:
-                self._index_image_parent(storage_object)
             else:
                 self._update_solr_document(storage_object, action)
 
     def _delete_solr_document(self, pid):
         logger.info(f'  deleting {pid} from solr')
-        data = json.dumps({'delete': {'id': pid}})
-        self._post_to_solr(data, DELETE_ACTION)
+        data = solrjson.dumps({'delete': {'id': pid}})
+        self._post_single_doc_to_solr(data, DELETE_ACTION)
+        image_parent_ledger.forget([pid])
+
+    def _delete_queued_solr_documents(self):
+        if delete_ledger.job_started(self.pid):
+            logger.info(f'  {self.pid} was already deleted from solr by another delete job')
+            return
+        #delete the other pids waiting for their delete jobs too - their jobs will skip
+        others = [pid for pid in delete_ledger.take_pending(DELETE_BATCH_SIZE - 1) if pid != self.pid]
+        if not others:
+            self._delete_solr_document(self.pid)
+            return
+        delete_ledger.record_taken(others)
+        try:
+            self._delete_solr_documents([self.pid] + others)
+        except Exception:
+            delete_ledger.release(others)
+            raise
+
+    def _delete_solr_documents(self, pids):
+        #one delete command per chunk of ids, instead of a request per pid
+        for i in range(0, len(pids), DELETE_BATCH_SIZE):
+            chunk = pids[i:i+DELETE_BATCH_SIZE]
+            logger.info(f'  deleting {len(chunk)} objects ({chunk[0]}...) from solr')
+            self._post_to_solr(solrjson.dumps({'delete': chunk}), DELETE_ACTION)
+            image_parent_ledger.forget(chunk)
 
     def _update_solr_document(self, storage_object, action):
         logger.info(f'  adding/updating {self.pid} in solr (action is {action})')
-        sdb = SolrDocBuilder(storage_object)
-        doc = sdb.get_solr_doc()
-        self._post_to_solr(doc, action)
-        self._queue_dependent_object_jobs(self.pid, action)
-        #automatically queue a zip job if there's a ZIP file - the zip indexing code will check if we really need to index the zip contents
-        if 'ZIP' in storage_object.active_file_names:
-            queue_solrize_job(self.pid, action=ZIP_ACTION)
+        doc = SolrDocBuilder(storage_object).get_solr_doc_fields()
+        self._post_single_doc_to_solr(solrjson.dumps({'add': {'doc': doc}}), action)
+        self._queue_follow_up_jobs(storage_object, doc, action)
+
+    def _queue_follow_up_jobs(self, storage_object, doc, action, queue_zip_job=True):
+        pid = storage_object.pid
+        #this object exists now, so it shouldn't be remembered as missing by any of its dependents
+        clear_missing_object_entry(pid)
+        #the new doc doesn't have the image parent flags (if it had them) - forget them before any
+        #child job gets queued, or the child would find its parent still flagged
+        image_parent_ledger.forget([pid])
+        self._queue_dependent_object_jobs(pid, action)
+        if 'zip_filelist_timestamp_dsi' in doc:
+            #the doc carried over the file list of the unchanged ZIP
+            zip_ledger.record({pid: ZipIndexer(storage_object, existing_solr_doc=None).zip_last_modified})
+        else:
+            #the new doc replaced the zip file list (if there was one)
+            zip_ledger.forget([pid])
+            #queue a zip job if there's a ZIP file - the zip indexing code will check if we really need to index the zip contents
+            if queue_zip_job and 'ZIP' in storage_object.active_file_names:
+                queue_solrize_job(pid, action=ZIP_ACTION)
         if storage_object.is_image_child():
-            queue_solrize_job(storage_object.parent_pid, action=IMAGE_PARENT_ACTION)
+            #siblings in a batch share a parent - only queue its job once (& not at all if one's pending, or it's flagged)
+            if storage_object.parent_pid not in self._queued_image_parents:
+                if image_parent_ledger.request_flag(storage_object.parent_pid):
+                    queue_solrize_job(storage_object.parent_pid, action=IMAGE_PARENT_ACTION)
+                self._queued_image_parents.add(storage_object.parent_pid)
 
     def _index_zip(self, storage_object):
         logger.info(f'  indexing zip for {self.pid} in solr')
-        existing_solr_doc = self._get_existing_solr_doc(self.pid)
-        zip_file_data = ZipIndexer(storage_object, existing_solr_doc=existing_solr_doc).zip_index_data()
-        if zip_file_data:
-            self._post_to_solr(zip_file_data, ZIP_ACTION)
-
-    def _index_image_parent(self, storage_object):
-        logger.info(f'  indexing image parent flag for {self.pid} in solr')
-        doc = {
-            'add': {
-                'doc': {
-                    'pid': self.pid,
-                    IMAGE_PARENT_FIELD: {'set': True},
-                    IIIF_RESOURCE_FIELD: {'set': True},
-                }
-            }
-        }
-        data = json.dumps(doc)
-        self._post_to_solr(data, IMAGE_PARENT_ACTION)
+        self._index_zips([storage_object])
 
-    def _queue_dependent_object_jobs(self, pid, action):
+    def _index_zips(self, storage_objects, requeue_failures=False):
+        '''requeue_failures: queue a separate job for an object whose ZIP can't be indexed, instead of failing
+        (for batches)'''
+        zip_indexers = [ZipIndexer(storage_object, existing_solr_doc=None) for storage_object in storage_objects]
+        for zip_indexer in zip_indexers:
+            if zip_indexer.zip_last_modified is None:
+                logger.info(f'  {zip_indexer.pid} has no ZIP')
+        #skip the ZIPs the ledger says solr already has
+        indexed = zip_ledger.indexed_zips([zip_indexer.pid for zip_indexer in zip_indexers if zip_indexer.zip_last_modified])
+        zip_indexers = [z for z in zip_indexers if z.zip_last_modified and indexed.get(z.pid) != z.zip_last_modified]
+        if not zip_indexers:
+            return
+        existing_solr_docs = self._get_existing_solr_docs([zip_indexer.pid for zip_indexer in zip_indexers])
+        #the file lists go straight into the body, which only moves to disk if it gets big
+        with tempfile.SpooledTemporaryFile(max_size=SOLR_BODY_MEMORY_BYTES) as body:
+            body.write(b'[')
+            indexed_pids = []
+            zips = {}
+            for zip_indexer in zip_indexers:
+                zip_indexer.existing_solr_doc = existing_solr_docs.get(zip_indexer.pid, {})
+                if zip_indexer.zip_index_needed():
+                    position = body.tell()
+                    try:
+                        if indexed_pids:
+                            body.write(b',')
+                        zip_indexer.write_zip_index_doc(body)
+                    except Exception as e:
+                        if not requeue_failures:
+                            raise
+                        logger.error(f'{zip_indexer.pid} zip failed in batch - queuing it separately: {e}')
+                        body.seek(position)
+                        body.truncate()
+                        queue_solrize_job(zip_indexer.pid, action=ZIP_ACTION)
+                        continue
+                    indexed_pids.append(zip_indexer.pid)
+                zips[zip_indexer.pid] = zip_indexer.zip_last_modified
+            body.write(b']')
+            #recorded before posting - an add that lands after the post forgets it again
+            zip_ledger.record(zips)
+            if indexed_pids:
+                try:
+                    self._post_to_solr(body, ZIP_ACTION)
+                except Exception:
+                    zip_ledger.forget(indexed_pids)
+                    raise
+
+    def _index_image_parents(self):
+        image_parent_ledger.job_started(self.pid)
+        if image_parent_ledger.is_flagged(self.pid):
+            logger.info(f'  image parent flag for {self.pid} is already set')
+            return
+        #flag the other parents waiting for a job too - their jobs will find them flagged
+        others = image_parent_ledger.take_pending(SOLRIZE_BATCH_SIZE - 1)
+        pids = [self.pid] + [pid for pid in others if pid != self.pid]
+        docs = []
+        for pid in pids:
+            try:
+                StorageObject(pid)
+            except (ObjectNotFound, ObjectDeleted):
+                #if object isn't in storage (or is Deleted), it shouldn't be in solr either
+                if pid == self.pid:
+                    self._delete_solr_document(pid)
+                continue
+            docs.append({
+                'pid': pid,
+                IMAGE_PARENT_FIELD: {'set': True},
+                IIIF_RESOURCE_FIELD: {'set': True},
+            })
+        if not docs:
+            return
+        logger.info(f'  indexing image parent flag for {len(docs)} objects ({self.pid}...) in solr')
+        flagged_pids = [doc['pid'] for doc in docs]
+        #recorded before posting - an add that lands after the post forgets it again
+        image_parent_ledger.record_flagged(flagged_pids)
+        try:
+            self._post_to_solr(solrjson.dumps(docs), IMAGE_PARENT_ACTION)
+        except Exception:
+            image_parent_ledger.forget(flagged_pids)
+            raise
+
+    def _get_dependent_pids(self, pid):
         query = f'rel_is_derivation_of_ssim:"{pid}"+OR+rel_is_part_of_ssim:"{pid}"'
-        r = requests.get(f'{self.solr_url}select/?q={query}')
-        if r.ok:
+        dependent_pids = []
+        #a cursor (on a stable sort) doesn't skip or repeat children when other workers update docs between pages
+        cursor_mark = '*'
+        while True:
+            r = requests.get(f'{self.solr_url}select/?q={query}&fl=pid&rows={SOLRIZE_BATCH_SIZE}&sort=pid+asc&cursorMark={quote(cursor_mark, safe="")}')
+            if not r.ok:
+                logger.error(f'error getting dependent objects from solr: {r.status_code} - {r.text}')
+                break
             info = r.json()
-            for d in info['response']['docs']:
-                queue_solrize_job(d['pid'], action=action)
+            docs = info['response']['docs']
+            dependent_pids.extend([d['pid'] for d in docs])
+            if len(docs) < SOLRIZE_BATCH_SIZE or info['nextCursorMark'] == cursor_mark:
+                break
+            cursor_mark = info['nextCursorMark']
+        return dependent_pids
+
+    def _queue_dependent_object_jobs(self, pid, action):
+        dependent_pids = self._get_dependent_pids(pid)
+        for dependent_pid in dependent_pids:
+            #the dependent may have cached that it found no metadata to inherit from this object
+            clear_absent_metadata_entry(dependent_pid)
+        if len(dependent_pids) == 1:
+            queue_solrize_job(dependent_pids[0], action=action)
         else:
-            logger.error(f'error getting dependent objects from solr: {r.status_code} - {r.text}')
+            for i in range(0, len(dependent_pids), SOLRIZE_BATCH_SIZE):
+                queue_solrize_batch_job(dependent_pids[i:i+SOLRIZE_BATCH_SIZE], action=action)
 
     def _get_post_url(self, action):
-        commitWithin = COMMIT_WITHIN
-        if action in [ADD_ACTION, DELETE_ACTION]:
-            commitWithin = COMMIT_WITHIN_ADD
+        commitWithin = commit_policy.current_commit_within(action)
+        if commitWithin is None:
+            #bulk mode - the commit comes at the end
+            return '%supdate/json' % self.solr_url
         return '%supdate/json?commitWithin=%s' % (self.solr_url, commitWithin)
 
+    def _post_single_doc_to_solr(self, data, action):
+        #only single-doc adds & deletes feed the latency average for commitWithin - a batch or a big zip
+        #body is slow because of its size, not because solr is busy
+        start = time.time()
+        self._post_to_solr(data, action)
+        commit_policy.record_update_seconds(time.time() - start)
+
     def _post_to_solr(self, data, action):
-        solr_post_url = self._get_post_url(action)
-        response = requests.post(
-            self._get_post_url(action),
-            data=data,
-        )
+        '''data is the update as bytes, or a SpooledTemporaryFile (see update_body_from_file)'''
+        if isinstance(data, bytes):
+            data, headers = gzip_update_body(data, min_bytes=SOLR_GZIP_MIN_BYTES, level=SOLR_GZIP_LEVEL)
+        else:
+            data, headers = update_body_from_file(data, min_bytes=SOLR_GZIP_MIN_BYTES, level=SOLR_GZIP_LEVEL)
+        post_url = self._get_post_url(action)
+        try:
+            response = requests.post(
+                post_url,
+                data=data,
+                headers=headers,
+            )
+        finally:
+            if headers and not isinstance(data, bytes):
+                #the temp file update_body_from_file gzipped a big body into
+                data.close()
         if not response.ok:
             raise Exception('SOLR POST FAIL: %s - %s' % (response.status_code, response.text))
 
-    def _get_existing_solr_doc(self, pid, fl='pid,zip_filelist_timestamp_dsi'):
-        solr_url = f'{self.solr_url}select/?q=pid:"{pid}"&fl={fl}'
-        response = requests.get(solr_url)
-        if response.ok:
-            solr_info = response.json()
-            if solr_info['response']['numFound'] == 1:
-                return solr_info['response']['docs'][0]
+    def _get_existing_solr_docs(self, pids, fl='pid,zip_filelist_timestamp_dsi'):
+        '''{pid: doc} from solr's real-time get handler - it sees uncommitted updates too, & takes many ids at once'''
+        docs = {}
+        for i in range(0, len(pids), SOLRIZE_BATCH_SIZE):
+            chunk = pids[i:i+SOLRIZE_BATCH_SIZE]
+            response = requests.get(f'{self.solr_url}get', params={'ids': ','.join(chunk), 'fl': fl})
+            if response.ok:
+                for doc in response.json()['response']['docs']:
+                    docs[doc['pid']] = doc
             else:
-                logger.warning(f'SOLR GET FAIL for {pid}: found {len(solr_info["response"]["docs"])} records instead of 1')
-        else:
-            logger.warning(f'SOLR GET FAIL for {pid}: {response.status_code} - {response.text}')
-        return {}
+                logger.warning(f'SOLR GET FAIL for {chunk[0]}...: {response.status_code} - {response.text}')
+        return docs
+
+
+class BatchSolrizer(Solrizer):
+    '''Index a chunk of sibling objects in one job: their ancestors are only loaded once,
+    and all the docs go to solr in one request. Anything that fails gets its own job.'''
+
+    def __init__(self, solr_url, pids):
+        super().__init__(solr_url, pid=None)
+        self.pids = pids
+
+    def process(self, action):
+        if action == DELETE_ACTION:
+            self._delete_solr_documents(self.pids)
+            return
+        if action == ZIP_ACTION:
+            self._index_batch_zips()
+            return
+        related_objects = {}
+        docs = []
+        storage_objects = []
+        missing_pids = []
+        for pid in self.pids:
+            try:
+                storage_object = StorageObject(pid, related_objects=related_objects)
+                docs.append(SolrDocBuilder(storage_object).get_solr_doc_fields())
+                storage_objects.append(storage_object)
+            except (ObjectNotFound, ObjectDeleted):
+                #not in storage (or Deleted), so it shouldn't be in solr either
+                missing_pids.append(pid)
+            except Exception as e:
+                logger.error(f'{pid} {action} failed in batch - queuing it separately: {e}')
+                queue_solrize_job(pid, action=action)
+        if missing_pids:
+            try:
+                self._delete_solr_documents(missing_pids)
+            except Exception as e:
+                logger.error(f'batch delete failed - queuing {len(missing_pids)} objects separately: {e}')
+                for pid in missing_pids:
+                    queue_solrize_job(pid, action=action)
+        if not docs:
+            return
+        logger.info(f'  adding/updating {len(docs)} objects in solr (action is {action})')
+        try:
+            self._post_to_solr(solrjson.dumps(docs), action)
+        except Exception as e:
+            logger.error(f'batch post failed - queuing {len(storage_objects)} objects separately: {e}')
+            for storage_object in storage_objects:
+                queue_solrize_job(storage_object.pid, action=action)
+            return
+        zip_pids = []
+        for storage_object, doc in zip(storage_objects, docs):
+            self._queue_follow_up_jobs(storage_object, doc, action, queue_zip_job=False)
+            if 'ZIP' in storage_object.active_file_names and 'zip_filelist_timestamp_dsi' not in doc:
+                zip_pids.append(storage_object.pid)
+        #one job checks all the ZIPs
+        if len(zip_pids) == 1:
+            queue_solrize_job(zip_pids[0], action=ZIP_ACTION)
+        elif zip_pids:
+            queue_solrize_batch_job(zip_pids, action=ZIP_ACTION)
+
+    def _index_batch_zips(self):
+        storage_objects = []
+        missing_pids = []
+        for pid in self.pids:
+            try:
+                storage_objects.append(StorageObject(pid))
+            except (ObjectNotFound, ObjectDeleted):
+                missing_pids.append(pid)
+        if missing_pids:
+            self._delete_solr_documents(missing_pids)
+        logger.info(f'  indexing zips for {len(storage_objects)} objects in solr')
+        self._index_zips(storage_objects, requeue_failures=True)
 
 
 def solrize(pid, action=ADD_ACTION, solr_instance='7.4'):
@@ -134,3 +388,19 @@ def solrize(pid, action=ADD_ACTION, solr_instance='7.4'):
         import traceback
         logger.error(f'{pid} {action} failed:  {traceback.format_exc()}')
         raise Exception(f'{datetime.now()} {pid} {action} error: {e}')
+
+
+def delete_from_solr(pids):
+    '''remove pids from solr right away, with multi-id delete commands (for big purges - no job needed)'''
+    Solrizer(solr_url=SOLR74_URL, pid=None)._delete_solr_documents(list(pids))
+
+
+def solrize_batch(pids, action=ADD_ACTION):
+    logger.info(f'batch of {len(pids)} ({pids[0]}...) - {action}')
+    try:
+        BatchSolrizer(solr_url=SOLR74_URL, pids=pids).process(action)
+    except Exception as e:
+        error_logger.error(f'batch {pids[0]}... {action} error: {e}')
+        import traceback
+        logger.error(f'batch {pids[0]}... {action} failed:  {traceback.format_exc()}')
+        raise Exception(f'{datetime.now()} batch {pids[0]}... {action} error: {e}')
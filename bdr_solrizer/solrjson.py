@@ -0,0 +1,45 @@
+'''JSON for solr update requests, as UTF-8 bytes that can be posted as-is.
+
+orjson (in the requirements) is used, since it encodes straight to bytes and is several times faster
+on big docs - the stdlib json module is the fallback, if orjson isn't installed. Set the
+SOLR_JSON_ENCODER environment variable to "json" or "orjson" to pick one.'''
+import json
+from .settings import SOLR_JSON_ENCODER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(obj):
+    #escaped output is pure ASCII (so valid UTF-8) - and the C encoder plus an ascii encode beats
+    #ensure_ascii=False plus a utf8 encode
+    return json.dumps(obj, separators=(',', ':')).encode('ascii')
+
+
+def _orjson_dumps(obj):
+    try:
+        return orjson.dumps(obj)
+    except orjson.JSONEncodeError:
+        #eg. an int bigger than 64 bits - the stdlib encoder handles anything
+        return _json_dumps(obj)
+
+
+ENCODERS = {'json': _json_dumps}
+if orjson is not None:
+    ENCODERS['orjson'] = _orjson_dumps
+
+
+def get_encoder(name=None):
+    '''the dumps function for name (or SOLR_JSON_ENCODER), falling back to the fastest one installed'''
+    name = name or SOLR_JSON_ENCODER
+    if name:
+        try:
+            return ENCODERS[name]
+        except KeyError:
+            raise ValueError(f'unknown/uninstalled solr json encoder {name} - choices are {", ".join(sorted(ENCODERS))}')
+    return ENCODERS.get('orjson', _json_dumps)
+
+
+dumps = get_encoder()
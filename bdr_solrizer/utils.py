@@ -1,5 +1,4 @@
-import datetime
-import re
+from . import dates
 
 
 SOLR_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
@@ -7,11 +6,7 @@ STORAGE_SERVICE_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
 
 
 def utc_datetime_from_string(s):
-    try:
-        dt = datetime.datetime.strptime(s, '%Y-%m-%dT%H:%M:%S.%f%z')
-    except ValueError:
-        dt = datetime.datetime.strptime(s, '%Y-%m-%dT%H:%M:%S%z')
-    return dt.astimezone(tz=datetime.timezone.utc)
+    return dates.utc_datetime_from_string(s)
 
 
 def utc_datetime_to_solr_string(dt):
@@ -64,17 +59,4 @@ class SolrDate:
 def get_solr_date(date_str):
     #try to construct a valid date string for solr
     # if not, return None and date will go into string field
-    solr_date_string = None
-    try:
-        if re.match(r'^\d{4}-\d{2}-\d{2}$', date_str):
-            dt = datetime.datetime.strptime(date_str, '%Y-%m-%d')
-            solr_date_string = date_str + 'T00:00:00Z'
-        elif re.match(r'^\d{4}-\d{2}$', date_str):
-            dt = datetime.datetime.strptime(date_str, '%Y-%m')
-            solr_date_string = date_str + '-01T00:00:00Z'
-        elif re.match(r'^\d{4}$', date_str):
-            dt = datetime.datetime.strptime(date_str, '%Y')
-            solr_date_string = date_str + '-01-01T00:00:00Z'
-    except ValueError:
-        pass
-    return SolrDate(solr_date_string)
+    return SolrDate(dates.solr_date_string(date_str))
@@ -0,0 +1,195 @@
+'''The file names in a ZIP, for the zip_filelist_ssim field - with bounded memory, for ZIPs with
+hundreds of thousands of entries.
+
+The names come straight from the central directory, a record at a time, without building a ZipInfo
+for every entry (which is what zipfile.ZipFile does). They're sorted in runs of ZIP_ENTRY_RUN_SIZE
+that get merged from temp files, and cached by the ZIP's checksum as a JSON array fragment
+('"a","b",...'), so the update body for an unchanged ZIP is just a copy of the cached fragment -
+whichever object (or version) it belongs to.'''
+import heapq
+import itertools
+import json
+import os
+import struct
+import tempfile
+import zipfile
+from diskcache import Cache
+from . import solrjson
+from .settings import CACHE_DIR, ZIP_ENTRY_RUN_SIZE
+
+
+CACHE_EXPIRE_SECONDS = 60*60*24*30 #one month
+COPY_CHUNK_SIZE = 1024*1024
+ENCODE_BATCH_SIZE = 1000 #names per solrjson.dumps call
+
+_END_OF_CD = struct.Struct('<4s4H2LH')
+_END_OF_CD_SIGNATURE = b'PK\x05\x06'
+_END_OF_CD_MAX_COMMENT = 65535
+_ZIP64_LOCATOR = struct.Struct('<4sLQL')
+_ZIP64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+_ZIP64_END_OF_CD = struct.Struct('<4sQ2H2L4Q')
+_ZIP64_END_OF_CD_SIGNATURE = b'PK\x06\x06'
+_CD_ENTRY = struct.Struct('<4s4xH18xHHH12x') #signature, flags, name/extra/comment lengths
+_CD_ENTRY_SIGNATURE = b'PK\x01\x02'
+_UTF8_FLAG = 0x800
+
+
+def _find_central_directory(f):
+    '''(offset, size) of the central directory, like zipfile's _EndRecData'''
+    file_size = f.seek(0, os.SEEK_END)
+    tail_size = min(file_size, _END_OF_CD.size + _END_OF_CD_MAX_COMMENT)
+    f.seek(file_size - tail_size)
+    tail = f.read(tail_size)
+    candidates = []
+    position = len(tail)
+    while True:
+        position = tail.rfind(_END_OF_CD_SIGNATURE, 0, position)
+        if position < 0:
+            break
+        if len(tail) - position >= _END_OF_CD.size:
+            candidates.append(position)
+            #the record's comment runs to the end of the file - otherwise the signature was in a comment
+            if position + _END_OF_CD.size + _END_OF_CD.unpack_from(tail, position)[-1] == len(tail):
+                break
+    if not candidates:
+        raise zipfile.BadZipFile('File is not a zip file')
+    if position < 0:
+        #junk after the comment - go with the last signature, like zipfile does
+        position = candidates[0]
+    _, _, _, _, _, cd_size, cd_offset, _ = _END_OF_CD.unpack_from(tail, position)
+    end_of_cd_offset = file_size - tail_size + position
+    locator_offset = end_of_cd_offset - _ZIP64_LOCATOR.size
+    if locator_offset >= 0:
+        f.seek(locator_offset)
+        locator = f.read(_ZIP64_LOCATOR.size)
+        if locator[:4] == _ZIP64_LOCATOR_SIGNATURE:
+            #the zip64 end record is right before its locator
+            end_of_cd_offset = locator_offset - _ZIP64_END_OF_CD.size
+            f.seek(end_of_cd_offset)
+            zip64_end = _ZIP64_END_OF_CD.unpack(f.read(_ZIP64_END_OF_CD.size))
+            if zip64_end[0] != _ZIP64_END_OF_CD_SIGNATURE:
+                raise zipfile.BadZipFile('Corrupt zip64 end of central directory record')
+            cd_size, cd_offset = zip64_end[8], zip64_end[9]
+    #anything prepended to the archive (eg. a self-extractor) shifts all the offsets
+    prepended = end_of_cd_offset - cd_size - cd_offset
+    return cd_offset + prepended, cd_size
+
+
+def iter_names(path):
+    '''the file names (not directories) in the ZIP at path, in central directory order'''
+    with open(path, 'rb', buffering=COPY_CHUNK_SIZE) as f:
+        cd_offset, cd_size = _find_central_directory(f)
+        f.seek(cd_offset)
+        read = 0
+        while read < cd_size:
+            entry = f.read(_CD_ENTRY.size)
+            if len(entry) < _CD_ENTRY.size:
+                raise zipfile.BadZipFile('Truncated central directory')
+            signature, flags, name_length, extra_length, comment_length = _CD_ENTRY.unpack(entry)
+            if signature != _CD_ENTRY_SIGNATURE:
+                raise zipfile.BadZipFile('Bad magic number for central directory')
+            name = f.read(name_length)
+            f.seek(extra_length + comment_length, os.SEEK_CUR)
+            read += _CD_ENTRY.size + name_length + extra_length + comment_length
+            name = name.decode('utf8' if flags & _UTF8_FLAG else 'cp437')
+            #zipfile cuts names at a null byte too
+            name = name.split('\x00', 1)[0]
+            if not name.endswith('/'):
+                yield name
+
+
+def _write_run(names):
+    run = tempfile.TemporaryFile()
+    #names can't contain a null byte, so it separates them
+    run.write('\x00'.join(sorted(names)).encode('utf8'))
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    leftover = b''
+    for chunk in iter(lambda: run.read(COPY_CHUNK_SIZE), b''):
+        names = (leftover + chunk).split(b'\x00')
+        leftover = names.pop()
+        for name in names:
+            yield name.decode('utf8')
+    yield leftover.decode('utf8')
+
+
+def sorted_names(names, run_size=None):
+    '''names, sorted with at most run_size of them in memory (the rest wait in temp files)'''
+    run_size = run_size or ZIP_ENTRY_RUN_SIZE
+    names = iter(names)
+    first_run = list(itertools.islice(names, run_size))
+    next_run = list(itertools.islice(names, run_size))
+    if not next_run:
+        yield from sorted(first_run)
+        return
+    runs = [_write_run(first_run), _write_run(next_run)]
+    del first_run, next_run
+    try:
+        while True:
+            run = list(itertools.islice(names, run_size))
+            if not run:
+                break
+            runs.append(_write_run(run))
+        del run
+        yield from heapq.merge(*[_read_run(r) for r in runs])
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _cache_key(checksum):
+    return f'zip_entries_{checksum}'
+
+
+def write_json_fragment(names, out):
+    '''write names to out as the inside of a JSON array - returns how many there were'''
+    count = 0
+    names = iter(names)
+    while True:
+        batch = list(itertools.islice(names, ENCODE_BATCH_SIZE))
+        if not batch:
+            return count
+        if count:
+            out.write(b',')
+        out.write(solrjson.dumps(batch)[1:-1])
+        count += len(batch)
+
+
+def open_json_fragment(checksum, path):
+    '''file with the sorted names in the ZIP at path as a JSON array fragment (see write_json_fragment) -
+    from the cache if this checksum has been listed before, otherwise listed & cached now'''
+    fragment = cached_json_fragment(checksum)
+    if fragment is not None:
+        return fragment
+    fragment = tempfile.TemporaryFile()
+    try:
+        write_json_fragment(sorted_names(iter_names(path)), fragment)
+        fragment.seek(0)
+        with Cache(CACHE_DIR) as entries_cache:
+            #read=True streams the file into the cache, instead of pickling it in memory
+            entries_cache.set(_cache_key(checksum), fragment, read=True, expire=CACHE_EXPIRE_SECONDS)
+    except Exception:
+        fragment.close()
+        raise
+    fragment.seek(0)
+    return fragment
+
+
+def cached_json_fragment(checksum):
+    '''file with the cached names for checksum, or None'''
+    with Cache(CACHE_DIR) as entries_cache:
+        return entries_cache.get(_cache_key(checksum), None, read=True)
+
+
+def load(checksum, max_bytes=None):
+    '''the cached names for checksum as a list - or None if they aren't cached (or they're more than max_bytes of JSON)'''
+    fragment = cached_json_fragment(checksum)
+    if fragment is None:
+        return None
+    with fragment:
+        if max_bytes is not None and os.fstat(fragment.fileno()).st_size > max_bytes:
+            return None
+        return json.loads(b'[' + fragment.read() + b']')
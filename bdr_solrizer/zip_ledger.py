@@ -0,0 +1,48 @@
+'''Which ZIP (by its lastModified) each pid's solr doc has the file list for, so a zip job for an
+unchanged ZIP can skip asking solr.
+
+A full add replaces the solr doc, so whenever a doc gets added, its pid has to be either recorded
+again (the add carried the saved file list of the same ZIP) or forgotten. The ledger is a redis
+hash, so all the workers share it; if redis isn't reachable, everything just gets checked against
+solr.'''
+from redis import Redis
+from redis.exceptions import RedisError
+from .logger import logger
+from .settings import USE_ZIP_LEDGER
+
+
+LEDGER_KEY = 'bdr_solrizer:zip_ledger'
+
+_redis = Redis()
+
+
+def indexed_zips(pids):
+    '''{pid: ZIP lastModified string} for the pids the ledger knows about'''
+    if not USE_ZIP_LEDGER or not pids:
+        return {}
+    try:
+        values = _redis.hmget(LEDGER_KEY, pids)
+    except RedisError as e:
+        logger.warning(f'zip ledger error: {e}')
+        return {}
+    return {pid: value.decode('utf8') for pid, value in zip(pids, values) if value is not None}
+
+
+def record(zips):
+    '''zips is {pid: ZIP lastModified string} that are (about to be) in solr'''
+    if not USE_ZIP_LEDGER or not zips:
+        return
+    try:
+        _redis.hset(LEDGER_KEY, mapping=zips)
+    except RedisError as e:
+        logger.warning(f'zip ledger error: {e}')
+
+
+def forget(pids):
+    if not USE_ZIP_LEDGER or not pids:
+        return
+    try:
+        _redis.hdel(LEDGER_KEY, *pids)
+    except RedisError as e:
+        #a stale entry would make the next zip job skip a ZIP solr no longer has
+        logger.error(f'zip ledger error forgetting {pids[0]}...: {e}')
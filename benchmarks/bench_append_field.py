@@ -0,0 +1,24 @@
+'''CommonIndexer.append_field into one big multi-valued field (eg. keyword on a huge record).'''
+import collections
+from bdr_solrizer.indexers.common import CommonIndexer
+from .corpus import best_time, report
+
+
+class ListIndexer(CommonIndexer):
+    '''the old behavior - a plain list per field'''
+
+    def _reset_data(self):
+        self.data = collections.defaultdict(list)
+
+
+def main():
+    for count in [1000, 10000, 30000]:
+        values = [f'keyword {i}' for i in range(count)]
+        print(f'{count} distinct values, appended one at a time')
+        for indexer_class in [ListIndexer, CommonIndexer]:
+            def append_all():
+                indexer = indexer_class(None)
+                indexer._reset_data()
+                for value in values:
+                    indexer.append_field('keyword', value)
+            report(f'  {indexer_class.__name__}', best_time(append_all, number=1, repeat=3))
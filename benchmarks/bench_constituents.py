@@ -0,0 +1,20 @@
+'''Constituent relatedItems: serializing & reparsing each subtree vs. indexing it in place.'''
+from bdr_solrizer.indexers import ModsIndexer, SinglePassModsIndexer
+from .corpus import mods_record, best_time, report
+
+
+class ReparsingModsIndexer(ModsIndexer):
+    '''the old behavior'''
+
+    def _constituent_indexer(self, constituent):
+        return type(self)(constituent.serialize())
+
+
+def main():
+    for constituents in [10, 100, 500]:
+        mods_bytes = mods_record(constituents=constituents)
+        print(f'{constituents} constituents ({len(mods_bytes)} bytes)')
+        for indexer_class in [ReparsingModsIndexer, ModsIndexer, SinglePassModsIndexer]:
+            seconds = best_time(lambda: indexer_class(mods_bytes).index_data(), number=3, repeat=3)
+            report(f'  {indexer_class.__name__}', seconds)
+            report(f'    per constituent', seconds / constituents)
@@ -0,0 +1,73 @@
+'''Date normalization: the old per-call regex & strptime vs. bdr_solrizer.dates, over the kinds of
+date strings MODS/DwC/TEI records actually have (lots of repeats, plenty of unparseable ones).'''
+import datetime
+import random
+import re
+from bdr_solrizer import dates
+from .corpus import best_time, report
+
+
+def old_solr_date_string(date_str):
+    #get_solr_date before the dates module
+    solr_date_string = None
+    try:
+        if re.match(r'^\d{4}-\d{2}-\d{2}$', date_str):
+            datetime.datetime.strptime(date_str, '%Y-%m-%d')
+            solr_date_string = date_str + 'T00:00:00Z'
+        elif re.match(r'^\d{4}-\d{2}$', date_str):
+            datetime.datetime.strptime(date_str, '%Y-%m')
+            solr_date_string = date_str + '-01T00:00:00Z'
+        elif re.match(r'^\d{4}$', date_str):
+            datetime.datetime.strptime(date_str, '%Y')
+            solr_date_string = date_str + '-01-01T00:00:00Z'
+    except ValueError:
+        pass
+    return solr_date_string
+
+
+def old_utc_datetime_from_string(s):
+    try:
+        dt = datetime.datetime.strptime(s, '%Y-%m-%dT%H:%M:%S.%f%z')
+    except ValueError:
+        dt = datetime.datetime.strptime(s, '%Y-%m-%dT%H:%M:%S%z')
+    return dt.astimezone(tz=datetime.timezone.utc)
+
+
+def date_strings(count=10000, distinct=500):
+    rand = random.Random(1)
+    shapes = [lambda: f'{rand.randint(1800, 2020)}',
+            lambda: f'{rand.randint(1800, 2020)}-{rand.randint(1, 12):02d}',
+            lambda: f'{rand.randint(1800, 2020)}-{rand.randint(1, 12):02d}-{rand.randint(1, 28):02d}',
+            lambda: f'ca. {rand.randint(1800, 2020)}',
+            lambda: f'[{rand.randint(1800, 2020)}?]',
+            lambda: f'{rand.randint(1800, 1900)}-{rand.randint(1901, 2020)}',
+            lambda: f'{rand.randint(1800, 2020)}-{rand.randint(1, 12):02d}-31',
+            lambda: 'undated']
+    pool = [rand.choice(shapes)() for _ in range(distinct)]
+    return [rand.choice(pool) for _ in range(count)]
+
+
+def timestamps(count=10000):
+    rand = random.Random(1)
+    shapes = ['{}T{:02d}:{:02d}:{:02d}Z', '{}T{:02d}:{:02d}:{:02d}.{:06d}Z', '{}T{:02d}:{:02d}:{:02d}.{:06d}-04:00']
+    return [rand.choice(shapes).format(f'2021-{rand.randint(1, 12):02d}-{rand.randint(1, 28):02d}', rand.randint(0, 23),
+            rand.randint(0, 59), rand.randint(0, 59), rand.randint(0, 999999)) for _ in range(count)]
+
+
+def main():
+    strings = date_strings()
+    print(f'{len(strings)} date strings, {len(set(strings))} distinct')
+    report('  regex & strptime', best_time(lambda: [old_solr_date_string(s) for s in strings]))
+    def cold():
+        dates.solr_date_string.cache_clear()
+        return [dates.solr_date_string(s) for s in strings]
+    report('  dates.solr_date_string, empty memo', best_time(cold))
+    distinct = list(set(strings))
+    def unmemoized():
+        dates.solr_date_string.cache_clear()
+        return [dates.solr_date_string(s) for s in distinct]
+    report(f'  dates.solr_date_string, {len(distinct)} distinct only', best_time(unmemoized))
+    stamps = timestamps()
+    print(f'{len(stamps)} timestamps')
+    report('  strptime', best_time(lambda: [old_utc_datetime_from_string(s) for s in stamps]))
+    report('  dates.utc_datetime_from_string', best_time(lambda: [dates.utc_datetime_from_string(s) for s in stamps]))
@@ -0,0 +1,93 @@
+'''Extracted text from a big TEI edition and a big METS structMap: building the whole tree
+(the old functions) vs. streaming with iterparse. Each run is in a fresh process, so the
+peak memory numbers (max RSS growth while extracting) don't see each other.'''
+import io
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from lxml import etree
+from bdr_solrizer import solrdocbuilder
+from .corpus import report
+
+
+def tree_extract_tei(data):
+    parser = etree.XMLParser(recover=True)
+    xml_tree = etree.parse(data, parser)
+    text_to_index = []
+    for element in xml_tree.iter(tag=etree.Element):
+        if element.text and element.text.strip():
+            text_to_index.append(element.text.strip())
+    return ' '.join(text_to_index)
+
+
+def tree_process_extracted_text(data):
+    text_to_index = []
+    parser = etree.XMLParser(recover=True)
+    xml_tree = etree.parse(data, parser)
+    root_label = xml_tree.getroot().get('LABEL')
+    if root_label:
+        text_to_index.append(root_label)
+    for div in xml_tree.getroot().findall('.//mets:div', solrdocbuilder.XML_NAMESPACES):
+        label = div.get('LABEL')
+        if label:
+            text_to_index.append(label)
+    return ' '.join(text_to_index)
+
+
+EXTRACTORS = {
+    'TEI, whole tree': tree_extract_tei,
+    'TEI, iterparse': solrdocbuilder._extract_tei,
+    'METS, whole tree': tree_process_extracted_text,
+    'METS, iterparse': lambda f: solrdocbuilder._process_extracted_text(f, 'text/xml'),
+}
+
+
+def write_tei(path, paragraphs):
+    with open(path, 'w') as f:
+        f.write('<TEI xmlns="http://www.tei-c.org/ns/1.0"><text><body>')
+        for i in range(paragraphs):
+            f.write(f'<div n="{i}"><head>Chapter {i}</head><p>Paragraph {i} with <hi rend="i">some</hi> text.<lb/>More text.</p></div>\n')
+        f.write('</body></text></TEI>')
+
+
+def write_mets(path, pages):
+    with open(path, 'w') as f:
+        f.write('<mets:mets xmlns:mets="http://www.loc.gov/METS/" LABEL="Issue"><mets:structMap>')
+        for i in range(pages):
+            f.write(f'<mets:div LABEL="Page {i}" ORDER="{i}"><mets:div LABEL="Article {i}"/><mets:fptr FILEID="f{i}"/></mets:div>\n')
+        f.write('</mets:structMap></mets:mets>')
+
+
+def _run(name, path, conn):
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        text = EXTRACTORS[name](f)
+    seconds = time.perf_counter() - start
+    conn.send((seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss, len(text)))
+
+
+def measure(name, path):
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_run, args=(name, path, child_conn))
+    process.start()
+    result = parent_conn.recv()
+    process.join()
+    return result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {
+            'TEI': os.path.join(tmp, 'tei.xml'),
+            'METS': os.path.join(tmp, 'mets.xml'),
+        }
+        write_tei(files['TEI'], 200000)
+        write_mets(files['METS'], 300000)
+        for name in EXTRACTORS:
+            path = files[name.split(',')[0]]
+            seconds, peak_kb, text_length = measure(name, path)
+            report(f'{name} ({os.path.getsize(path)//2**20}MB file)', seconds)
+            print(f'{"":<50} {peak_kb/1024:10.1f} MB peak RSS growth, {text_length} chars')
@@ -0,0 +1,12 @@
+'''ModsIndexer (an XPath query per field) vs. SinglePassModsIndexer (one walk of the tree).'''
+from bdr_solrizer.indexers import ModsIndexer, SinglePassModsIndexer
+from .corpus import mods_record, best_time, report
+
+
+def main():
+    for size in [10, 200]:
+        mods_bytes = mods_record(subjects=size, names=size, notes=size)
+        print(f'{size} subjects/names/notes ({len(mods_bytes)} bytes)')
+        for indexer_class in [ModsIndexer, SinglePassModsIndexer]:
+            report(f'  {indexer_class.__name__}(...).index_data()',
+                   best_time(lambda: indexer_class(mods_bytes).index_data()))
@@ -0,0 +1,38 @@
+'''RELS-EXT: a full rdflib parse vs. the lxml reader, and the RelsExtIndexer on top of each.'''
+from bdr_solrizer.indexers import RelsExtIndexer, parse_rels_ext, parse_rdf_xml_into_graph
+from .corpus import best_time, report
+
+
+def rels_ext_record(members=0):
+    relationships = ['<fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:commonMetadata"/>',
+            '<fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:jp2"/>',
+            '<fedora-rels-ext:isPartOf rdf:resource="info:fedora/test:5555"/>',
+            '<bul-rel:hasPagination rdf:datatype="http://www.w3.org/2001/XMLSchema#int">12</bul-rel:hasPagination>',
+            '<bul-rel:displayLabel>Page 12</bul-rel:displayLabel>']
+    for i in range(members):
+        relationships.append(f'<fedora-rels-ext:isMemberOfCollection rdf:resource="info:fedora/test:c{i}"/>')
+    return ('''<?xml version="1.0" encoding="UTF-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bul-rel="http://library.brown.edu/#"
+    xmlns:fedora-model="info:fedora/fedora-system:def/model#" xmlns:fedora-rels-ext="info:fedora/fedora-system:def/relations-external#">
+  <rdf:Description rdf:about="info:fedora/test:1234">
+    %s
+  </rdf:Description>
+</rdf:RDF>''' % '\n    '.join(relationships)).encode('utf8')
+
+
+def main():
+    for members in [0, 50]:
+        rels_bytes = rels_ext_record(members=members)
+        print(f'RELS-EXT with {members} collection memberships ({len(rels_bytes)} bytes)')
+        for name, parse in [('rdflib Graph', parse_rdf_xml_into_graph), ('parse_rels_ext', parse_rels_ext)]:
+            report(f'  parse: {name}', best_time(lambda: parse(rels_bytes), number=200))
+            rels = parse(rels_bytes)
+            #skip the collection-name lookups, which hit the collection API
+            def index():
+                indexer = RelsExtIndexer(rels=rels)
+                indexer.index_rels_ext()
+                indexer.index_dcterms()
+                indexer._index_bul_ns()
+                indexer._index_embargo_info()
+                return indexer.content_models, indexer.stream_uri, indexer.pagination_objs
+            report(f'  index: {name}', best_time(index, number=200))
@@ -0,0 +1,67 @@
+'''Gzipped solr update bodies: bytes on the wire and end-to-end post latency against a local
+stand-in solr (which inflates the body and parses the JSON, like solr does).
+
+Localhost has no bandwidth limit, so the last columns estimate the time on slower links:
+compress + post latency + the transfer time for the wire bytes.'''
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import json
+import random
+import threading
+import time
+import requests
+from bdr_solrizer import solrjson
+from bdr_solrizer.solrizer import gzip_update_body
+from .corpus import best_time
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        json.loads(body)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def ocr_text(size):
+    #zipf-ish word frequencies, so it compresses about like real OCR text does
+    rand = random.Random(1)
+    vocabulary = [''.join(rand.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rand.randint(2, 10))) for _ in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    words = []
+    length = 0
+    while length < size:
+        chunk = rand.choices(vocabulary, weights=weights, k=1000)
+        words.extend(chunk)
+        length += sum(len(w) + 1 for w in chunk)
+    return ' '.join(words)[:size]
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/solr/update/json'
+    session = requests.Session()
+    try:
+        for size in [100000, 1000000, 5000000]:
+            data = solrjson.dumps({'add': {'doc': {'pid': 'test:1234', 'extracted_text': ocr_text(size), 'mods_title_ssim': ['A title']}}})
+            print(f'doc with {size // 1000}KB of extracted text ({len(data)} bytes of JSON)')
+            print(f'  {"":<12}{"wire bytes":>12}{"compress ms":>13}{"post ms":>10}{"@1Gbit ms":>11}{"@100Mbit ms":>13}')
+            for label, level in [('no gzip', None), ('gzip 1', 1), ('gzip 6', 6), ('gzip 9', 9)]:
+                min_bytes = 1 if level else None
+                body, headers = gzip_update_body(data, min_bytes=min_bytes, level=level)
+                compress = best_time(lambda: gzip_update_body(data, min_bytes=min_bytes, level=level), number=3, repeat=3)
+                post = best_time(lambda: session.post(url, data=body, headers=headers), number=3, repeat=3)
+                total_1g = (compress + post + len(body) * 8 / 1e9) * 1000
+                total_100m = (compress + post + len(body) * 8 / 1e8) * 1000
+                print(f'  {label:<12}{len(body):>12}{compress * 1000:>13.2f}{post * 1000:>10.2f}{total_1g:>11.2f}{total_100m:>13.2f}')
+    finally:
+        server.shutdown()
+        server.server_close()
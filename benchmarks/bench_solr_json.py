@@ -0,0 +1,38 @@
+'''Solr update bodies: the old json.dumps str (which the http client then encodes) vs. solrjson bytes.'''
+import json
+from bdr_solrizer import solrjson
+from .corpus import best_time, report
+
+
+def solr_doc(text_size):
+    words = ['Providence', 'Café', 'naïve', 'Brown', 'Daily', 'Herald', '1900', 'JANUARY']
+    text = ' '.join(words[i % len(words)] for i in range(text_size // 7))
+    return {'add': {'doc': {
+        'pid': 'test:1234',
+        'extracted_text': text,
+        'ds_ids_ssim': ['MODS', 'RELS-EXT', 'EXTRACTED_TEXT', 'PDF'],
+        'mods_subject_ssim': [f'Subject {i}' for i in range(200)],
+        'object_size_lsi': '123456789',
+    }}}
+
+
+def zip_doc(entries):
+    return {'add': {'doc': {
+        'pid': 'test:1234',
+        'zip_filelist_ssim': {'set': [f'folder {i // 100}/image_{i:06d}.tif' for i in range(entries)]},
+        'zip_filelist_timestamp_dsi': {'set': '2021-03-23T10:20:30.000000Z'},
+    }}}
+
+
+def old_dumps(obj):
+    #json.dumps str, which http.client encodes as latin-1 before sending
+    return json.dumps(obj).encode('iso-8859-1')
+
+
+def main():
+    for label, doc in [('doc with 1MB extracted_text', solr_doc(1000000)), ('doc with 10MB extracted_text', solr_doc(10000000)),
+            ('zip doc with 50,000 files', zip_doc(50000))]:
+        print(f'{label} ({len(old_dumps(doc))} bytes)')
+        report('  json.dumps + encode', best_time(lambda: old_dumps(doc)))
+        for name, dumps in sorted(solrjson.ENCODERS.items()):
+            report(f'  solrjson {name}', best_time(lambda: dumps(doc)))
@@ -0,0 +1,44 @@
+'''Evaluating the ModsIndexer mapper tables with raw XPath strings vs. the compiled evaluators.'''
+from lxml import etree
+from bdr_solrizer.indexers import ModsIndexer
+from .corpus import mods_record, best_time, report
+
+
+MAPPER_TABLES = [
+    ModsIndexer.ABSTRACT_MAPPING,
+    ModsIndexer.TYPE_OF_RESOURCE_MAP,
+    ModsIndexer.TOC_MAP,
+    ModsIndexer.CLASSIFICATION_MAP,
+    ModsIndexer.ORIGIN_MAP,
+    ModsIndexer.PHYSICAL_DESCRIPTIONS_MAP,
+    ModsIndexer.SUBJECT_MAP,
+    ModsIndexer.IDENTIFIER_MAP,
+    ModsIndexer.RELATED_ITEM_MAP,
+    ModsIndexer.TITLEINFO_MAP,
+]
+
+
+def main():
+    for subjects in [10, 200]:
+        indexer = ModsIndexer(mods_record(subjects=subjects, names=subjects))
+        node = indexer.xml.node
+        namespaces = indexer.xml.ROOT_NAMESPACES
+        paths = [m[0] for table in MAPPER_TABLES for m in table]
+
+        def uncompiled():
+            for path in paths:
+                node.xpath(path, namespaces=namespaces)
+
+        def compiled():
+            for path in paths:
+                indexer.xpath(path)
+
+        def compile_every_time():
+            for path in paths:
+                etree.XPath(path, namespaces=namespaces)(node)
+
+        print(f'{len(paths)} mapper paths, {subjects} subjects/names')
+        report('  node.xpath(path, namespaces=...)', best_time(uncompiled, number=50))
+        report('  etree.XPath(...) compiled per call', best_time(compile_every_time, number=50))
+        report('  CommonIndexer.xpath (compiled once per class)', best_time(compiled, number=50))
+        report('  ModsIndexer.index_data()', best_time(indexer.index_data))
@@ -0,0 +1,60 @@
+'''Zip file list update bodies for big ZIPs: the old zipfile.namelist() & one big solrjson.dumps vs.
+bdr_solrizer.zip_entries - listing the ZIP cold, and copying the listing cached by checksum.
+Peak memory is from tracemalloc (python allocations only).'''
+import io
+import os
+import tempfile
+import tracemalloc
+import zipfile
+from bdr_solrizer import solrjson, zip_entries
+from .corpus import best_time, report
+
+
+def old_update_body(path):
+    #ZipIndexer.zip_index_data before zip_entries (now ZipIndexer.write_zip_index_doc)
+    with zipfile.ZipFile(path, mode='r') as zip_object:
+        entry_names = sorted(entry for entry in zip_object.namelist() if not entry.endswith('/'))
+    return solrjson.dumps([{'pid': 'test:1', 'zip_filelist_ssim': {'set': entry_names}, 'zip_filelist_timestamp_dsi': {'set': '2020-01-01T00:00:00Z'}}])
+
+
+def new_update_body(checksum, path):
+    with tempfile.SpooledTemporaryFile(max_size=10*1024*1024) as out:
+        out.write(b'[{"pid":"test:1","zip_filelist_ssim":{"set":[')
+        with zip_entries.open_json_fragment(checksum, path) as fragment:
+            for chunk in iter(lambda: fragment.read(zip_entries.COPY_CHUNK_SIZE), b''):
+                out.write(chunk)
+        out.write(b']},"zip_filelist_timestamp_dsi":{"set":"2020-01-01T00:00:00Z"}}]')
+        return out.tell()
+
+
+def peak_mb(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def write_zip(path, entries):
+    #a scanned-book style archive, written in no particular order
+    with zipfile.ZipFile(path, mode='w') as zip_file:
+        for i in range(entries):
+            n = (i * 7919) % entries
+            zip_file.writestr(f'volume_{n % 40:02}/page_{n:07}.tif', b'')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for entries in [10000, 300000]:
+            path = os.path.join(tmp, f'{entries}.zip')
+            write_zip(path, entries)
+            print(f'{entries} entries ({os.path.getsize(path) // 1024}KB ZIP)')
+            number = 3 if entries < 100000 else 1
+            report('  old zipfile + sorted + dumps', best_time(lambda: old_update_body(path), number=number, repeat=3))
+            checksums = iter(range(1000000))
+            report('  zip_entries, cold (list & cache)', best_time(lambda: new_update_body(f'cold{entries}-{next(checksums)}', path), number=number, repeat=3))
+            report('  zip_entries, cached by checksum', best_time(lambda: new_update_body(f'warm{entries}', path), number=number, repeat=3))
+            print(f'  peak MB: old {peak_mb(lambda: old_update_body(path)):.1f}, '
+                    f'cold {peak_mb(lambda: new_update_body(f"peak{entries}", path)):.1f}, '
+                    f'cached {peak_mb(lambda: new_update_body(f"peak{entries}", path)):.1f}')
@@ -0,0 +1,54 @@
+'''Generated records for the benchmarks - sized like our large real-world records.'''
+import timeit
+
+
+MODS_TEMPLATE = '''<mods:mods ID="id101" xmlns:mods="http://www.loc.gov/mods/v3" xmlns:xlink="http://www.w3.org/1999/xlink">
+  <mods:titleInfo><mods:title>Benchmark record</mods:title><mods:subTitle>with lots of subjects</mods:subTitle></mods:titleInfo>
+  <mods:originInfo>
+    <mods:dateCreated encoding="w3cdtf" keyDate="yes">1905-06-01</mods:dateCreated>
+    <mods:dateIssued>1905</mods:dateIssued>
+    <mods:publisher>Brown University</mods:publisher>
+    <mods:place><mods:placeTerm type="text">Providence</mods:placeTerm></mods:place>
+  </mods:originInfo>
+  <mods:typeOfResource>text</mods:typeOfResource>
+  <mods:abstract>An abstract.</mods:abstract>
+  {elements}
+</mods:mods>'''
+
+SUBJECT = '''<mods:subject authority="lcsh" displayLabel="Label {i}">
+    <mods:topic>Topic {i}</mods:topic>
+    <mods:temporal>19th century</mods:temporal>
+    <mods:geographic>Place {i}</mods:geographic>
+    <mods:hierarchicalGeographic><mods:country>United States</mods:country><mods:city>City {i}</mods:city></mods:hierarchicalGeographic>
+    <mods:name><mods:namePart>Subject Name {i}</mods:namePart></mods:name>
+  </mods:subject>'''
+
+NAME = '''<mods:name><mods:namePart>Name {i}</mods:namePart><mods:namePart type="date">1850-1920</mods:namePart>
+    <mods:role><mods:roleTerm type="text">creator</mods:roleTerm></mods:role></mods:name>'''
+
+NOTE = '''<mods:note type="general" displayLabel="Note">Note {i}</mods:note>'''
+
+CONSTITUENT = '''<mods:relatedItem type="constituent">
+    <mods:titleInfo><mods:title>Chapter {i}</mods:title></mods:titleInfo>
+    <mods:name><mods:namePart>Author {i}</mods:namePart><mods:role><mods:roleTerm type="text">creator</mods:roleTerm></mods:role></mods:name>
+    <mods:genre authority="aat">essays</mods:genre>
+    <mods:part><mods:extent unit="pages"><mods:start>{i}</mods:start><mods:end>{j}</mods:end></mods:extent></mods:part>
+  </mods:relatedItem>'''
+
+
+def mods_record(subjects=0, names=0, notes=0, constituents=0):
+    elements = []
+    elements.extend(SUBJECT.format(i=i) for i in range(subjects))
+    elements.extend(NAME.format(i=i) for i in range(names))
+    elements.extend(NOTE.format(i=i) for i in range(notes))
+    elements.extend(CONSTITUENT.format(i=i, j=i+1) for i in range(constituents))
+    return MODS_TEMPLATE.format(elements='\n  '.join(elements)).encode('utf8')
+
+
+def best_time(func, number=10, repeat=5):
+    '''best average seconds per call'''
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def report(label, seconds):
+    print(f'{label:<50} {seconds*1000:10.3f} ms')
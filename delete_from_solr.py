@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+from os.path import dirname, abspath, join
+import sys
+import time
+import dotenv
+
+
+def main(pids, batch_size):
+    '''delete the pids from solr directly (no queue), batch_size ids per request'''
+    pids = list(dict.fromkeys(pids))
+    start = time.time()
+    deleted = 0
+    for i in range(0, len(pids), batch_size):
+        chunk = pids[i:i+batch_size]
+        try:
+            solrizer.delete_from_solr(chunk)
+        except Exception as e:
+            print(f'delete failed for the batch starting at {chunk[0]}: {e}')
+            print(f'{deleted} pids deleted before the failure')
+            sys.exit(1)
+        deleted += len(chunk)
+        seconds = time.time() - start
+        print(f'{deleted}/{len(pids)} deleted - {deleted / seconds:.0f} pids/sec')
+    print(f'done: {deleted} pids in {time.time() - start:.1f}s')
+
+
+if __name__ == "__main__":
+    CODE_ROOT = dirname(abspath(__file__))
+    if CODE_ROOT not in sys.path:
+        sys.path.append(CODE_ROOT)
+    PROJECT_ROOT = dirname(CODE_ROOT)
+    dotenv.read_dotenv(join(PROJECT_ROOT, '.env'))
+
+    from bdr_solrizer import settings
+    from bdr_solrizer import solrizer
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Delete objects from solr in bulk (eg. for a purge or takedown)')
+    parser.add_argument('-f', '--file', dest='file', required=True, help='file to read pids from (one pid on each line)')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=settings.DELETE_BATCH_SIZE, help=f'pids per delete request (default: {settings.DELETE_BATCH_SIZE})')
+    args = parser.parse_args()
+
+    with open(args.file, 'rb') as f:
+        pids = [line.strip().decode('utf8') for line in f.readlines() if line.strip()]
+    main(pids, batch_size=args.batch_size)
@@ -16,6 +16,14 @@ def send_error_email(msg):
 
 
 def main(pids, action, priority):
+    if action in [settings.DELETE_ACTION, settings.ZIP_ACTION] and len(pids) > 1:
+        #deletes & zip checks work on many pids per solr request, so there's no need for a job per pid
+        batch_size = settings.DELETE_BATCH_SIZE if action == settings.DELETE_ACTION else settings.SOLRIZE_BATCH_SIZE
+        for i in range(0, len(pids), batch_size):
+            chunk = pids[i:i+batch_size]
+            job = queues.queue_solrize_batch_job(chunk, action=action, priority=priority)
+            print(f'{chunk[0]}... ({len(chunk)} pids) - {job.id}')
+        return
     for pid in pids:
         print(f'{pid} - ', end='')
         job = queues.queue_solrize_job(pid, action=action, priority=priority)
@@ -0,0 +1,37 @@
+import importlib
+import os
+import pkgutil
+import sys
+import tempfile
+
+
+if __name__ == '__main__':
+    os.environ['SERVER'] = 'http://localhost'
+    os.environ['MAIL_SERVER'] = '127.0.0.1'
+    os.environ['NOTIFICATION_ADDRESS'] = 'someone@brown.edu'
+    os.environ['SOLR_ROOT'] = 'http://localhost/solr/'
+    os.environ['SOLR74_ROOT'] = 'http://localhost/solr/'
+    os.environ['COMMIT_WITHIN'] = '50000'
+    os.environ['COMMIT_WITHIN_ADD'] = '10000'
+    os.environ['STORAGE_SERVICE_ROOT'] = 'http://localhost/teststorage/'
+    os.environ['STORAGE_SERVICE_PARAM'] = 'some_param=1'
+    os.environ['COLLECTION_URL'] = 'http://localhost/collection_url/'
+    os.environ['COLLECTION_URL_PARAM'] = 'some_param=1'
+    os.environ['BDR_BROWN'] = 'brown'
+    os.environ['BDR_PUBLIC'] = 'public'
+    #pass benchmark names to only run some of them (eg. python run_benchmarks.py xpath)
+    names = sys.argv[1:]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['CACHE_DIR'] = tmp
+        os.environ['OCFL_ROOT'] = tmp
+        os.environ['RESOURCE_TYPES_DB_NAME'] = os.path.join(tmp, 'resource_types.db')
+        os.environ['LOG_DIR'] = tmp
+        os.environ['ERROR_LOG_PATH'] = os.path.join(tmp, 'error.log')
+        import benchmarks
+        for module_info in pkgutil.iter_modules(benchmarks.__path__):
+            if not module_info.name.startswith('bench_'):
+                continue
+            if names and module_info.name.replace('bench_', '') not in names:
+                continue
+            print(f'\n*** {module_info.name} ***')
+            importlib.import_module(f'benchmarks.{module_info.name}').main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+from os.path import dirname, abspath, join
+import sys
+import time
+import dotenv
+
+
+def main(command, hours):
+    if command == 'start':
+        commit_policy.start_bulk_mode(hours)
+        print(f'bulk mode on for up to {hours} hours - solr updates won\'t be committed until "finish"')
+    elif command == 'finish':
+        start = time.time()
+        commit_policy.finish_bulk_mode(settings.SOLR74_URL)
+        print(f'bulk mode off - committed in {time.time() - start:.1f}s')
+    else:
+        started = commit_policy.bulk_mode_started()
+        if started:
+            print(f'bulk mode on since {time.ctime(started)}')
+        else:
+            print('bulk mode off')
+
+
+if __name__ == "__main__":
+    CODE_ROOT = dirname(abspath(__file__))
+    if CODE_ROOT not in sys.path:
+        sys.path.append(CODE_ROOT)
+    PROJECT_ROOT = dirname(CODE_ROOT)
+    dotenv.read_dotenv(join(PROJECT_ROOT, '.env'))
+
+    from bdr_solrizer import commit_policy
+    from bdr_solrizer import settings
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Defer solr commits during a backfill, then commit once at the end')
+    parser.add_argument('command', choices=['start', 'finish', 'status'])
+    parser.add_argument('--hours', dest='hours', type=float, default=24, help='turn bulk mode off automatically after this long, if "finish" doesn\'t (default: 24)')
+    args = parser.parse_args()
+
+    main(args.command, hours=args.hours)
@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+
+class FakeRedis:
+    '''just the redis commands commit_policy & the ledgers use (expiration is ignored)'''
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode('utf8')
+        return True
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, *keys):
+        return len([key for key in keys if self.data.pop(key, None) is not None])
+
+    def hmget(self, key, fields):
+        values = self.data.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({field: str(value).encode('utf8') for field, value in mapping.items()})
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.data.get(key, {}).pop(field, None)
+
+    def sadd(self, key, *members):
+        members = {str(member).encode('utf8') for member in members}
+        values = self.data.setdefault(key, set())
+        added = len(members - values)
+        values.update(members)
+        return added
+
+    def srem(self, key, *members):
+        values = self.data.get(key, set())
+        for member in members:
+            values.discard(str(member).encode('utf8'))
+
+    def sismember(self, key, member):
+        return str(member).encode('utf8') in self.data.get(key, set())
+
+    def spop(self, key, count):
+        values = self.data.get(key, set())
+        return [values.pop() for _ in range(min(count, len(values)))]
+
+
+def patch_redis(test_case):
+    '''give commit_policy & the ledgers a fresh FakeRedis for this test, so the tests never depend on (or
+    write to) a real redis - returns the FakeRedis'''
+    fake_redis = FakeRedis()
+    for target in ['bdr_solrizer.commit_policy._redis', 'bdr_solrizer.zip_ledger._redis', 'bdr_solrizer.image_parent_ledger._redis', 'bdr_solrizer.delete_ledger._redis']:
+        patcher = patch(target, fake_redis)
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+    #the rq queues are in redis too
+    patcher = patch('bdr_solrizer.commit_policy.queue_depth', return_value=0)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    return fake_redis
@@ -0,0 +1,181 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from diskcache import Cache
+from bdr_solrizer import settings
+from bdr_solrizer.indexers import relsextindexer
+
+
+class CollectionService:
+    '''Stand-in for the collection API, running on a local port.
+    Collections are {collection_id: (name, [ancestors])}.'''
+
+    def __init__(self, collections, delay=0):
+        self.collections = collections
+        self.delay = delay
+        self.down = False
+        self.requests = []
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                collection_id = self.path.strip('/').split('/')[-2]
+                service.requests.append(collection_id)
+                time.sleep(service.delay)
+                if service.down or collection_id not in service.collections:
+                    self.send_response(503 if service.down else 404)
+                    self.end_headers()
+                    return
+                name, ancestors = service.collections[collection_id]
+                body = json.dumps({'name': name, 'ancestors': ancestors}).encode('utf8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except BrokenPipeError:
+                    #the client timed out
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/collections/'
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestCollectionAncestors(unittest.TestCase):
+
+    def setUp(self):
+        with Cache(settings.CACHE_DIR) as cache:
+            cache.clear()
+        relsextindexer._ancestors_memo.clear()
+        self.service = CollectionService({
+                '1': ('Collection 1', []),
+                '2': ('Collection 2', ['Collection 1']),
+                '3': ('Collection 3', ['Collection 1', 'Collection 2']),
+            })
+        self.addCleanup(self.service.close)
+        url_patcher = patch('bdr_solrizer.indexers.relsextindexer.COLLECTION_URL', self.service.url)
+        url_patcher.start()
+        self.addCleanup(url_patcher.stop)
+
+    def age_entry(self, collection_id, seconds):
+        key = relsextindexer._ancestors_cache_key(collection_id)
+        with Cache(settings.CACHE_DIR) as cache:
+            entry = cache[key]
+            entry['fetched'] -= seconds
+            cache.set(key, entry)
+        relsextindexer._ancestors_memo.clear()
+
+    def test_collection_names(self):
+        names = relsextindexer.get_collection_names(['3', '1', '2', '3'])
+        self.assertEqual(names, ['Collection 1', 'Collection 2', 'Collection 3'])
+        self.assertEqual(sorted(self.service.requests), ['1', '2', '3'])
+        #cached in-process and on disk
+        self.assertEqual(relsextindexer.get_collection_names(['2']), ['Collection 1', 'Collection 2'])
+        relsextindexer._ancestors_memo.clear()
+        self.assertEqual(relsextindexer.get_collection_names(['2']), ['Collection 1', 'Collection 2'])
+        self.assertEqual(len(self.service.requests), 3)
+
+    def test_lookups_are_concurrent(self):
+        self.service.delay = 0.3
+        start = time.time()
+        relsextindexer.get_collection_names(['1', '2', '3'])
+        self.assertLess(time.time() - start, 0.8)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        self.service.delay = 0.3
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(relsextindexer.get_ancestors('2'))) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [['Collection 1', 'Collection 2']] * 10)
+        self.assertEqual(self.service.requests, ['2'])
+
+    def test_stale_while_revalidate(self):
+        relsextindexer.get_ancestors('2')
+        self.age_entry('2', relsextindexer.EXPIRE_SECONDS + 1)
+        self.service.collections['2'] = ('Renamed 2', ['Collection 1'])
+        #another process is refreshing - serve the stale answer without calling the API
+        with Cache(settings.CACHE_DIR) as cache:
+            cache.set(relsextindexer._refresh_lock_key('2'), 12345)
+        self.assertEqual(relsextindexer.get_ancestors('2'), ['Collection 1', 'Collection 2'])
+        self.assertEqual(self.service.requests, ['2'])
+        #no refresh in progress - this lookup refreshes
+        with Cache(settings.CACHE_DIR) as cache:
+            cache.delete(relsextindexer._refresh_lock_key('2'))
+        self.assertEqual(relsextindexer.get_ancestors('2'), ['Collection 1', 'Renamed 2'])
+        self.assertEqual(self.service.requests, ['2', '2'])
+        relsextindexer._ancestors_memo.clear()
+        self.assertEqual(relsextindexer.get_ancestors('2'), ['Collection 1', 'Renamed 2'])
+        self.assertEqual(self.service.requests, ['2', '2'])
+
+    def test_api_down(self):
+        relsextindexer.get_ancestors('2')
+        self.age_entry('2', relsextindexer.EXPIRE_SECONDS + 1)
+        self.service.down = True
+        self.assertEqual(relsextindexer.get_ancestors('2'), ['Collection 1', 'Collection 2'])
+        #nothing to fall back on
+        with self.assertRaises(Exception):
+            relsextindexer.get_ancestors('3')
+
+    def test_api_hangs(self):
+        relsextindexer.get_ancestors('2')
+        self.age_entry('2', relsextindexer.EXPIRE_SECONDS + 1)
+        self.service.delay = 1
+        start = time.time()
+        with patch('bdr_solrizer.indexers.relsextindexer.COLLECTION_API_TIMEOUT', 0.2):
+            self.assertEqual(relsextindexer.get_ancestors('2'), ['Collection 1', 'Collection 2'])
+        self.assertLess(time.time() - start, 0.8)
+
+    def test_wait_for_other_process(self):
+        with Cache(settings.CACHE_DIR) as cache:
+            cache.set(relsextindexer._refresh_lock_key('2'), 12345)
+        def other_process_fetch():
+            time.sleep(0.2)
+            relsextindexer.add_ancestors_to_cache('2', ['from', 'other process'])
+            relsextindexer._ancestors_memo.clear()
+        threading.Thread(target=other_process_fetch).start()
+        self.assertEqual(relsextindexer.get_ancestors('2'), ['from', 'other process'])
+        self.assertEqual(self.service.requests, [])
+
+    def test_warm_cache(self):
+        relsextindexer.get_ancestors('1')
+        relsextindexer.get_ancestors('2')
+        self.age_entry('2', relsextindexer.EXPIRE_SECONDS + 1)
+        results = relsextindexer.warm_ancestors_cache(['1', '2', '3', '4', '3'])
+        self.assertEqual(results['cached'], ['1'])
+        self.assertEqual(sorted(results['fetched']), ['2', '3'])
+        self.assertEqual(list(results['failed']), ['4'])
+        #jobs get it from the cache now
+        relsextindexer._ancestors_memo.clear()
+        self.service.down = True
+        self.assertEqual(relsextindexer.get_collection_names(['3', '2']), ['Collection 1', 'Collection 2', 'Collection 3'])
+
+    def test_warm_cache_rate_limit(self):
+        start = time.time()
+        results = relsextindexer.warm_ancestors_cache(['1', '2', '3'], per_second=10)
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertEqual(sorted(results['fetched']), ['1', '2', '3'])
+
+
+def suite():
+    suite = unittest.makeSuite(TestCollectionAncestors, 'test')
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
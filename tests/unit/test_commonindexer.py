@@ -0,0 +1,45 @@
+import json
+import pickle
+import unittest
+from bdr_solrizer.indexers.common import CommonIndexer, FieldValues
+
+
+class TestCommonIndexer(unittest.TestCase):
+
+    def test_append_field(self):
+        indexer = CommonIndexer(None)
+        indexer.append_field('keyword', ' one  two ')
+        indexer.append_field('keyword', 'one two')
+        indexer.append_field('keyword', ['three', 'one two', '', None, ' four'])
+        indexer.append_field('keyword', ['three', 'five', 'five'])
+        self.assertEqual(indexer.data['keyword'], ['one two', 'three', 'four', 'five', 'five'])
+        self.assertEqual(json.dumps(indexer.data), '{"keyword": ["one two", "three", "four", "five", "five"]}')
+
+    def test_set_field_then_append(self):
+        indexer = CommonIndexer(None)
+        indexer.set_field('other_title', ['a ', 'b'])
+        indexer.append_field('other_title', ['b', 'c'])
+        self.assertEqual(indexer.data['other_title'], ['a', 'b', 'c'])
+
+    def test_field_values(self):
+        values = FieldValues(['a', 1])
+        values.append(['unhashable'])
+        values.extend(['b', {'c': 1}])
+        self.assertIn('a', values)
+        self.assertIn(1, values)
+        self.assertIn(['unhashable'], values)
+        self.assertIn({'c': 1}, values)
+        self.assertNotIn('c', values)
+        self.assertNotIn(['other'], values)
+        unpickled = pickle.loads(pickle.dumps(values))
+        self.assertIs(type(unpickled), list)
+        self.assertEqual(unpickled, ['a', 1, ['unhashable'], 'b', {'c': 1}])
+
+
+def suite():
+    suite = unittest.makeSuite(TestCommonIndexer, 'test')
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+import csv_to_sqlite
+from bdr_solrizer.resource_types import ResourceTypes
+
+
+class TestCsvToSqlite(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.csv_path = os.path.join(self.tmp, 'resource_types.csv')
+        self.db_path = os.path.join(self.tmp, 'resource_types.db')
+
+    def write_csv(self, text):
+        with open(self.csv_path, 'w', encoding='utf8') as f:
+            f.write(text)
+
+    def rows(self):
+        db = sqlite3.connect(self.db_path)
+        try:
+            return db.execute('SELECT pid, resource_type FROM resource_types ORDER BY rowid').fetchall()
+        finally:
+            db.close()
+
+    def test_generate(self):
+        self.write_csv('pid,resource_type\ntest:1, maps\n\n"test:2","books"\ntest:3,\n,images\ntest:1,scores\ntest:4\ntest:5,videos')
+        with patch('csv_to_sqlite.BATCH_SIZE', 2):
+            row_count = csv_to_sqlite.generate_sqlite(self.csv_path, self.db_path)
+        self.assertEqual(row_count, 3)
+        self.assertEqual(self.rows(), [('test:1', 'maps'), ('test:2', 'books'), ('test:5', 'videos')])
+        #no temp file left behind
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['resource_types.csv', 'resource_types.db'])
+
+    def test_replace_live_db(self):
+        self.write_csv('pid,resource_type\ntest:1,maps\n')
+        csv_to_sqlite.generate_sqlite(self.csv_path, self.db_path)
+        os.chmod(self.db_path, 0o640)
+        resource_types = ResourceTypes(self.db_path, max_in_memory_rows=0)
+        self.assertEqual(resource_types.get('test:1'), 'maps')
+        self.write_csv('pid,resource_type\ntest:1,images\ntest:2,books\n')
+        csv_to_sqlite.generate_sqlite(self.csv_path, self.db_path)
+        self.assertEqual(self.rows(), [('test:1', 'images'), ('test:2', 'books')])
+        self.assertEqual(os.stat(self.db_path).st_mode & 0o777, 0o640)
+        self.assertEqual(resource_types.get_many(['test:1', 'test:2']), {'test:1': 'images', 'test:2': 'books'})
+
+    def test_failed_build_keeps_live_db(self):
+        self.write_csv('pid,resource_type\ntest:1,maps\n')
+        csv_to_sqlite.generate_sqlite(self.csv_path, self.db_path)
+        with open(self.csv_path, 'wb') as f:
+            f.write(b'pid,resource_type\ntest:1,\xff\xfe\n')
+        with self.assertRaises(UnicodeDecodeError):
+            csv_to_sqlite.generate_sqlite(self.csv_path, self.db_path)
+        self.assertEqual(self.rows(), [('test:1', 'maps')])
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['resource_types.csv', 'resource_types.db'])
+
+
+def suite():
+    suite = unittest.makeSuite(TestCsvToSqlite, 'test')
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
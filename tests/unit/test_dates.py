@@ -0,0 +1,51 @@
+import datetime
+import unittest
+from bdr_solrizer import dates
+
+
+class TestDates(unittest.TestCase):
+
+    def setUp(self):
+        dates.solr_date_string.cache_clear()
+
+    def test_solr_date(self):
+        self.assertEqual(dates.solr_date_string('1905'), '1905-01-01T00:00:00Z')
+        self.assertEqual(dates.solr_date_string('1905-06'), '1905-06-01T00:00:00Z')
+        self.assertEqual(dates.solr_date_string('1905-06-30'), '1905-06-30T00:00:00Z')
+        self.assertEqual(dates.solr_date_string('2000-02-29'), '2000-02-29T00:00:00Z')
+
+    def test_invalid_solr_date(self):
+        for date_str in ['', None, 'undated', 'ca. 1905', '[1850?]', '1850-1920', '190', '19050', '0000', '1905-00', '1905-13',
+                '1905-6', '1905-06-31', '1900-02-29', '1905-06-1', '1905/06/01', '1905-06-01T00:00:00Z', ' 1905', '1905 ',
+                '²⁰²⁰']:
+            with self.subTest(date_str=date_str):
+                self.assertIsNone(dates.solr_date_string(date_str))
+
+    def test_memoized(self):
+        dates.solr_date_string('1905-06')
+        dates.solr_date_string('1905-06')
+        info = dates.solr_date_string.cache_info()
+        self.assertEqual((info.hits, info.misses, info.maxsize), (1, 1, dates.MEMO_SIZE))
+
+    def test_utc_datetime(self):
+        expected = datetime.datetime(2021, 3, 23, 10, 20, 30, tzinfo=datetime.timezone.utc)
+        for s in ['2021-03-23T10:20:30Z', '2021-03-23T06:20:30-04:00', '2021-03-23T15:50:30+0530', '2021-03-23T10:20:30.000000+00:00']:
+            with self.subTest(s=s):
+                dt = dates.utc_datetime_from_string(s)
+                self.assertEqual(dt, expected)
+                self.assertEqual(dt.tzinfo, datetime.timezone.utc)
+
+    def test_invalid_utc_datetime(self):
+        for s in ['2021-03-23T10:20:30', '2021-02-30T10:20:30Z', '2021-03-23T24:20:30Z', '2021-03-23T10:20:30.1234567Z', '2021-03-23 10:20:30Z']:
+            with self.subTest(s=s):
+                with self.assertRaises(ValueError):
+                    dates.utc_datetime_from_string(s)
+
+
+def suite():
+    suite = unittest.makeSuite(TestDates, 'test')
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
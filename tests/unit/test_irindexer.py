@@ -25,6 +25,23 @@ class TestIRIndexer(unittest.TestCase):
             'ir_collection_id': ['123'],
         })
 
+    def test_dates(self):
+        ir_obj = irMetadata.make_ir()
+        ir_obj.date = '2020-06-15'
+        ir_obj.collections_date = '2020-06'
+        data = IRIndexer(ir_obj.serialize()).index_data()
+        self.assertEqual(data['deposit_date'], '2020-06-15T00:00:00Z')
+        self.assertEqual(data['collection_date'], '2020-06-01T00:00:00Z')
+
+    def test_invalid_dates(self):
+        #these used to get through as invalid solr dates (before INDEX_VERSION 2)
+        ir_obj = irMetadata.make_ir()
+        ir_obj.date = '2020-13-45'
+        ir_obj.collections_date = '0000'
+        data = IRIndexer(ir_obj.serialize()).index_data()
+        self.assertIsNone(data['deposit_date'])
+        self.assertIsNone(data['collection_date'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 import json
 import unittest
+from unittest.mock import patch
 from eulxml.xmlmap  import load_xmlobject_from_string
 from bdrxml import mods
 from bdr_solrizer.indexers import ModsIndexer
@@ -618,6 +619,23 @@ class TestModsIndexer(unittest.TestCase):
                 target_data[k]
             )
 
+    def test_constituents_indexed_in_place(self):
+        sample_mods = '''
+          <mods:relatedItem type="constituent">
+            <mods:titleInfo><mods:title>Chapter 1</mods:title></mods:titleInfo>
+            <mods:relatedItem type="constituent">
+              <mods:titleInfo><mods:title>Section 1</mods:title></mods:titleInfo>
+            </mods:relatedItem>
+          </mods:relatedItem>
+        '''
+        indexer = self.indexer_for_mods_string(sample_mods)
+        with patch('bdr_solrizer.indexers.modsindexer.load_xmlobject_from_string') as load_mock:
+            index_data = indexer.index_data()
+        load_mock.assert_not_called()
+        self.assertEqual(index_data['mods_constituent_display_ssim'], ['Chapter 1:'])
+        constituent_indexer = indexer._constituent_indexer(indexer.mods.related_items[0])
+        self.assertEqual(constituent_indexer.index_data()['mods_constituent_display_ssim'], ['Section 1:'])
+
     def test_related_index(self):
         sample_mods = '''
           <mods:relatedItem type="host" displayLabel="Collection:">
@@ -861,6 +879,13 @@ class TestModsIndexer(unittest.TestCase):
         index_data = indexer.index_data()
         self.assertEqual(index_data['mods_language_code_ssim'], ['eng','ger', 'zz', 'dan'])
 
+    def test_compiled_xpaths_shared(self):
+        indexer1 = self.indexer_for_mods_string('<mods:abstract>one</mods:abstract>')
+        indexer2 = self.indexer_for_mods_string('<mods:abstract>two</mods:abstract>')
+        self.assertEqual(indexer1.index_abstracts().data['abstract'], ['one'])
+        self.assertEqual(indexer2.index_abstracts().data['abstract'], ['two'])
+        self.assertIs(indexer1.compiled_xpath('mods:abstract'), indexer2.compiled_xpath('mods:abstract'))
+
 
 def suite():
     suite = unittest.makeSuite(TestModsIndexer, 'test')
@@ -1,9 +1,11 @@
 from io import BytesIO
+import pickle
 import unittest
 from unittest.mock import patch
 from rdflib import Graph, URIRef, Literal, Namespace
 from rdflib.namespace import RDF
-from bdr_solrizer.indexers import RelsExtIndexer
+from bdrxml.rdfns import model as MODELS_NS
+from bdr_solrizer.indexers import RelsExtIndexer, RelsExt, parse_rels_ext, parse_rdf_xml_into_graph
 from .test_data import SIMPLE_RELS_EXT_XML, RELS_EXT_XML
 
 BUL_NS = Namespace(URIRef("http://library.brown.edu/#"))
@@ -69,7 +71,142 @@ class TestRelsExt(unittest.TestCase):
         indexed_data = RelsExtIndexer(rels=Graph()).index_data()
         self.assertEqual(indexed_data['rel_content_models_ssim'], [])
 
+    def test_empty_rels_ext(self):
+        indexed_data = RelsExtIndexer(rels=RelsExt()).index_data()
+        self.assertEqual(indexed_data['rel_content_models_ssim'], [])
+
+
+RDF_HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bul-rel="http://library.brown.edu/#"
+    xmlns:fedora-model="info:fedora/fedora-system:def/model#" xmlns:fedora-rels-ext="info:fedora/fedora-system:def/relations-external#">'''
+
+SIMPLE_VARIATIONS = [
+    #duplicates, typed literals rdflib normalizes, languages, whitespace, comments, multiple descriptions
+    '''<rdf:Description rdf:about="info:fedora/test:1">
+        <fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:jp2"/>
+        <fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:jp2"/>
+        <!-- a comment -->
+        <fedora-rels-ext:isPartOf rdf:resource="info:fedora/test:2"></fedora-rels-ext:isPartOf>
+        <bul-rel:hasPagination rdf:datatype="http://www.w3.org/2001/XMLSchema#int">007</bul-rel:hasPagination>
+        <bul-rel:proquestHarvest rdf:datatype="http://www.w3.org/2001/XMLSchema#boolean">True</bul-rel:proquestHarvest>
+        <bul-rel:displayLabel xml:lang="fr">  une étiquette  </bul-rel:displayLabel>
+        <bul-rel:displayLabel>  une étiquette  </bul-rel:displayLabel>
+        <bul-rel:panoptoId/>
+        <bul-rel:hasStream>info:fedora/test:1</bul-rel:hasStream>
+      </rdf:Description>
+      <rdf:Description rdf:about="info:fedora/test:1">
+        <fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:image"/>
+      </rdf:Description>
+      <rdf:Description rdf:about="http://example.com/other">
+        <fedora-rels-ext:isPartOf rdf:resource="info:fedora/test:3"/>
+      </rdf:Description>''',
+    '',
+]
+
+#RDF/XML the simple parser hands off to rdflib
+UNUSUAL_VARIATIONS = [
+    '''<rdf:Description rdf:about="info:fedora/test:1" bul-rel:displayLabel="attribute label">
+        <fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:jp2"/>
+      </rdf:Description>''',
+    '''<rdf:Description rdf:about="info:fedora/test:1">
+        <fedora-rels-ext:isPartOf><rdf:Description rdf:about="info:fedora/test:2"><fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:image"/></rdf:Description></fedora-rels-ext:isPartOf>
+      </rdf:Description>''',
+    '''<rdf:Description rdf:about="info:fedora/test:1">
+        <bul-rel:hasStream rdf:parseType="Resource"><bul-rel:displayLabel>stream</bul-rel:displayLabel></bul-rel:hasStream>
+      </rdf:Description>''',
+    '''<rdf:Description rdf:nodeID="n1">
+        <fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:jp2"/>
+      </rdf:Description>''',
+    '''<fedora-model:FedoraObject rdf:about="info:fedora/test:1">
+        <fedora-model:hasModel rdf:resource="info:fedora/bdr-cmodel:jp2"/>
+      </fedora-model:FedoraObject>''',
+    '''<rdf:Description rdf:about="info:fedora/test:1" xml:base="http://example.com/">
+        <fedora-rels-ext:isPartOf rdf:resource="relative/2"/>
+      </rdf:Description>''',
+    '''<rdf:Description rdf:about="info:fedora/test:1">
+        <fedora-rels-ext:isMemberOf><rdf:Seq><rdf:li rdf:resource="info:fedora/test:2"/></rdf:Seq></fedora-rels-ext:isMemberOf>
+      </rdf:Description>''',
+]
+
+
+def unordered(indexed_data):
+    return {k: sorted(str(i) for i in v) if isinstance(v, list) else str(v) for k, v in indexed_data.items()}
+
+
+def rdf_document(body):
+    return f'{RDF_HEADER}{body}</rdf:RDF>'.encode('utf8')
+
+
+class TestRelsExtParser(unittest.TestCase):
+    '''parse_rels_ext must give the same answers as rdflib'''
+
+    def assertMatchesGraph(self, rels, graph):
+        self.assertEqual(sorted(rels), sorted((str(s), str(p), str(o)) for s, p, o in graph))
+        for predicate in set(graph.predicates()):
+            self.assertEqual(
+                sorted(rels.objects(predicate=predicate)),
+                sorted(str(o) for o in graph.objects(predicate=predicate)),
+            )
+        for subject in set(graph.subjects()):
+            self.assertEqual(
+                sorted(rels.objects(subject=subject)),
+                sorted(str(o) for o in graph.objects(subject=subject)),
+            )
+        #rdflib's object order isn't stable, so compare the indexed values unordered
+        self.assertEqual(unordered(RelsExtIndexer(rels=rels).index_data()), unordered(RelsExtIndexer(rels=graph).index_data()))
+
+    def assertMatchesRdflib(self, rdf_bytes):
+        self.assertMatchesGraph(parse_rels_ext(rdf_bytes), parse_rdf_xml_into_graph(rdf_bytes))
+
+    def test_fixtures(self):
+        for rdf in [SIMPLE_RELS_EXT_XML, RELS_EXT_XML]:
+            with self.subTest(rdf=rdf):
+                rdf_bytes = rdf.encode('utf8')
+                with patch('bdr_solrizer.indexers.relsextindexer.parse_rdf_xml_into_graph') as rdflib_parse:
+                    parse_rels_ext(rdf_bytes)
+                rdflib_parse.assert_not_called()
+                self.assertMatchesRdflib(rdf_bytes)
+
+    def test_simple_variations(self):
+        for body in SIMPLE_VARIATIONS:
+            with self.subTest(body=body):
+                with patch('bdr_solrizer.indexers.relsextindexer.parse_rdf_xml_into_graph') as rdflib_parse:
+                    parse_rels_ext(rdf_document(body))
+                rdflib_parse.assert_not_called()
+                self.assertMatchesRdflib(rdf_document(body))
+
+    def test_unusual_rdf_falls_back_to_rdflib(self):
+        for body in UNUSUAL_VARIATIONS:
+            with self.subTest(body=body):
+                #compare with the graph the fallback parsed, so blank node ids match
+                graphs = []
+                def rdflib_parse(contents):
+                    graphs.append(parse_rdf_xml_into_graph(contents))
+                    return graphs[-1]
+                with patch('bdr_solrizer.indexers.relsextindexer.parse_rdf_xml_into_graph', side_effect=rdflib_parse):
+                    rels = parse_rels_ext(rdf_document(body))
+                self.assertEqual(len(graphs), 1)
+                self.assertMatchesGraph(rels, graphs[0])
+
+    def test_document_order(self):
+        rels = parse_rels_ext(RELS_EXT_XML.encode('utf8'))
+        self.assertEqual(list(rels.objects(predicate=MODELS_NS.hasModel)), ['info:fedora/bdr-cmodel:commonMetadata', 'info:fedora/bdr-cmodel:pdf'])
+
+    def test_set(self):
+        rels = parse_rels_ext(RELS_EXT_XML.encode('utf8'))
+        rels.set((URIRef('info:fedora/test:1234'), MODELS_NS.hasModel, URIRef('info:fedora/bdr-cmodel:jp2')))
+        self.assertEqual(len(rels), 10)
+        self.assertEqual(list(rels.objects(predicate=MODELS_NS.hasModel)), ['info:fedora/bdr-cmodel:jp2'])
+        rels.set((URIRef('info:fedora/test:1234'), BUL_NS.displayLabel, Literal('new label')))
+        self.assertEqual(list(rels.objects(predicate=BUL_NS.displayLabel)), ['new label'])
+
+    def test_pickle(self):
+        rels = parse_rels_ext(RELS_EXT_XML.encode('utf8'))
+        unpickled = pickle.loads(pickle.dumps(rels))
+        self.assertEqual(list(unpickled), list(rels))
+        self.assertEqual(list(unpickled.objects(predicate=MODELS_NS.hasModel)), list(rels.objects(predicate=MODELS_NS.hasModel)))
+        self.assertEqual(unpickled.__reduce__(), rels.__reduce__())
+
 
 if __name__ == '__main__':
     unittest.main()
-
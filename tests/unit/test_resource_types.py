@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from bdr_solrizer.resource_types import ResourceTypes
+
+
+IN_MEMORY = 1000
+ON_DISK = 0
+
+
+def write_db(path, rows):
+    tmp_path = f'{path}.tmp'
+    db = sqlite3.connect(tmp_path)
+    db.execute('CREATE TABLE resource_types (pid TEXT NOT NULL, resource_type TEXT NOT NULL)')
+    db.executemany('INSERT INTO resource_types (pid, resource_type) VALUES (?, ?)', rows)
+    db.commit()
+    db.close()
+    os.replace(tmp_path, path)
+
+
+class TestResourceTypes(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = os.path.join(tmp.name, 'resource_types.db')
+        write_db(self.db_path, [('test:1', 'maps'), ('test:2', 'books'), ('test:2', 'scores'), ('test:3', '')])
+
+    def check_lookups(self, resource_types):
+        self.assertEqual(resource_types.get('test:1'), 'maps')
+        self.assertEqual(resource_types.get('test:2'), 'books')
+        self.assertEqual(resource_types.get('test:3'), None)
+        self.assertEqual(resource_types.get('test:4'), None)
+        self.assertEqual(resource_types.get_many(['test:1', 'test:2', 'test:3', 'test:4']), {'test:1': 'maps', 'test:2': 'books'})
+
+    def test_in_memory(self):
+        resource_types = ResourceTypes(self.db_path)
+        with patch('bdr_solrizer.resource_types.sqlite3.connect', wraps=sqlite3.connect) as connect:
+            self.check_lookups(resource_types)
+        connect.assert_called_once()
+        self.assertIsNone(resource_types._db)
+
+    def test_on_disk(self):
+        resource_types = ResourceTypes(self.db_path, max_in_memory_rows=2)
+        with patch('bdr_solrizer.resource_types.sqlite3.connect', wraps=sqlite3.connect) as connect:
+            self.check_lookups(resource_types)
+        connect.assert_called_once()
+        self.assertIsNone(resource_types._types)
+        #more pids than fit in one query
+        with patch('bdr_solrizer.resource_types.BATCH_SIZE', 2):
+            self.assertEqual(resource_types.get_many(['test:4', 'test:2', 'test:3', 'test:1']), {'test:1': 'maps', 'test:2': 'books'})
+
+    def test_read_only(self):
+        resource_types = ResourceTypes(self.db_path, max_in_memory_rows=0)
+        resource_types.get('test:1')
+        with self.assertRaises(sqlite3.OperationalError):
+            resource_types._db.execute('DELETE FROM resource_types')
+
+    def test_reload_when_file_changes(self):
+        for max_in_memory_rows in [IN_MEMORY, ON_DISK]:
+            with self.subTest(max_in_memory_rows=max_in_memory_rows):
+                write_db(self.db_path, [('test:1', 'maps')])
+                resource_types = ResourceTypes(self.db_path, max_in_memory_rows=max_in_memory_rows)
+                self.assertEqual(resource_types.get('test:1'), 'maps')
+                write_db(self.db_path, [('test:1', 'images'), ('test:5', 'videos')])
+                self.assertEqual(resource_types.get_many(['test:1', 'test:5']), {'test:1': 'images', 'test:5': 'videos'})
+
+    def test_missing_or_bad_db(self):
+        os.remove(self.db_path)
+        resource_types = ResourceTypes(self.db_path)
+        self.assertEqual(resource_types.get('test:1'), None)
+        #looking it up doesn't create the file
+        self.assertFalse(os.path.exists(self.db_path))
+        with open(self.db_path, 'wb') as f:
+            f.write(b'not a db')
+        self.assertEqual(resource_types.get('test:1'), None)
+        write_db(self.db_path, [('test:1', 'maps')])
+        self.assertEqual(resource_types.get('test:1'), 'maps')
+
+
+def suite():
+    suite = unittest.makeSuite(TestResourceTypes, 'test')
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import json
+import random
+import unittest
+from unittest.mock import patch
+from bdrxml import mods
+from bdr_solrizer.indexers import ModsIndexer, SinglePassModsIndexer
+from . import test_modsindexer
+
+
+def index_output(indexer_class, mods_bytes):
+    try:
+        return json.dumps(indexer_class(mods_bytes).index_data()).encode('utf8')
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'.encode('utf8')
+
+
+class TestSinglePassModsIndexerFixtures(test_modsindexer.TestModsIndexer):
+    '''Runs every ModsIndexer test against the single-pass indexer, and checks that its
+    full output for each fixture is byte-identical to ModsIndexer's.'''
+
+    def indexer_for_mods_string(self, mods_string):
+        mods_bytes = test_modsindexer.MODS_TEMPLATE.format(inserted_mods=mods_string).encode('utf8')
+        self.assertEqual(
+            index_output(SinglePassModsIndexer, mods_bytes),
+            index_output(ModsIndexer, mods_bytes),
+        )
+        return SinglePassModsIndexer(mods_bytes)
+
+
+# building blocks for the generated corpus - including the awkward cases: missing text,
+#   mixed content, comments, other namespaces, and every attribute the paths test for
+ELEMENTS = [
+    '<mods:abstract>Abstract {i}</mods:abstract>',
+    '<mods:abstract/>',
+    '<mods:abstract>#hashed {i}</mods:abstract>',
+    '<mods:accessCondition type="use and reproduction" xlink:href="http://example.com/{i}">Use {i}</mods:accessCondition>',
+    '<mods:accessCondition type="logo" xlink:href="http://example.com/logo{i}.png"/>',
+    '<mods:accessCondition type="rightsStatement" xlink:href="http://rightsstatements.org/{i}">In copyright</mods:accessCondition>',
+    '<mods:accessCondition type="restrictionOnAccess">Restricted {i}</mods:accessCondition>',
+    '<mods:classification authority="lcc">PS{i}</mods:classification>',
+    '''<mods:originInfo displayLabel="Origin">
+        <mods:dateCreated encoding="w3cdtf" keyDate="yes">18{i:02d}-02-03</mods:dateCreated>
+        <mods:dateCreated point="end" qualifier="approximate">19{i:02d}</mods:dateCreated>
+        <mods:dateIssued point="start">18{i:02d}</mods:dateIssued>
+        <mods:dateIssued point="end" keyDate="yes">19{i:02d}-12</mods:dateIssued>
+        <mods:dateCaptured qualifier="inferred">circa 1900</mods:dateCaptured>
+        <mods:dateModified></mods:dateModified>
+        <mods:copyrightDate qualifier="questionable">2{i:03d}</mods:copyrightDate>
+        <mods:dateOther type="quarterSort">1900-Q{i}</mods:dateOther>
+        <mods:dateOther type="yearSort">19{i:02d}</mods:dateOther>
+        <mods:publisher>Publisher {i}</mods:publisher>
+        <mods:place><mods:placeTerm type="text">Providence {i}</mods:placeTerm><mods:placeTerm type="code">riu</mods:placeTerm></mods:place>
+        <mods:place><mods:placeTerm>Untyped {i}</mods:placeTerm></mods:place>
+      </mods:originInfo>''',
+    '<mods:originInfo><mods:dateValid>not a date</mods:dateValid><mods:dateCreated><!-- comment -->1901</mods:dateCreated></mods:originInfo>',
+    '<mods:identifier type="doi">10.1000/{i}</mods:identifier>',
+    '<mods:identifier type="METSID">METS{i}</mods:identifier>',
+    '<mods:identifier type="COLID">{i}</mods:identifier>',
+    '<mods:identifier type="local" displayLabel="Call Number">call {i}</mods:identifier>',
+    '<mods:identifier>plain {i}</mods:identifier>',
+    '<mods:identifier type="empty"/>',
+    '''<mods:language>
+        <mods:languageTerm authority="rfc3066" type="code">en</mods:languageTerm>
+        <mods:languageTerm type="text">English</mods:languageTerm>
+        <mods:scriptTerm type="text">Latin</mods:scriptTerm>
+        <mods:scriptTerm type="code">Latn</mods:scriptTerm>
+      </mods:language>''',
+    '<mods:language><mods:languageTerm authority="iso639-2b" type="code">fre</mods:languageTerm></mods:language>',
+    '''<mods:location>
+        <mods:physicalLocation>Library
+          {i}</mods:physicalLocation>
+        <mods:holdingSimple><mods:copyInformation>
+          <mods:subLocation>Shelf {i}</mods:subLocation>
+          <mods:subLocation/>
+          <mods:note type="cataloging" displayLabel="Staff Note">Copy note {i}</mods:note>
+          <mods:note>Untyped copy note</mods:note>
+        </mods:copyInformation></mods:holdingSimple>
+      </mods:location>''',
+    '<mods:location><mods:url>http://example.com/{i}</mods:url></mods:location>',
+    '<mods:genre authority="aat" type="object">photographs {i}</mods:genre>',
+    '<mods:genre>plain genre</mods:genre>',
+    '<mods:genre authority="local"/>',
+    '''<mods:name type="personal">
+        <mods:namePart>Smith, John {i}</mods:namePart>
+        <mods:namePart type="date">1800-18{i:02d}</mods:namePart>
+        <mods:role><mods:roleTerm type="code">cre</mods:roleTerm></mods:role>
+        <mods:role><mods:roleTerm authority="marcrelator" type="text">Creator</mods:roleTerm></mods:role>
+        <mods:role><mods:roleTerm>Publication place</mods:roleTerm><mods:roleTerm type="text">other</mods:roleTerm></mods:role>
+      </mods:name>''',
+    '<mods:name><mods:namePart>Jones {i}</mods:namePart><mods:displayForm>J. Jones</mods:displayForm></mods:name>',
+    '<mods:name><mods:namePart type="given">Only given</mods:namePart></mods:name>',
+    '<mods:name><mods:namePart>Contributor {i}</mods:namePart><mods:role><mods:roleTerm type="text">editor</mods:roleTerm></mods:role></mods:name>',
+    '<mods:note>General note {i}</mods:note>',
+    '<mods:note type="provenance" displayLabel="Provenance:">From the estate of {i}</mods:note>',
+    '<mods:note displayLabel="Citation">See <mods:extension>mixed</mods:extension> content</mods:note>',
+    '''<mods:part>
+        <mods:detail type="volume"><mods:caption>vol.</mods:caption><mods:number>{i}</mods:number></mods:detail>
+        <mods:detail type="issue"><mods:number>2</mods:number></mods:detail>
+        <mods:detail><mods:caption>no.</mods:caption><mods:number>3</mods:number></mods:detail>
+        <mods:extent unit="pages"><mods:start>{i}</mods:start><mods:end>1{i}</mods:end><mods:total>10</mods:total></mods:extent>
+      </mods:part>''',
+    '<mods:part><mods:extent><mods:start>1</mods:start></mods:extent></mods:part>',
+    '''<mods:physicalDescription>
+        <mods:extent>{i} pages</mods:extent>
+        <mods:digitalOrigin>reformatted digital</mods:digitalOrigin>
+        <mods:form authority="aat" type="material">paper</mods:form>
+        <mods:form>untyped form {i}</mods:form>
+        <mods:form type="empty"/>
+      </mods:physicalDescription>''',
+    '''<mods:recordInfo>
+        <mods:recordIdentifier source="RPB">b{i}</mods:recordIdentifier>
+        <mods:recordIdentifier>r{i}</mods:recordIdentifier>
+        <mods:recordInfoNote type="source" displayLabel="Source Note">note {i}</mods:recordInfoNote>
+      </mods:recordInfo>''',
+    '''<mods:relatedItem type="host" displayLabel="Collection">
+        <mods:titleInfo><mods:title>Collection {i}</mods:title><mods:partNumber>Box {i}</mods:partNumber></mods:titleInfo>
+        <mods:identifier type="COLID">{i}</mods:identifier>
+        <mods:name><mods:namePart>Collector {i}</mods:namePart></mods:name>
+      </mods:relatedItem>''',
+    '''<mods:relatedItem type="series">
+        <mods:titleInfo><mods:title>Series {i}</mods:title></mods:titleInfo>
+        <mods:identifier>series id {i}</mods:identifier>
+        <mods:identifier type="issn">1234-{i:04d}</mods:identifier>
+      </mods:relatedItem>''',
+    '<mods:relatedItem displayLabel="Collection"><mods:identifier type="COLID">not host {i}</mods:identifier></mods:relatedItem>',
+    '''<mods:relatedItem type="constituent">
+        <mods:titleInfo><mods:title>Chapter {i}</mods:title></mods:titleInfo>
+        <mods:name><mods:namePart>Author {i}</mods:namePart><mods:role><mods:roleTerm type="text">creator</mods:roleTerm></mods:role></mods:name>
+        <mods:genre authority="aat">essays</mods:genre>
+        <mods:part><mods:extent unit="pages"><mods:start>{i}</mods:start><mods:end>2{i}</mods:end></mods:extent></mods:part>
+        <mods:relatedItem type="constituent"><mods:titleInfo><mods:title>Section {i}</mods:title></mods:titleInfo></mods:relatedItem>
+      </mods:relatedItem>''',
+    '''<mods:subject authority="lcsh" displayLabel="Label {i}">
+        <mods:topic>Topic {i}</mods:topic>
+        <mods:topic> </mods:topic>
+        <mods:temporal>19th century</mods:temporal>
+        <mods:geographic>Place {i}</mods:geographic>
+        <mods:cartographics><mods:scale>1:{i}</mods:scale></mods:cartographics>
+        <mods:hierarchicalGeographic><mods:country>United States</mods:country><mods:city>City {i}</mods:city><mods:citySection>Downtown</mods:citySection><mods:area>Area</mods:area></mods:hierarchicalGeographic>
+        <mods:name><mods:namePart>Subject Name {i}</mods:namePart><mods:namePart type="date">1900</mods:namePart><mods:role><mods:roleTerm type="text">depicted</mods:roleTerm></mods:role></mods:name>
+        <mods:titleInfo><mods:title>Subject Title {i}</mods:title></mods:titleInfo>
+      </mods:subject>''',
+    '<mods:subject displayLabel="Question?"><mods:topic>Why {i}</mods:topic></mods:subject>',
+    '<mods:subject authority="local"><mods:topic>Mixed <x:b xmlns:x="http://example.com/x">inner</x:b> tail</mods:topic><!-- skip --></mods:subject>',
+    '<mods:subject><mods:genre>Not a topic {i}</mods:genre></mods:subject>',
+    '<mods:tableOfContents>Contents {i}</mods:tableOfContents>',
+    '<mods:typeOfResource>still image</mods:typeOfResource>',
+    '<mods:typeOfResource>text</mods:typeOfResource>',
+    '''<mods:titleInfo>
+        <mods:nonSort>The</mods:nonSort><mods:title>Title
+          {i}</mods:title><mods:subTitle>Sub {i}</mods:subTitle>
+        <mods:partName>Part name</mods:partName><mods:partNumber>Volume {i}, no. 3</mods:partNumber>
+      </mods:titleInfo>''',
+    '<mods:titleInfo type="alternative"><mods:title>Alternative {i}</mods:title></mods:titleInfo>',
+    '<mods:titleInfo type="uniform" displayLabel="Uniform"><mods:title>Uniform {i}</mods:title></mods:titleInfo>',
+    '<mods:titleInfo><mods:title>Second primary {i}</mods:title></mods:titleInfo>',
+    '<x:extension xmlns:x="http://example.com/x"><mods:titleInfo><mods:title>Not MODS-level {i}</mods:title></mods:titleInfo></x:extension>',
+    '<mods:extension><mods:note>Nested note {i}</mods:note></mods:extension>',
+]
+
+
+def generated_corpus(count=150, seed=2035):
+    rand = random.Random(seed)
+    for i in range(count):
+        elements = [rand.choice(ELEMENTS).format(i=rand.randrange(1, 30)) for _ in range(rand.randrange(1, 25))]
+        yield test_modsindexer.MODS_TEMPLATE.format(inserted_mods='\n'.join(elements)).encode('utf8')
+
+
+class TestSinglePassModsIndexerCorpus(unittest.TestCase):
+
+    def test_generated_corpus(self):
+        for mods_bytes in generated_corpus():
+            with self.subTest(mods=mods_bytes.decode('utf8')):
+                self.assertEqual(
+                    index_output(SinglePassModsIndexer, mods_bytes),
+                    index_output(ModsIndexer, mods_bytes),
+                )
+
+    def test_every_element(self):
+        mods_string = '\n'.join(element.format(i=7) for element in ELEMENTS)
+        mods_bytes = test_modsindexer.MODS_TEMPLATE.format(inserted_mods=mods_string).encode('utf8')
+        output = index_output(SinglePassModsIndexer, mods_bytes)
+        self.assertEqual(output, index_output(ModsIndexer, mods_bytes))
+        self.assertIn(b'mods_constituent_display_ssim', output)
+
+    def test_unsupported_paths_use_xpath(self):
+        indexer = SinglePassModsIndexer(test_modsindexer.MODS_TEMPLATE.format(
+            inserted_mods='<mods:note>one</mods:note><mods:note>two</mods:note>').encode('utf8'))
+        self.assertEqual([n.text for n in indexer.xpath('mods:note[last()]')], ['two'])
+        self.assertEqual([n.text for n in indexer.xpath('mods:note')], ['one', 'two'])
+
+    def test_no_mods_object(self):
+        mods_string = '\n'.join(element.format(i=7) for element in ELEMENTS)
+        mods_bytes = test_modsindexer.MODS_TEMPLATE.format(inserted_mods=mods_string).encode('utf8')
+        with patch('bdr_solrizer.indexers.singlepassmodsindexer.mods.Mods', side_effect=mods.Mods) as mods_class:
+            indexer = SinglePassModsIndexer(mods_bytes)
+            indexer.index_data()
+            #a fallback query, compiled now - it doesn't need the Mods object either
+            SinglePassModsIndexer._xpath_evaluators.pop('mods:note[last()]', None)
+            self.assertEqual(len(indexer.xpath('mods:note[last()]')), 1)
+        mods_class.assert_not_called()
+
+
+def suite():
+    suite = unittest.makeSuite(TestSinglePassModsIndexerFixtures, 'test')
+    suite.addTests(unittest.makeSuite(TestSinglePassModsIndexerCorpus, 'test'))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
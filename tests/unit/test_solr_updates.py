@@ -0,0 +1,415 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import unittest
+import zipfile
+from unittest.mock import patch
+from urllib.parse import urlparse, parse_qs
+from diskcache import Cache
+from rdflib import Graph, URIRef
+from bdrxml import mods
+from bdrxml.rdfns import model as model_ns, relsext as relsext_ns
+from bdrocfl import ocfl, test_utils
+from bdr_solrizer import commit_policy, delete_ledger, image_parent_ledger, queues, settings, solrizer, solrjson, zip_ledger
+from .fake_redis import FakeRedis, patch_redis
+
+
+class SolrService:
+    '''Stand-in for solr's update & real-time get handlers, running on a local port. Like solr behind
+    jetty's GzipHandler, it inflates gzipped request bodies. Each update is saved as
+    {'path', 'params', 'headers', 'wire_bytes', 'body'}; real-time gets return docs from self.docs.'''
+
+    def __init__(self):
+        self.updates = []
+        self.docs = {}
+        self.gets = []
+        self.delay = 0
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                service.gets.append(params)
+                ids = params['ids'][0].split(',')
+                docs = [service.docs[pid] for pid in ids if pid in service.docs]
+                response = json.dumps({'response': {'numFound': len(docs), 'start': 0, 'docs': docs}}).encode('utf8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def do_POST(self):
+                time.sleep(service.delay)
+                url = urlparse(self.path)
+                wire_body = self.rfile.read(int(self.headers['Content-Length']))
+                body = wire_body
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(wire_body)
+                service.updates.append({
+                        'path': url.path,
+                        'params': parse_qs(url.query),
+                        'headers': dict(self.headers),
+                        'wire_bytes': len(wire_body),
+                        'body': json.loads(body),
+                    })
+                response = b'{"responseHeader":{"status":0}}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/solr/'
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestSolrUpdates(unittest.TestCase):
+
+    def setUp(self):
+        self.pid = 'testsuite:abcd1234'
+        with Cache(settings.CACHE_DIR) as cache:
+            cache.clear()
+        patch_redis(self)
+        shutil.rmtree(os.path.join(settings.OCFL_ROOT, '1b5'), ignore_errors=True)
+        self.solr = SolrService()
+        self.addCleanup(self.solr.close)
+
+    def test_gzip_update_body(self):
+        data = solrjson.dumps({'add': {'doc': {'pid': self.pid, 'extracted_text': 'some text ' * 1000}}})
+        self.assertEqual(solrizer.gzip_update_body(data, min_bytes=None, level=6), (data, {}))
+        self.assertEqual(solrizer.gzip_update_body(data, min_bytes=len(data) + 1, level=6), (data, {}))
+        body, headers = solrizer.gzip_update_body(data, min_bytes=len(data), level=6)
+        self.assertEqual(headers, {'Content-Encoding': 'gzip'})
+        self.assertEqual(gzip.decompress(body), data)
+        self.assertLess(len(body), len(data) / 10)
+
+    def test_gzipped_post(self):
+        mods_obj = mods.make_mods()
+        mods_obj.title = 'A title'
+        extracted_text = ' '.join(f'word{i % 500}' for i in range(20000))
+        test_utils.create_object(storage_root=settings.OCFL_ROOT, pid=self.pid,
+                files=[('MODS', mods_obj.serialize()), ('EXTRACTED_TEXT', extracted_text.encode('utf8'))])
+        with patch('bdr_solrizer.solrizer.SOLR_GZIP_MIN_BYTES', 10000):
+            with patch('bdr_solrizer.solrizer.Solrizer._queue_follow_up_jobs'):
+                solrizer.Solrizer(self.solr.url, self.pid).process(settings.ADD_ACTION)
+                #small bodies aren't worth compressing
+                solrizer.Solrizer(self.solr.url, self.pid).process(settings.DELETE_ACTION)
+        add, delete = self.solr.updates
+        self.assertEqual(add['path'], '/solr/update/json')
+        self.assertEqual(add['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(add['body']['add']['doc']['pid'], self.pid)
+        self.assertEqual(add['body']['add']['doc']['extracted_text'], extracted_text)
+        self.assertLess(add['wire_bytes'], len(extracted_text) / 5)
+        self.assertNotIn('Content-Encoding', delete['headers'])
+        self.assertEqual(delete['body'], {'delete': {'id': self.pid}})
+
+    def test_batch_delete(self):
+        pids = [f'testsuite:{i}' for i in range(5)]
+        with patch('bdr_solrizer.solrizer.DELETE_BATCH_SIZE', 2):
+            solrizer.BatchSolrizer(self.solr.url, pids).process(settings.DELETE_ACTION)
+        self.assertEqual([update['body'] for update in self.solr.updates],
+                [{'delete': pids[:2]}, {'delete': pids[2:4]}, {'delete': pids[4:]}])
+        self.assertEqual({update['path'] for update in self.solr.updates}, {'/solr/update/json'})
+
+    def test_queued_deletes_coalesced(self):
+        pids = [f'testsuite:{i}' for i in range(5)]
+        with patch('bdr_solrizer.queues.HIGH_PRIORITY_Q') as queue:
+            for pid in pids:
+                queues.queue_solrize_job(pid, action=settings.DELETE_ACTION)
+        self.assertEqual(queue.enqueue_call.call_count, 5)
+        with patch('bdr_solrizer.solrizer.DELETE_BATCH_SIZE', 3):
+            #the first job deletes two of the waiting pids too...
+            solrizer.Solrizer(self.solr.url, pids[2]).process(settings.DELETE_ACTION)
+            self.assertEqual(len(self.solr.updates), 1)
+            deleted = self.solr.updates[0]['body']['delete']
+            self.assertEqual(deleted[0], pids[2])
+            self.assertEqual(len(set(deleted)), 3)
+            #...so their jobs skip - & the next job that doesn't deletes the last two
+            for pid in pids:
+                if pid != pids[2]:
+                    solrizer.Solrizer(self.solr.url, pid).process(settings.DELETE_ACTION)
+        first, second = self.solr.updates
+        self.assertEqual(len(second['body']['delete']), 2)
+        self.assertEqual(sorted(first['body']['delete'] + second['body']['delete']), pids)
+
+    def test_queued_delete_fails(self):
+        pids = ['testsuite:1', 'testsuite:2']
+        for pid in pids:
+            delete_ledger.request_delete(pid)
+        with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr', side_effect=Exception('solr is down')):
+            with self.assertRaises(Exception):
+                solrizer.Solrizer(self.solr.url, pids[0]).process(settings.DELETE_ACTION)
+        #the other pid's job still has to delete it
+        solrizer.Solrizer(self.solr.url, pids[1]).process(settings.DELETE_ACTION)
+        self.assertEqual(self.solr.updates[0]['body'], {'delete': {'id': pids[1]}})
+
+    def test_delete_from_solr(self):
+        pids = [f'testsuite:{i}' for i in range(2500)]
+        with patch('bdr_solrizer.solrizer.SOLR74_URL', self.solr.url):
+            solrizer.delete_from_solr(pids)
+        self.assertEqual([len(update['body']['delete']) for update in self.solr.updates], [1000, 1000, 500])
+        self.assertEqual([pid for update in self.solr.updates for pid in update['body']['delete']], pids)
+
+    def test_commit_within(self):
+        self.assertEqual(commit_policy.commit_within(settings.ADD_ACTION, queued_jobs=0, update_seconds=0), 10000)
+        self.assertEqual(commit_policy.commit_within(settings.ZIP_ACTION, queued_jobs=0, update_seconds=0), 50000)
+        self.assertEqual(commit_policy.commit_within(settings.ADD_ACTION, queued_jobs=commit_policy.BUSY_QUEUE_DEPTH, update_seconds=0.1), 20000)
+        self.assertEqual(commit_policy.commit_within(settings.ADD_ACTION, queued_jobs=10, update_seconds=commit_policy.SLOW_UPDATE_SECONDS * 3), 40000)
+        self.assertEqual(commit_policy.commit_within(settings.ADD_ACTION, queued_jobs=1000000, update_seconds=0), settings.COMMIT_WITHIN_MAX)
+
+    def test_adaptive_commit_within(self):
+        fake_redis = FakeRedis()
+        with patch('bdr_solrizer.commit_policy._redis', fake_redis):
+            with patch('bdr_solrizer.commit_policy.queue_depth', return_value=0):
+                solrizer.Solrizer(self.solr.url, self.pid)._delete_solr_document(self.pid)
+            self.assertGreater(commit_policy.recent_update_seconds(), 0)
+            with patch('bdr_solrizer.commit_policy.queue_depth', return_value=commit_policy.BUSY_QUEUE_DEPTH * 2):
+                solrizer.Solrizer(self.solr.url, self.pid)._delete_solr_document(self.pid)
+        self.assertEqual(self.solr.updates[0]['params']['commitWithin'], ['10000'])
+        self.assertGreaterEqual(int(self.solr.updates[1]['params']['commitWithin'][0]), 30000)
+
+    def test_batch_latency_doesnt_slow_edits(self):
+        self.solr.delay = commit_policy.SLOW_UPDATE_SECONDS / 4
+        with patch('bdr_solrizer.commit_policy.SLOW_UPDATE_SECONDS', 0.1):
+            #a big batch is slow because it's big...
+            solrizer.BatchSolrizer(self.solr.url, [f'testsuite:{i}' for i in range(5)]).process(settings.DELETE_ACTION)
+            self.assertEqual(commit_policy.recent_update_seconds(), 0)
+            #...so the next single edit still gets the usual commitWithin
+            self.solr.delay = 0
+            solrizer.Solrizer(self.solr.url, self.pid)._delete_solr_document(self.pid)
+        self.assertEqual(self.solr.updates[-1]['params']['commitWithin'], ['10000'])
+        self.assertGreater(commit_policy.recent_update_seconds(), 0)
+
+    def test_commit_within_without_redis(self):
+        with patch('bdr_solrizer.commit_policy.queue_depth', side_effect=commit_policy.RedisError('connection refused')):
+            solrizer.Solrizer(self.solr.url, self.pid)._delete_solr_document(self.pid)
+        self.assertEqual(self.solr.updates[0]['params']['commitWithin'], ['10000'])
+
+    def test_bulk_mode(self):
+        with patch('bdr_solrizer.commit_policy._redis', FakeRedis()):
+            commit_policy.start_bulk_mode(hours=1)
+            self.assertIsNotNone(commit_policy.bulk_mode_started())
+            solrizer.BatchSolrizer(self.solr.url, ['testsuite:1', 'testsuite:2']).process(settings.DELETE_ACTION)
+            commit_policy.finish_bulk_mode(self.solr.url)
+            self.assertIsNone(commit_policy.bulk_mode_started())
+        delete, commit = self.solr.updates
+        self.assertEqual(delete['params'], {})
+        self.assertEqual(commit['body'], {'commit': {}})
+
+    def create_zip_objects(self, pids):
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, mode='w') as zip_file:
+            zip_file.writestr('test.txt', b'1234')
+        for pid in pids:
+            self.addCleanup(shutil.rmtree, ocfl.object_path(settings.OCFL_ROOT, pid), ignore_errors=True)
+            test_utils.create_object(storage_root=settings.OCFL_ROOT, pid=pid, files=[('ZIP', zip_buffer.getvalue())])
+
+    def test_batch_zips(self):
+        pids = ['testsuite:zip1', 'testsuite:zip2', 'testsuite:zip3']
+        self.create_zip_objects(pids)
+        self.solr.docs = {
+                'testsuite:zip1': {'pid': 'testsuite:zip1'},
+                'testsuite:zip2': {'pid': 'testsuite:zip2', 'zip_filelist_timestamp_dsi': '2030-01-01T00:00:00Z'},
+            }
+        with patch('bdr_solrizer.zip_ledger._redis', FakeRedis()):
+            solrizer.BatchSolrizer(self.solr.url, pids + ['testsuite:notfound']).process(settings.ZIP_ACTION)
+            #one real-time get for all the pids, & one post for the ZIPs solr doesn't have yet
+            self.assertEqual(self.solr.gets, [{'ids': [','.join(pids)], 'fl': ['pid,zip_filelist_timestamp_dsi']}])
+            delete, zips = self.solr.updates
+            self.assertEqual(delete['body'], {'delete': ['testsuite:notfound']})
+            self.assertEqual([doc['pid'] for doc in zips['body']], ['testsuite:zip1', 'testsuite:zip3'])
+            self.assertEqual(zips['body'][0]['zip_filelist_ssim'], {'set': ['test.txt']})
+            #the ledger knows about all three now - checking again doesn't touch solr
+            solrizer.BatchSolrizer(self.solr.url, pids).process(settings.ZIP_ACTION)
+            self.assertEqual(len(self.solr.gets), 1)
+            self.assertEqual(len(self.solr.updates), 2)
+            #adding the doc again carries over the file list of the unchanged ZIP, so there's no zip job
+            with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+                with patch('bdr_solrizer.solrizer.queue_solrize_job') as queue_job:
+                    solrizer.Solrizer(self.solr.url, 'testsuite:zip1').process(settings.ADD_ACTION)
+            queue_job.assert_not_called()
+            add_doc = self.solr.updates[-1]['body']['add']['doc']
+            self.assertEqual(add_doc['zip_filelist_ssim'], ['test.txt'])
+            self.assertEqual(add_doc['zip_filelist_timestamp_dsi'], zips['body'][0]['zip_filelist_timestamp_dsi']['set'])
+            solrizer.Solrizer(self.solr.url, 'testsuite:zip1').process(settings.ZIP_ACTION)
+            self.assertEqual(len(self.solr.gets), 1)
+
+    def test_big_zip_streamed_from_disk(self):
+        names = [f'dir{i % 10}/file{i:05}.txt' for i in range(3000)]
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, mode='w') as zip_file:
+            for name in reversed(names):
+                zip_file.writestr(name, b'')
+        self.addCleanup(shutil.rmtree, ocfl.object_path(settings.OCFL_ROOT, self.pid), ignore_errors=True)
+        test_utils.create_object(storage_root=settings.OCFL_ROOT, pid=self.pid, files=[('ZIP', zip_buffer.getvalue())])
+        with patch('bdr_solrizer.zip_ledger._redis', FakeRedis()):
+            with patch('bdr_solrizer.solrizer.SOLR_BODY_MEMORY_BYTES', 1000):
+                with patch('bdr_solrizer.zip_entries.ZIP_ENTRY_RUN_SIZE', 500):
+                    solrizer.Solrizer(self.solr.url, self.pid).process(settings.ZIP_ACTION)
+                self.assertEqual(self.solr.updates[-1]['body'][0]['zip_filelist_ssim'], {'set': sorted(names)})
+                #same ZIP again (eg. a new solr doc) - the listing comes from the cache, & it's gzipped from disk
+                zip_ledger.forget([self.pid])
+                with patch('bdr_solrizer.solrizer.SOLR_GZIP_MIN_BYTES', 1000):
+                    with patch('bdr_solrizer.zip_entries.iter_names') as iter_names:
+                        solrizer.Solrizer(self.solr.url, self.pid).process(settings.ZIP_ACTION)
+                iter_names.assert_not_called()
+        update = self.solr.updates[-1]
+        self.assertEqual(update['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(update['body'][0]['zip_filelist_ssim'], {'set': sorted(names)})
+        #too big for an add to carry over
+        with patch('bdr_solrizer.solrdocbuilder.ZIP_FILELIST_MAX_ADD_BYTES', 1000):
+            with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+                with patch('bdr_solrizer.solrizer.queue_solrize_job') as queue_job:
+                    solrizer.Solrizer(self.solr.url, self.pid).process(settings.ADD_ACTION)
+        queue_job.assert_called_once_with(self.pid, action=settings.ZIP_ACTION)
+
+    def test_changed_zip_gets_zip_job(self):
+        self.create_zip_objects([self.pid])
+        with patch('bdr_solrizer.zip_ledger._redis', FakeRedis()):
+            solrizer.Solrizer(self.solr.url, self.pid).process(settings.ZIP_ACTION)
+            #new ZIP in a new version
+            zip_buffer = io.BytesIO()
+            with zipfile.ZipFile(zip_buffer, mode='w') as zip_file:
+                zip_file.writestr('new.txt', b'1234')
+            v2_files = [('ZIP', zip_buffer.getvalue())]
+            object_root = ocfl.object_path(settings.OCFL_ROOT, self.pid)
+            with open(os.path.join(object_root, 'inventory.json'), 'rb') as f:
+                inventory = json.loads(f.read())
+            test_utils.add_version_to_inventory(inventory, 'v2', test_utils.get_base_version(created='2020-01-01T00:00:00.000000Z'), v2_files)
+            test_utils.write_inventory_files(object_root, inventory)
+            test_utils.write_content_files(object_root, 'v2', v2_files)
+            with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+                with patch('bdr_solrizer.solrizer.queue_solrize_job') as queue_job:
+                    solrizer.Solrizer(self.solr.url, self.pid).process(settings.ADD_ACTION)
+            queue_job.assert_called_once_with(self.pid, action=settings.ZIP_ACTION)
+            self.assertNotIn('zip_filelist_ssim', self.solr.updates[-1]['body']['add']['doc'])
+            solrizer.Solrizer(self.solr.url, self.pid).process(settings.ZIP_ACTION)
+            self.assertEqual(self.solr.updates[-1]['body'][0]['zip_filelist_ssim'], {'set': ['new.txt']})
+
+    def test_batch_zips_skips_objects_without_a_good_zip(self):
+        self.create_zip_objects(['testsuite:zip1'])
+        for pid, files in [('testsuite:nozip', [('MODS', b'')]), ('testsuite:badzip', [('ZIP', b'not a zip')])]:
+            self.addCleanup(shutil.rmtree, ocfl.object_path(settings.OCFL_ROOT, pid), ignore_errors=True)
+            test_utils.create_object(storage_root=settings.OCFL_ROOT, pid=pid, files=files)
+        with patch('bdr_solrizer.zip_ledger._redis', FakeRedis()):
+            with patch('bdr_solrizer.solrizer.queue_solrize_job') as queue_job:
+                solrizer.BatchSolrizer(self.solr.url, ['testsuite:nozip', 'testsuite:badzip', 'testsuite:zip1']).process(settings.ZIP_ACTION)
+            self.assertEqual(zip_ledger.indexed_zips(['testsuite:badzip']), {})
+        #no real-time get for the object without a ZIP, & the bad ZIP gets its own job
+        self.assertEqual(self.solr.gets[0]['ids'], ['testsuite:badzip,testsuite:zip1'])
+        queue_job.assert_called_once_with('testsuite:badzip', action=settings.ZIP_ACTION)
+        self.assertEqual(self.solr.updates[0]['body'], [{
+            'pid': 'testsuite:zip1',
+            'zip_filelist_ssim': {'set': ['test.txt']},
+            'zip_filelist_timestamp_dsi': self.solr.updates[0]['body'][0]['zip_filelist_timestamp_dsi'],
+        }])
+
+    def test_batch_add_queues_one_zip_job(self):
+        pids = ['testsuite:zip1', 'testsuite:zip2']
+        self.create_zip_objects(pids)
+        with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+            with patch('bdr_solrizer.solrizer.queue_solrize_job') as queue_job:
+                with patch('bdr_solrizer.solrizer.queue_solrize_batch_job') as queue_batch_job:
+                    solrizer.BatchSolrizer(self.solr.url, pids).process(settings.ADD_ACTION)
+        queue_job.assert_not_called()
+        queue_batch_job.assert_called_once_with(pids, action=settings.ZIP_ACTION)
+
+    def test_image_parent_flags_coalesced(self):
+        parents = ['testsuite:parent1', 'testsuite:parent2', 'testsuite:parent3']
+        children = {f'testsuite:{parent[-7:]}child{i}': parent for parent in parents for i in range(3)}
+        for pid in parents + ['testsuite:parent4']:
+            self.addCleanup(shutil.rmtree, ocfl.object_path(settings.OCFL_ROOT, pid), ignore_errors=True)
+            test_utils.create_object(storage_root=settings.OCFL_ROOT, pid=pid)
+        for pid, parent in children.items():
+            rels_ext = Graph()
+            rels_ext.add( (URIRef(f'info:fedora/{pid}'), model_ns.hasModel, URIRef('info:fedora/bdr-cmodel:jp2')) )
+            rels_ext.add( (URIRef(f'info:fedora/{pid}'), relsext_ns.isPartOf, URIRef(f'info:fedora/{parent}')) )
+            self.addCleanup(shutil.rmtree, ocfl.object_path(settings.OCFL_ROOT, pid), ignore_errors=True)
+            test_utils.create_object(storage_root=settings.OCFL_ROOT, pid=pid, files=[('RELS-EXT', rels_ext.serialize(format='xml'))])
+        with patch('bdr_solrizer.image_parent_ledger._redis', FakeRedis()):
+            with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+                with patch('bdr_solrizer.solrizer.queue_solrize_job') as queue_job:
+                    for pid in children:
+                        solrizer.Solrizer(self.solr.url, pid).process(settings.ADD_ACTION)
+                    #one pending job per parent, however many children got added (in separate jobs)
+                    self.assertEqual([c.args[0] for c in queue_job.mock_calls], parents)
+                    self.solr.updates.clear()
+                    image_parent_ledger.request_flag('testsuite:parent4')
+                    #the first job flags all the pending parents in one request...
+                    solrizer.Solrizer(self.solr.url, 'testsuite:parent2').process(settings.IMAGE_PARENT_ACTION)
+                    self.assertEqual([doc['pid'] for doc in self.solr.updates[0]['body']], ['testsuite:parent2', 'testsuite:parent1', 'testsuite:parent3', 'testsuite:parent4'])
+                    self.assertEqual(self.solr.updates[0]['body'][0][settings.IMAGE_PARENT_FIELD], {'set': True})
+                    #...so the others just skip, without even loading the parent
+                    with patch('bdr_solrizer.solrizer.StorageObject') as storage_object_class:
+                        for parent in parents:
+                            solrizer.Solrizer(self.solr.url, parent).process(settings.IMAGE_PARENT_ACTION)
+                    storage_object_class.assert_not_called()
+                    self.assertEqual(len(self.solr.updates), 1)
+                    #flagged parents don't get jobs - until an add replaces a parent's doc
+                    queue_job.reset_mock()
+                    solrizer.Solrizer(self.solr.url, 'testsuite:parent1child0').process(settings.ADD_ACTION)
+                    queue_job.assert_not_called()
+                    solrizer.Solrizer(self.solr.url, 'testsuite:parent1').process(settings.ADD_ACTION)
+                    solrizer.Solrizer(self.solr.url, 'testsuite:parent1child0').process(settings.ADD_ACTION)
+                    queue_job.assert_called_once_with('testsuite:parent1', action=settings.IMAGE_PARENT_ACTION)
+
+    def test_image_parent_reindexed_gets_flagged_again(self):
+        parent = 'testsuite:parent1'
+        self.addCleanup(shutil.rmtree, ocfl.object_path(settings.OCFL_ROOT, parent), ignore_errors=True)
+        test_utils.create_object(storage_root=settings.OCFL_ROOT, pid=parent)
+        child_requests = []
+        def run_child_job(pid, action):
+            #a child job that runs as soon as it's queued, before the parent's job finishes
+            child_requests.append(image_parent_ledger.request_flag(parent))
+        with patch('bdr_solrizer.image_parent_ledger._redis', FakeRedis()):
+            image_parent_ledger.record_flagged([parent])
+            with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs', side_effect=run_child_job):
+                solrizer.Solrizer(self.solr.url, parent).process(settings.ADD_ACTION)
+            self.assertFalse(image_parent_ledger.is_flagged(parent))
+        self.assertEqual(child_requests, [True])
+
+    def test_image_parent_pending_while_flagging(self):
+        parent = 'testsuite:parent1'
+        self.addCleanup(shutil.rmtree, ocfl.object_path(settings.OCFL_ROOT, parent), ignore_errors=True)
+        test_utils.create_object(storage_root=settings.OCFL_ROOT, pid=parent)
+        with patch('bdr_solrizer.image_parent_ledger._redis', FakeRedis()):
+            self.assertTrue(image_parent_ledger.request_flag(parent))
+            self.assertFalse(image_parent_ledger.request_flag(parent))
+            #job 1 starts - then another child gets added before it records the flag, & queues job 2
+            image_parent_ledger.job_started(parent)
+            self.assertTrue(image_parent_ledger.request_flag(parent))
+            image_parent_ledger.record_flagged([parent])
+            #job 2 skips, but it isn't left pending
+            solrizer.Solrizer(self.solr.url, parent).process(settings.IMAGE_PARENT_ACTION)
+            self.assertEqual(self.solr.updates, [])
+            #so once an add drops the flags, the next child queues a job again
+            image_parent_ledger.forget([parent])
+            self.assertTrue(image_parent_ledger.request_flag(parent))
+            #& if that job gets lost, its pending key expires
+            image_parent_ledger._redis.delete(f'{image_parent_ledger.PENDING_JOB_KEY_PREFIX}{parent}')
+            self.assertTrue(image_parent_ledger.request_flag(parent))
+
+
+def suite():
+    suite = unittest.makeSuite(TestSolrUpdates, 'test')
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,7 @@ import shutil
 import sqlite3
 import tempfile
 import unittest
-from unittest.mock import patch
+from unittest.mock import call, patch
 import zipfile
 import responses
 from rdflib import Graph, URIRef
@@ -15,9 +15,11 @@ from diskcache import Cache
 from bdrxml import irMetadata, rights, mods, darwincore
 from bdrxml.rdfns import model as model_ns, relsext as relsext_ns
 from bdrocfl import ocfl, test_utils
-from bdr_solrizer import solrizer, solrdocbuilder, settings, utils
+from bdr_solrizer import solrizer, solrdocbuilder, settings, solrjson, utils
+from bdr_solrizer.indexers import StorageIndexer
 from bdr_solrizer.indexers.relsextindexer import MODELS_NS
 from . import test_data
+from .fake_redis import patch_redis
 
 
 OCFL_ROOT = os.environ['OCFL_ROOT']
@@ -29,6 +31,8 @@ class TestSolrizer(unittest.TestCase):
         self.pid = 'testsuite:abcd1234'
         with Cache(settings.CACHE_DIR) as file_cache:
             file_cache.clear()
+        patch_redis(self)
+        solrdocbuilder._parsed_rels_ext.clear()
         try:
             shutil.rmtree(os.path.join(settings.OCFL_ROOT, '1b5'))
         except FileNotFoundError:
@@ -187,6 +191,45 @@ class TestSolrizer(unittest.TestCase):
         actual_solr_doc = json.loads(post_to_solr.mock_calls[0].args[0])
         self.assertEqual(actual_solr_doc['add']['doc'][settings.RESOURCE_TYPE_FIELD], 'maps')
 
+    def test_index_data_cached_by_checksum(self):
+        mods_obj = mods.make_mods()
+        mods_obj.title = 'cached title'
+        test_utils.create_object(storage_root=OCFL_ROOT, pid=self.pid,
+                files=[
+                    ('rightsMetadata', rights.make_rights().serialize()),
+                    ('MODS', mods_obj.serialize()),
+                ])
+        with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+            with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
+                solrizer.solrize(self.pid)
+                with patch('bdr_solrizer.solrdocbuilder.ModsIndexer.index_data') as mods_index_data:
+                    with patch('bdr_solrizer.solrdocbuilder.RightsIndexer.index_data') as rights_index_data:
+                        solrizer.solrize(self.pid)
+        mods_index_data.assert_not_called()
+        rights_index_data.assert_not_called()
+        first_doc = json.loads(post_to_solr.mock_calls[0].args[0])
+        second_doc = json.loads(post_to_solr.mock_calls[1].args[0])
+        self.assertEqual(second_doc['add']['doc']['primary_title'], 'cached title')
+        self.assertEqual(first_doc, second_doc)
+
+    def test_index_data_cache_key(self):
+        test_utils.create_object(storage_root=OCFL_ROOT, pid=self.pid,
+                files=[('rightsMetadata', rights.make_rights().serialize())])
+        storage_object = solrdocbuilder.StorageObject(self.pid)
+        builder = solrdocbuilder.SolrDocBuilder(storage_object)
+        with patch('bdr_solrizer.solrdocbuilder.RightsIndexer.index_data', return_value={'display': []}) as rights_index_data:
+            builder._get_index_data(solrdocbuilder.RightsIndexer, storage_object, 'rightsMetadata')
+            builder._get_index_data(solrdocbuilder.RightsIndexer, storage_object, 'rightsMetadata')
+            self.assertEqual(rights_index_data.call_count, 1)
+            #the same checksum, but of another type
+            storage_object.files_info['files']['rightsMetadata']['checksumType'] = 'MD5'
+            builder._get_index_data(solrdocbuilder.RightsIndexer, storage_object, 'rightsMetadata')
+            self.assertEqual(rights_index_data.call_count, 2)
+            #a setting the output depends on changed
+            with patch('bdr_solrizer.solrdocbuilder.RightsIndexer.INDEX_SETTINGS', ('other public', 'other brown')):
+                builder._get_index_data(solrdocbuilder.RightsIndexer, storage_object, 'rightsMetadata')
+            self.assertEqual(rights_index_data.call_count, 3)
+
     def test_tei(self):
         test_utils.create_object(storage_root=OCFL_ROOT, pid=self.pid,
                 files=[
@@ -283,6 +326,153 @@ class TestSolrizer(unittest.TestCase):
                 actual_solr_doc = json.loads(post_to_solr.mock_calls[0].args[0])
             self.assertEqual(actual_solr_doc['add']['doc']['primary_title'], 'original object title')
 
+    def test_sibling_children_share_parent_descriptive_data(self):
+        parent_pid = 'testsuite:2'
+        sibling_pid = 'testsuite:sibling'
+        self.addCleanup(shutil.rmtree, ocfl.object_path(OCFL_ROOT, sibling_pid), ignore_errors=True)
+        parent_mods = mods.make_mods()
+        parent_mods.title = 'parent title'
+        test_utils.create_object(storage_root=OCFL_ROOT, pid=parent_pid,
+                files=[
+                    ('MODS', parent_mods.serialize()),
+                ])
+        for pid in [self.pid, sibling_pid]:
+            rels_ext = Graph()
+            rels_ext.add( (URIRef(f'info:fedora/{pid}'), model_ns.hasModel, URIRef('info:fedora/bdr-cmodel:jp2')) )
+            rels_ext.add( (URIRef(f'info:fedora/{pid}'), relsext_ns.isPartOf, URIRef(f'info:fedora/{parent_pid}')) )
+            test_utils.create_object(storage_root=OCFL_ROOT, pid=pid, files=[('RELS-EXT', rels_ext.serialize(format='xml'))])
+        child_data = solrdocbuilder.SolrDocBuilder(solrdocbuilder.StorageObject(self.pid)).descriptive_data()
+        self.assertEqual(child_data['primary_title'], 'parent title')
+        with patch('bdr_solrizer.solrdocbuilder.SolrDocBuilder._build_descriptive_data') as build_descriptive_data:
+            sibling_data = solrdocbuilder.SolrDocBuilder(solrdocbuilder.StorageObject(sibling_pid)).descriptive_data()
+        build_descriptive_data.assert_not_called()
+        self.assertEqual(sibling_data, child_data)
+
+    def test_rels_ext_cached_by_version(self):
+        rels_ext = Graph()
+        rels_ext.add( (URIRef(f'info:fedora/{self.pid}'), model_ns.hasModel, URIRef('info:fedora/bdr-cmodel:jp2')) )
+        rels_ext.add( (URIRef(f'info:fedora/{self.pid}'), relsext_ns.isPartOf, URIRef('info:fedora/testsuite:2')) )
+        test_utils.create_object(storage_root=OCFL_ROOT, pid=self.pid, files=[('RELS-EXT', rels_ext.serialize(format='xml'))])
+        with patch('bdr_solrizer.solrdocbuilder.parse_rels_ext', wraps=solrdocbuilder.parse_rels_ext) as parse:
+            self.assertEqual(solrdocbuilder.StorageObject(self.pid).parent_pid, 'testsuite:2')
+            self.assertTrue(solrdocbuilder.StorageObject(self.pid).is_image_child())
+            #another process - only the disk cache
+            solrdocbuilder._parsed_rels_ext.clear()
+            self.assertEqual(solrdocbuilder.StorageObject(self.pid).parent_pid, 'testsuite:2')
+        self.assertEqual(parse.call_count, 1)
+        #a new version is a cache miss
+        inventory = test_utils.get_base_inventory(self.pid)
+        v2_files = [('RELS-EXT', test_data.SIMPLE_RELS_EXT_XML.encode('utf8'))]
+        test_utils.add_version_to_inventory(inventory, 'v1', test_utils.get_base_version(), [('RELS-EXT', rels_ext.serialize(format='xml'))])
+        test_utils.add_version_to_inventory(inventory, 'v2', test_utils.get_base_version(), v2_files)
+        object_root = ocfl.object_path(OCFL_ROOT, self.pid)
+        test_utils.write_inventory_files(object_root, inventory)
+        test_utils.write_content_files(object_root, 'v2', v2_files)
+        self.assertEqual(solrdocbuilder.StorageObject(self.pid).parent_pid, None)
+
+    def test_datastream_summary_cached_by_version(self):
+        test_utils.create_object(storage_root=OCFL_ROOT, pid=self.pid, files=[('PDF', b'1234'), ('MODS', mods.make_mods().serialize())])
+        with patch('bdr_solrizer.solrdocbuilder.get_datastream_summary', wraps=solrdocbuilder.get_datastream_summary) as summarize:
+            first = StorageIndexer(solrdocbuilder.StorageObject(self.pid)).index_data()
+            second = StorageIndexer(solrdocbuilder.StorageObject(self.pid)).index_data()
+        self.assertEqual(summarize.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(sorted(first['ds_ids_ssim']), ['MODS', 'PDF'])
+        self.assertEqual(json.loads(first['datastreams_ssi'])['PDF']['size'], 4)
+        #a new version is a cache miss
+        inventory = test_utils.get_base_inventory(self.pid)
+        v2_files = [('PDF', b'123456')]
+        test_utils.add_version_to_inventory(inventory, 'v1', test_utils.get_base_version(), [('PDF', b'1234'), ('MODS', mods.make_mods().serialize())])
+        test_utils.add_version_to_inventory(inventory, 'v2', test_utils.get_base_version(), v2_files)
+        object_root = ocfl.object_path(OCFL_ROOT, self.pid)
+        test_utils.write_inventory_files(object_root, inventory)
+        test_utils.write_content_files(object_root, 'v2', v2_files)
+        index_data = StorageIndexer(solrdocbuilder.StorageObject(self.pid)).index_data()
+        self.assertEqual(json.loads(index_data['datastreams_ssi'])['PDF']['size'], 6)
+
+    def test_solrize_batch(self):
+        parent_pid = 'testsuite:2'
+        sibling_pid = 'testsuite:sibling'
+        self.addCleanup(shutil.rmtree, ocfl.object_path(OCFL_ROOT, sibling_pid), ignore_errors=True)
+        parent_mods = mods.make_mods()
+        parent_mods.title = 'parent title'
+        test_utils.create_object(storage_root=OCFL_ROOT, pid=parent_pid, files=[('MODS', parent_mods.serialize())])
+        for pid in [self.pid, sibling_pid]:
+            rels_ext = Graph()
+            rels_ext.add( (URIRef(f'info:fedora/{pid}'), model_ns.hasModel, URIRef('info:fedora/bdr-cmodel:jp2')) )
+            rels_ext.add( (URIRef(f'info:fedora/{pid}'), relsext_ns.isPartOf, URIRef(f'info:fedora/{parent_pid}')) )
+            test_utils.create_object(storage_root=OCFL_ROOT, pid=pid, files=[('RELS-EXT', rels_ext.serialize(format='xml'))])
+        with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+            with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
+                with patch('bdr_solrizer.solrizer.queue_solrize_job') as queue_job:
+                    with patch('bdr_solrizer.solrdocbuilder.StorageObject', wraps=solrdocbuilder.StorageObject) as storage_object_class:
+                        solrizer.solrize_batch([self.pid, 'testsuite:notfound', sibling_pid])
+        self.assertEqual(len(post_to_solr.mock_calls), 2)
+        #missing objects get removed from solr in one delete command
+        self.assertEqual(post_to_solr.mock_calls[0].args, (solrjson.dumps({'delete': ['testsuite:notfound']}), settings.DELETE_ACTION))
+        docs = json.loads(post_to_solr.mock_calls[1].args[0])
+        self.assertEqual([d['pid'] for d in docs], [self.pid, sibling_pid])
+        self.assertEqual([d['primary_title'] for d in docs], ['parent title', 'parent title'])
+        #the parent only gets loaded once for the whole batch
+        self.assertEqual([c.args[0] for c in storage_object_class.mock_calls if c.args], [parent_pid])
+        self.assertEqual(queue_job.mock_calls, [
+            call(parent_pid, action=settings.IMAGE_PARENT_ACTION),
+        ])
+
+    @responses.activate
+    def test_queue_dependent_object_jobs_in_batches(self):
+        child_pids = [f'testsuite:child{i}' for i in range(settings.SOLRIZE_BATCH_SIZE + 1)]
+        responses.add(responses.GET, f'{settings.SOLR74_URL}select/',
+                json={'response': {'numFound': len(child_pids), 'docs': [{'pid': pid} for pid in child_pids[:settings.SOLRIZE_BATCH_SIZE]]}, 'nextCursorMark': 'AoE/cGlk+1='})
+        responses.add(responses.GET, f'{settings.SOLR74_URL}select/',
+                json={'response': {'numFound': len(child_pids), 'docs': [{'pid': child_pids[-1]}]}, 'nextCursorMark': 'AoE/cGlk+2='})
+        with patch('bdr_solrizer.solrizer.queue_solrize_batch_job') as queue_batch_job:
+            solrizer.Solrizer(settings.SOLR74_URL, self.pid)._queue_dependent_object_jobs(self.pid, settings.ADD_ACTION)
+        self.assertEqual(queue_batch_job.mock_calls, [
+            call(child_pids[:settings.SOLRIZE_BATCH_SIZE], action=settings.ADD_ACTION),
+            call(child_pids[-1:], action=settings.ADD_ACTION),
+        ])
+        #paged with a cursor, sorted on the unique key
+        self.assertEqual([(c.request.params['sort'], c.request.params['cursorMark']) for c in responses.calls],
+                [('pid asc', '*'), ('pid asc', 'AoE/cGlk+1=')])
+
+    @responses.activate
+    def test_solrize_child_object_with_missing_parent(self):
+        parent_pid = 'testsuite:missingparent'
+        self.addCleanup(shutil.rmtree, ocfl.object_path(OCFL_ROOT, parent_pid), ignore_errors=True)
+        rels_ext = Graph()
+        rels_ext.add( (URIRef(f'info:fedora/{self.pid}'), model_ns.hasModel, URIRef('info:fedora/bdr-cmodel:pdf')) )
+        rels_ext.add( (URIRef(f'info:fedora/{self.pid}'), relsext_ns.isPartOf, URIRef(f'info:fedora/{parent_pid}')) )
+        test_utils.create_object(storage_root=OCFL_ROOT, pid=self.pid,
+                files=[
+                    ('RELS-EXT', rels_ext.serialize(format='xml')),
+                ])
+        with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+            with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
+                solrizer.solrize(self.pid)
+        self.assertNotIn('primary_title', json.loads(post_to_solr.mock_calls[0].args[0])['add']['doc'])
+        with Cache(settings.CACHE_DIR) as cache:
+            self.assertTrue(cache[f'{parent_pid}_missing'])
+            self.assertEqual(cache[f'{self.pid}_absent_metadata']['ds_ids'], ['MODS', 'DWC', 'TEI'])
+        #parent shows up - the negative cache means we don't look for it again yet
+        parent_mods = mods.make_mods()
+        parent_mods.title = 'parent title'
+        test_utils.create_object(storage_root=OCFL_ROOT, pid=parent_pid, files=[('MODS', parent_mods.serialize())])
+        storage_object = solrdocbuilder.StorageObject(self.pid)
+        self.assertIsNone(storage_object.get_metadata_bytes_to_index('MODS'))
+        self.assertEqual(storage_object.ancestors, [None, None, None, None])
+        #indexing the parent clears the negative entries for it and its dependents
+        responses.add(responses.GET, f'{settings.SOLR74_URL}select/',
+                json={'response': {'numFound': 1, 'docs': [{'pid': self.pid}]}, 'nextCursorMark': 'AoE1'})
+        with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr'):
+            with patch('bdr_solrizer.solrizer.queue_solrize_job') as queue_job:
+                solrizer.solrize(parent_pid)
+        queue_job.assert_called_once_with(self.pid, action=settings.ADD_ACTION)
+        with patch('bdr_solrizer.solrizer.Solrizer._queue_dependent_object_jobs'):
+            with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
+                solrizer.solrize(self.pid)
+        self.assertEqual(json.loads(post_to_solr.mock_calls[0].args[0])['add']['doc']['primary_title'], 'parent title')
+
     def test_solrize_object_with_deleted_files(self):
         inventory = test_utils.get_base_inventory(self.pid)
         v1_files = [('MODS', b'1234'), ('JP2', b'abcd')]
@@ -304,13 +494,13 @@ class TestSolrizer(unittest.TestCase):
     def test_solrize_object_not_found(self):
         with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
             solrizer.solrize(self.pid)
-        post_to_solr.assert_called_once_with(json.dumps({'delete': {'id': self.pid}}), 'delete')
+        post_to_solr.assert_called_once_with(solrjson.dumps({'delete': {'id': self.pid}}), 'delete')
 
     def test_solrize_object_deleted(self):
         test_utils.create_deleted_object(storage_root=OCFL_ROOT, pid=self.pid)
         with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
             solrizer.solrize(self.pid)
-        post_to_solr.assert_called_once_with(json.dumps({'delete': {'id': self.pid}}), 'delete')
+        post_to_solr.assert_called_once_with(solrjson.dumps({'delete': {'id': self.pid}}), 'delete')
 
     def test_solrize_rels_ext_not_found(self):
         test_utils.create_object(storage_root=OCFL_ROOT, pid=self.pid,
@@ -332,36 +522,38 @@ class TestSolrizer(unittest.TestCase):
                     ('RELS-EXT', b''),
                     ('ZIP', zip_buffer.getvalue()),
                 ])
-        with patch('bdr_solrizer.solrizer.Solrizer._get_existing_solr_doc') as solr_doc_mock:
-            solr_doc_mock.return_value = {'pid': self.pid, 'zip_filelist_timestamp_dsi': '2010-01-25T12:34:12Z'}
-            with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
+        with patch('bdr_solrizer.solrizer.Solrizer._get_existing_solr_docs') as solr_docs_mock:
+            solr_docs_mock.return_value = {self.pid: {'pid': self.pid, 'zip_filelist_timestamp_dsi': '2010-01-25T12:34:12Z'}}
+            bodies = []
+            def read_body(body, action):
+                #the zip update is streamed into a temp file
+                body.seek(0)
+                bodies.append(body.read())
+            with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr', side_effect=read_body):
                 solrizer.solrize(self.pid, action=settings.ZIP_ACTION)
-            actual_solr_doc = json.loads(post_to_solr.mock_calls[0].args[0])
-            self.assertEqual(actual_solr_doc['add']['doc']['zip_filelist_ssim'], {'set': ['test.txt']})
+            actual_solr_docs = json.loads(bodies[0])
+            self.assertEqual(actual_solr_docs[0]['zip_filelist_ssim'], {'set': ['test.txt']})
 
     def test_index_zip_object_not_found(self):
         with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
             solrizer.solrize(self.pid, action=settings.ZIP_ACTION)
-        post_to_solr.assert_called_once_with(json.dumps({'delete': {'id': self.pid}}), 'delete')
+        post_to_solr.assert_called_once_with(solrjson.dumps({'delete': {'id': self.pid}}), 'delete')
 
     def test_index_zip_object_deleted(self):
         test_utils.create_deleted_object(storage_root=OCFL_ROOT, pid=self.pid)
         with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
             solrizer.solrize(self.pid, action=settings.ZIP_ACTION)
-        post_to_solr.assert_called_once_with(json.dumps({'delete': {'id': self.pid}}), 'delete')
+        post_to_solr.assert_called_once_with(solrjson.dumps({'delete': {'id': self.pid}}), 'delete')
 
     def test_index_image_parent(self):
         test_utils.create_object(storage_root=OCFL_ROOT, pid=self.pid)
         with patch('bdr_solrizer.solrizer.Solrizer._post_to_solr') as post_to_solr:
             solrizer.solrize(self.pid, action=settings.IMAGE_PARENT_ACTION)
-        image_parent_doc = {
-            'add':
-                {'doc': {
+        image_parent_docs = [{
                     'pid': self.pid,
                     settings.IMAGE_PARENT_FIELD: {'set': True},
-                    settings.IIIF_RESOURCE_FIELD: {'set': True}}}
-        }
-        post_to_solr.assert_called_once_with(json.dumps(image_parent_doc), 'image_parent')
+                    settings.IIIF_RESOURCE_FIELD: {'set': True}}]
+        post_to_solr.assert_called_once_with(solrjson.dumps(image_parent_docs), 'image_parent')
 
 
 class TestSolrDocBuilder(unittest.TestCase):
@@ -372,6 +564,17 @@ class TestSolrDocBuilder(unittest.TestCase):
         tei_text = '<text> <body> <div type="issue"> <!--xmp:xmpmeta found here.--><!--bookmark-tree found here.--> <div type="front"> <ab>October </ab> <ab>The Mowing </ab> </div> </div> </body> </text>'
         self.assertEqual(solrdocbuilder._extract_tei(tei_text.encode('utf8')), 'October The Mowing')
 
+    def test_extract_text_streaming(self):
+        tei_text = '<text>Intro <p>one <hi>two</hi> three</p><!-- skip --><p><lb/>four</p> five</text>'.encode('utf8')
+        self.assertEqual(solrdocbuilder._extract_tei(io.BytesIO(tei_text)), 'Intro one two')
+        self.assertEqual(solrdocbuilder._extract_tei(tei_text, max_length=7), 'Intro o')
+        mets_text = '''<mets:mets xmlns:mets="http://www.loc.gov/METS/" LABEL="Issue">
+            <mets:structMap><mets:div LABEL="Page 1"><mets:div LABEL="Article"/></mets:div><mets:div/><mets:div LABEL="Page 2"/></mets:structMap>
+        </mets:mets>'''.encode('utf8')
+        self.assertEqual(solrdocbuilder._process_extracted_text(io.BytesIO(mets_text), 'text/xml'), 'Issue Page 1 Article Page 2')
+        self.assertEqual(solrdocbuilder._process_extracted_text(mets_text, 'text/xml', max_length=12), 'Issue Page 1')
+        self.assertEqual(solrdocbuilder._process_extracted_text(io.BytesIO(b'plain text'), 'text/plain', max_length=5), 'plain')
+
 
 class TestUtils(unittest.TestCase):
 
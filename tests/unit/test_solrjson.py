@@ -0,0 +1,50 @@
+import json
+import unittest
+from bdr_solrizer import solrjson
+
+
+DOC = {'add': {'doc': {
+    'pid': 'test:1',
+    'extracted_text': 'Café – “quoted” 東京 \U0001f600 "with quotes" and \\ and \n newline',
+    'zip_filelist_ssim': {'set': ['a.txt', 'dir/b.jpg']},
+    'object_size_lsi': '1234',
+    'fed_object_size_lsi': 1234,
+    'iiif_resource_bsi': {'set': True},
+    'empty': None,
+}}}
+
+
+class TestSolrJson(unittest.TestCase):
+
+    def test_encoders(self):
+        for name, dumps in solrjson.ENCODERS.items():
+            with self.subTest(encoder=name):
+                data = dumps(DOC)
+                self.assertIsInstance(data, bytes)
+                self.assertEqual(json.loads(data), DOC)
+                data.decode('utf8')
+
+    def test_default_encoder(self):
+        if solrjson.orjson is None:
+            self.assertIs(solrjson.get_encoder(), solrjson._json_dumps)
+        else:
+            self.assertIs(solrjson.get_encoder(), solrjson._orjson_dumps)
+        self.assertIs(solrjson.get_encoder('json'), solrjson._json_dumps)
+        with self.assertRaises(ValueError):
+            solrjson.get_encoder('simplejson')
+
+    @unittest.skipIf(solrjson.orjson is None, 'orjson not installed')
+    def test_orjson_fallback(self):
+        doc = {'add': {'doc': {'pid': 'test:1', 'big_number': 2**70}}}
+        self.assertEqual(json.loads(solrjson._orjson_dumps(doc)), doc)
+        #non-ASCII text goes out as UTF-8, not \u escapes
+        self.assertIn('東京'.encode('utf8'), solrjson._orjson_dumps(DOC))
+
+
+def suite():
+    suite = unittest.makeSuite(TestSolrJson, 'test')
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
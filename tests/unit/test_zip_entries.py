@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+from diskcache import Cache
+from bdr_solrizer import settings, zip_entries
+
+
+NAMES = ['b.txt', 'dir/', 'dir/a.jpg', 'Café/東京.txt', 'z/', 'a.txt']
+
+
+def zip_bytes(names, comment=b''):
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, mode='w') as zip_file:
+        for name in names:
+            zip_file.writestr(name, b'' if name.endswith('/') else b'1234')
+        zip_file.comment = comment
+    return zip_buffer.getvalue()
+
+
+class TestZipEntries(unittest.TestCase):
+
+    def setUp(self):
+        with Cache(settings.CACHE_DIR) as cache:
+            cache.clear()
+
+    def write_zip(self, data):
+        f = tempfile.NamedTemporaryFile(suffix='.zip', delete=False)
+        self.addCleanup(os.remove, f.name)
+        with f:
+            f.write(data)
+        return f.name
+
+    def assert_names_match_zipfile(self, path):
+        with zipfile.ZipFile(path) as zip_file:
+            expected = [name for name in zip_file.namelist() if not name.endswith('/')]
+        self.assertEqual(list(zip_entries.iter_names(path)), expected)
+
+    def test_iter_names(self):
+        path = self.write_zip(zip_bytes(NAMES))
+        self.assertEqual(list(zip_entries.iter_names(path)), ['b.txt', 'dir/a.jpg', 'Café/東京.txt', 'a.txt'])
+        self.assert_names_match_zipfile(path)
+
+    def test_iter_names_cp437(self):
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, mode='w') as zip_file:
+            #an ASCII name doesn't get the UTF-8 flag - then the raw name gets a cp437 byte
+            zip_file.writestr('cafe.txt', b'1234')
+        data = zip_buffer.getvalue().replace(b'cafe.txt', 'café.txt'.encode('cp437'))
+        path = self.write_zip(data)
+        self.assertEqual(list(zip_entries.iter_names(path)), ['café.txt'])
+        self.assert_names_match_zipfile(path)
+
+    def test_iter_names_comment_and_prepended_data(self):
+        path = self.write_zip(b'#!/bin/sh\nprepended stub\n' * 10 + zip_bytes(NAMES, comment=b'a comment'))
+        self.assert_names_match_zipfile(path)
+        path = self.write_zip(zip_bytes(NAMES) + b'trailing junk')
+        self.assert_names_match_zipfile(path)
+        #zipfile can't handle this one
+        path = self.write_zip(zip_bytes(NAMES, comment=b'PK\x05\x06 in a comment'))
+        self.assertEqual(list(zip_entries.iter_names(path)), ['b.txt', 'dir/a.jpg', 'Café/東京.txt', 'a.txt'])
+
+    def test_iter_names_zip64(self):
+        with patch('zipfile.ZIP_FILECOUNT_LIMIT', 2):
+            path = self.write_zip(zip_bytes(NAMES))
+        with open(path, 'rb') as f:
+            self.assertIn(b'PK\x06\x06', f.read())
+        self.assert_names_match_zipfile(path)
+
+    def test_iter_names_empty_zip(self):
+        path = self.write_zip(zip_bytes([]))
+        self.assertEqual(list(zip_entries.iter_names(path)), [])
+
+    def test_iter_names_not_a_zip(self):
+        path = self.write_zip(b'not a zip file')
+        with self.assertRaises(zipfile.BadZipFile):
+            list(zip_entries.iter_names(path))
+
+    def test_sorted_names(self):
+        names = [f'file{i % 7}/{i * 7919 % 1000:03}.txt' for i in range(1000)] + ['', 'é', 'a']
+        for run_size in [1, 3, 100, 1000, 5000]:
+            with self.subTest(run_size=run_size):
+                self.assertEqual(list(zip_entries.sorted_names(names, run_size=run_size)), sorted(names))
+        self.assertEqual(list(zip_entries.sorted_names([], run_size=10)), [])
+
+    def test_write_json_fragment(self):
+        names = [f'{i}.txt' for i in range(2500)] + ['"quoted"\\.txt']
+        out = io.BytesIO()
+        self.assertEqual(zip_entries.write_json_fragment(names, out), len(names))
+        self.assertEqual(json.loads(b'[' + out.getvalue() + b']'), names)
+
+    def test_listing_cached_by_checksum(self):
+        path = self.write_zip(zip_bytes(NAMES))
+        self.assertIsNone(zip_entries.load('abc'))
+        with zip_entries.open_json_fragment('abc', path) as fragment:
+            self.assertEqual(json.loads(b'[' + fragment.read() + b']'), ['Café/東京.txt', 'a.txt', 'b.txt', 'dir/a.jpg'])
+        os.remove(path)
+        open(path, 'wb').close()
+        #the same checksum comes from the cache, without reading the ZIP
+        with zip_entries.open_json_fragment('abc', path) as fragment:
+            self.assertEqual(json.loads(b'[' + fragment.read() + b']'), ['Café/東京.txt', 'a.txt', 'b.txt', 'dir/a.jpg'])
+        self.assertEqual(zip_entries.load('abc'), ['Café/東京.txt', 'a.txt', 'b.txt', 'dir/a.jpg'])
+        self.assertIsNone(zip_entries.load('abc', max_bytes=10))
+
+
+def suite():
+    suite = unittest.makeSuite(TestZipEntries, 'test')
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
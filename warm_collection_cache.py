@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+from os.path import dirname, abspath, join
+import sys
+import time
+import dotenv
+
+
+def collection_pids_for_objects(pids):
+    '''the collections the objects are members of, and how many of the objects were found'''
+    collection_pids = {}
+    found = 0
+    for pid in pids:
+        try:
+            rels_ext = solrdocbuilder.StorageObject(pid, use_object_cache=True).rels_ext
+        except (solrdocbuilder.ObjectNotFound, solrdocbuilder.ObjectDeleted):
+            continue
+        found += 1
+        for collection_pid in RelsExtIndexer.get_collection_pids(rels_ext):
+            collection_pids[collection_pid] = None
+    return list(collection_pids), found
+
+
+def main(pids, are_collections, threads, per_second):
+    start = time.time()
+    pids = list(dict.fromkeys(pids))
+    if are_collections:
+        collection_pids = pids
+    else:
+        collection_pids, found = collection_pids_for_objects(pids)
+        print(f'{len(pids)} objects ({found} in storage) are in {len(collection_pids)} collections - {time.time() - start:.1f}s')
+    fetch_start = time.time()
+    results = relsextindexer.warm_ancestors_cache(collection_pids, threads=threads, per_second=per_second)
+    for collection_pid, error in sorted(results['failed'].items()):
+        print(f'  {collection_pid} failed: {error}')
+    warm = len(results['cached']) + len(results['fetched'])
+    coverage = warm / len(collection_pids) * 100 if collection_pids else 100
+    print(f'{len(results["cached"])} already cached, {len(results["fetched"])} fetched, {len(results["failed"])} failed - {time.time() - fetch_start:.1f}s')
+    print(f'coverage: {warm}/{len(collection_pids)} collections ({coverage:.1f}%) - {time.time() - start:.1f}s total')
+    if results['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    CODE_ROOT = dirname(abspath(__file__))
+    if CODE_ROOT not in sys.path:
+        sys.path.append(CODE_ROOT)
+    PROJECT_ROOT = dirname(CODE_ROOT)
+    dotenv.read_dotenv(join(PROJECT_ROOT, '.env'))
+
+    from bdr_solrizer import queues
+    from bdr_solrizer import solrdocbuilder
+    from bdr_solrizer.indexers import relsextindexer, RelsExtIndexer
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Load collection ancestors into the cache before a big reindex')
+    parser.add_argument('-q', '--queue', dest='queue', action='store_true', help='warm the collections of the objects waiting in the queues')
+    parser.add_argument('-f', '--file', dest='file', help='file to read object pids from (one pid on each line)')
+    parser.add_argument('--collections', dest='collections', action='store_true', help='the file has collection pids, not object pids')
+    parser.add_argument('--threads', dest='threads', type=int, default=relsextindexer.ANCESTOR_LOOKUP_THREADS, help=f'concurrent API requests (default: {relsextindexer.ANCESTOR_LOOKUP_THREADS})')
+    parser.add_argument('--per-second', dest='per_second', type=float, default=10, help='maximum API requests per second (default: 10, 0 for no limit)')
+    args = parser.parse_args()
+
+    if args.queue:
+        main(queues.queued_pids(), are_collections=False, threads=args.threads, per_second=args.per_second)
+    elif args.file:
+        with open(args.file, 'rb') as f:
+            pids = [line.strip().decode('utf8') for line in f.readlines() if line.strip()]
+            main(pids, are_collections=args.collections, threads=args.threads, per_second=args.per_second)
+    else:
+        sys.exit('nothing to do')